@@ -0,0 +1,279 @@
+# analytics.py
+"""Incrementally maintained incident rollups for the admin dashboard.
+
+Two summary tables hold running counts:
+
+* ``incident_daily_stats``: per created day, status and type; grouped counts
+  and time series are sums over it.
+* ``incident_geo_cells``: per geohash cell and status, at every precision up
+  to ``MAX_CELL_PRECISION``; heatmaps read one precision directly.
+
+A session ``before_flush`` hook turns every ORM insert, update and delete of
+an ``Incident`` into +1/-1 deltas and upserts them in the same transaction,
+so the rollups commit or roll back with the incident. Core bulk inserts and
+deletes don't flush and must call ``record_incidents`` themselves. Archived
+incidents (archive.py) keep counting: moving a row to the archive is not a
+delete. ``rebuild_rollups`` recomputes both tables from scratch, archive
+included (``flask rebuild-stats``).
+
+The same hooks leave the old and new values of every changed incident in
+``session.info['incident_changes']`` for caches that act on commit (map
+tiles).
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import delete, event, func, inspect, literal, select, union_all
+from sqlalchemy.orm import Session
+
+from geo import encode_geohash, prefix_range
+from models import db, ArchivedIncident, Incident, IncidentDailyStat, IncidentGeoCell
+
+# Precision 6 cells are about 1.2km x 0.6km
+MAX_CELL_PRECISION = 6
+TRACKED_ATTRIBUTES = ('created_at', 'status', 'type', 'latitude', 'longitude')
+
+
+def zoom_to_precision(zoom):
+    """Geohash precision whose cells are roughly 1/8 of a web-map tile at ``zoom``."""
+    return max(1, min(MAX_CELL_PRECISION, round((zoom + 3) * 2 / 5)))
+
+
+def _keys(values):
+    """Rollup keys for one incident's ``TRACKED_ATTRIBUTES`` values."""
+    created_at, status, incident_type, latitude, longitude = values
+    status = status or 'pending'
+    created_at = created_at or datetime.utcnow()
+    day = created_at.date() if isinstance(created_at, datetime) else created_at
+    daily = [(day, status, incident_type)]
+    cells = []
+    if latitude is not None and longitude is not None:
+        geohash = encode_geohash(float(latitude), float(longitude), MAX_CELL_PRECISION)
+        cells = [(precision, geohash[:precision], status) for precision in range(1, MAX_CELL_PRECISION + 1)]
+    return daily, cells
+
+
+def _add(deltas, values, sign):
+    daily, cells = _keys(values)
+    for key in daily:
+        deltas[0][key] += sign
+    for key in cells:
+        deltas[1][key] += sign
+
+
+def _upsert(connection, model, key_columns, rows):
+    """Add ``count`` into existing rows, inserting missing ones."""
+    if not rows:
+        return
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        raise NotImplementedError(f'Incident rollups do not support {dialect}')
+
+    statement = insert(model.__table__)
+    statement = statement.on_conflict_do_update(
+        index_elements=key_columns,
+        set_={'count': model.__table__.c.count + statement.excluded['count']},
+    )
+    connection.execute(statement, rows)
+
+
+def apply_deltas(connection, deltas):
+    daily, cells = deltas
+    _upsert(connection, IncidentDailyStat, ['day', 'status', 'type'], [
+        {'day': day, 'status': status, 'type': incident_type, 'count': count}
+        for (day, status, incident_type), count in daily.items() if count
+    ])
+    _upsert(connection, IncidentGeoCell, ['precision', 'cell', 'status'], [
+        {'precision': precision, 'cell': cell, 'status': status, 'count': count}
+        for (precision, cell, status), count in cells.items() if count
+    ])
+
+
+def _remember(session, values):
+    session.info.setdefault('incident_changes', []).extend(values)
+
+
+def _tracked_values(rows):
+    return [tuple(row.get(name) for name in TRACKED_ATTRIBUTES) for row in rows]
+
+
+def record_incidents(rows, connection=None, sign=+1):
+    """Count incidents written without a flush; ``rows`` are mappings of ``TRACKED_ATTRIBUTES``.
+
+    Bulk inserts pass their insert dicts; set-based deletes pass the deleted
+    rows with ``sign=-1``.
+    """
+    deltas = (Counter(), Counter())
+    values = _tracked_values(rows)
+    for row in values:
+        _add(deltas, row, sign)
+    apply_deltas(connection or db.session.connection(), deltas)
+    _remember(db.session, values)
+
+
+def remember_incidents(rows):
+    """Report incidents moved without a flush to commit-time caches only.
+
+    The rollups are left alone: archived incidents still count.
+    """
+    _remember(db.session, _tracked_values(rows))
+
+
+def _previous_values(session, incident):
+    """Tracked values as last flushed, reading any that were never loaded."""
+    state = inspect(incident)
+    values = {}
+    missing = []
+    for name in TRACKED_ATTRIBUTES:
+        history = state.attrs[name].history
+        if history.deleted:
+            values[name] = history.deleted[0]
+        elif history.unchanged:
+            values[name] = history.unchanged[0]
+        elif not history.added:
+            values[name] = getattr(incident, name)
+        else:
+            missing.append(name)
+    if missing:
+        row = session.connection().execute(
+            select(*(getattr(Incident, name) for name in missing)).where(Incident.id == incident.id)
+        ).one()
+        values.update(zip(missing, row))
+    return tuple(values[name] for name in TRACKED_ATTRIBUTES)
+
+
+def _current_values(incident):
+    return tuple(getattr(incident, name) for name in TRACKED_ATTRIBUTES)
+
+
+@event.listens_for(Session, 'before_flush')
+def track_incident_changes(session, flush_context, instances):
+    deltas = (Counter(), Counter())
+    changed = []
+    with session.no_autoflush:
+        for obj in session.new:
+            if isinstance(obj, Incident):
+                # Pin the default now so the rollup day matches the stored row
+                if obj.created_at is None:
+                    obj.created_at = datetime.utcnow()
+                current = _current_values(obj)
+                _add(deltas, current, +1)
+                changed.append(current)
+        for obj in session.dirty:
+            if isinstance(obj, Incident) and session.is_modified(obj):
+                previous = _previous_values(session, obj)
+                current = _current_values(obj)
+                if previous != current:
+                    _add(deltas, previous, -1)
+                    _add(deltas, current, +1)
+                    changed.extend((previous, current))
+        for obj in session.deleted:
+            if isinstance(obj, Incident):
+                previous = _previous_values(session, obj)
+                _add(deltas, previous, -1)
+                changed.append(previous)
+
+    if any(deltas[0].values()) or any(deltas[1].values()):
+        apply_deltas(session.connection(), deltas)
+    if changed:
+        _remember(session, changed)
+
+
+def rebuild_rollups():
+    """Recompute both rollup tables from ``incidents`` and ``incidents_archive``; the caller commits."""
+    db.session.execute(delete(IncidentDailyStat))
+    db.session.execute(delete(IncidentGeoCell))
+
+    incidents = union_all(*(
+        select(model.created_at, model.status, model.type, model.geohash) for model in (Incident, ArchivedIncident)
+    )).subquery()
+    status = func.coalesce(incidents.c.status, 'pending')
+    day = func.date(incidents.c.created_at)
+    db.session.execute(
+        IncidentDailyStat.__table__.insert().from_select(
+            ['day', 'status', 'type', 'count'],
+            select(day, status, incidents.c.type, func.count()).group_by(day, status, incidents.c.type),
+        )
+    )
+    for precision in range(1, MAX_CELL_PRECISION + 1):
+        cell = func.substr(incidents.c.geohash, 1, precision)
+        db.session.execute(
+            IncidentGeoCell.__table__.insert().from_select(
+                ['precision', 'cell', 'status', 'count'],
+                select(literal(precision), cell, status, func.count())
+                .where(incidents.c.geohash.isnot(None))
+                .group_by(cell, status),
+            )
+        )
+
+
+def _daily_filters(query, start=None, end=None, status=None, incident_type=None):
+    if start:
+        query = query.where(IncidentDailyStat.day >= start)
+    if end:
+        query = query.where(IncidentDailyStat.day <= end)
+    if status:
+        query = query.where(IncidentDailyStat.status == status)
+    if incident_type:
+        query = query.where(IncidentDailyStat.type == incident_type)
+    return query
+
+
+def grouped_counts(by, **filters):
+    column = {'status': IncidentDailyStat.status, 'type': IncidentDailyStat.type}[by]
+    query = _daily_filters(select(column, func.sum(IncidentDailyStat.count)), **filters).group_by(column)
+    return {key: int(total) for key, total in db.session.execute(query) if total}
+
+
+def _bucket(day, interval):
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    if interval == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def time_series(interval='day', **filters):
+    query = _daily_filters(
+        select(IncidentDailyStat.day, func.sum(IncidentDailyStat.count)), **filters
+    ).group_by(IncidentDailyStat.day).order_by(IncidentDailyStat.day)
+
+    buckets = {}
+    for day, total in db.session.execute(query):
+        bucket = _bucket(day, interval)
+        buckets[bucket] = buckets.get(bucket, 0) + int(total)
+    return [{'bucket': bucket.isoformat(), 'count': count} for bucket, count in buckets.items() if count]
+
+
+def geo_cells(precision, prefixes=('',), status=None):
+    """Counts per cell at ``precision``, limited to cells under ``prefixes``."""
+    query = select(IncidentGeoCell.cell, func.sum(IncidentGeoCell.count)).where(
+        IncidentGeoCell.precision == precision
+    )
+    ranges = []
+    for prefix in prefixes:
+        prefix = prefix[:precision]
+        if prefix:
+            low, high = prefix_range(prefix)
+            ranges.append(db.and_(IncidentGeoCell.cell >= low, IncidentGeoCell.cell < high))
+    if ranges:
+        query = query.where(db.or_(*ranges))
+    if status:
+        query = query.where(IncidentGeoCell.status == status)
+    query = query.group_by(IncidentGeoCell.cell)
+    return {cell: int(total) for cell, total in db.session.execute(query) if total}
+
+
+@click.command('rebuild-stats')
+@with_appcontext
+def rebuild_stats_command():
+    """Recompute the analytics rollup tables from the incidents table."""
+    rebuild_rollups()
+    db.session.commit()
+    click.echo('Incident rollups rebuilt')
@@ -7,13 +7,16 @@ import os
 import logging
 import cloudinary
 
-from extensions import db, jwt, migrate  
+from extensions import db, jwt, migrate, response_cache, media_pipeline, tile_cache, identity_cache, password_hasher, rate_limiter
+from database import configure_engines, database_url, engine_options
+from serialization import FastJSONProvider
 
 # Load environment variables
 load_dotenv()
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__, instance_relative_config=True)
+    app.json = FastJSONProvider(app)
     app.logger.setLevel(logging.INFO)
 
     # Allow custom CORS headers for local dev 
@@ -26,16 +29,23 @@ def create_app():
         return response
 
     
-    db_path = Path(app.instance_path) / "ajali.db"
     Path(app.instance_path).mkdir(parents=True, exist_ok=True)
 
     # App config
-    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_path}"
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url(app.instance_path)
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "dev")
     app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=7)
     app.config["UPLOAD_FOLDER"] = "./uploads"
 
+    # Overrides (e.g. from tests) must land before extensions read the config
+    if config:
+        app.config.update(config)
+
+    # Engine tuning follows whichever database URL won
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config["SQLALCHEMY_DATABASE_URI"]))
+    app.config.setdefault("DATABASE_REPLICA_URL", os.getenv("DATABASE_REPLICA_URL"))
+
     # Cloudinary config
     cloudinary.config(
         cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
@@ -46,8 +56,15 @@ def create_app():
 
     # Init extensions
     db.init_app(app)
+    configure_engines(app, db)
     jwt.init_app(app)
     migrate.init_app(app, db)
+    response_cache.init_app(app)
+    media_pipeline.init_app(app)
+    tile_cache.init_app(app)
+    identity_cache.init_app(app)
+    password_hasher.init_app(app)
+    rate_limiter.init_app(app)
 
     # Import models after db is initialized
     from models import User, Incident, Media, Notification, StatusHistory
@@ -57,6 +74,25 @@ def create_app():
     from routes.incidents import incidents_bp
     app.register_blueprint(auth_bp, url_prefix="/auth")
     app.register_blueprint(incidents_bp, url_prefix="/incidents")
+    from routes.analytics import analytics_bp
+    app.register_blueprint(analytics_bp, url_prefix="/analytics")
+
+    # CLI commands
+    from email_outbox import email_worker_command
+    app.cli.add_command(email_worker_command)
+    from seed import seed_command
+    app.cli.add_command(seed_command)
+    from incident_export import export_incidents_command
+    app.cli.add_command(export_incidents_command)
+    from incident_import import import_incidents_command
+    app.cli.add_command(import_incidents_command)
+    from analytics import rebuild_stats_command
+    app.cli.add_command(rebuild_stats_command)
+    from archive import archive_incidents_command, purge_notifications_command
+    app.cli.add_command(archive_incidents_command)
+    app.cli.add_command(purge_notifications_command)
+    from media_pipeline import recover_media_command
+    app.cli.add_command(recover_media_command)
 
     # CORS setup
     from flask_cors import CORS
@@ -0,0 +1,150 @@
+# archive.py
+"""Move closed incidents out of the hot tables, and expire old notifications.
+
+``archive_incidents`` moves incidents whose status is in ``ARCHIVE_STATUSES``
+and that have not been updated for ``ARCHIVE_AFTER_DAYS`` into the
+``*_archive`` tables, together with their media, status history and
+notifications. Each chunk is copied with ``INSERT ... SELECT`` and removed
+from the hot tables (child rows through ``ON DELETE CASCADE``) in one short
+transaction, so the job holds the write lock briefly, can be stopped at any
+point and picks up where it left off when run again. Archived incidents
+leave the map tiles and search index like deleted ones but keep counting in
+the dashboard rollups; listings still return them with
+``include_archived=true``.
+
+``purge_notifications`` deletes hot and archived notifications older than
+``NOTIFICATION_RETENTION_DAYS``, also in chunks.
+
+Both are meant to run from cron::
+
+    flask archive-incidents --max-chunks 200
+    flask purge-notifications
+"""
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import delete, literal, select
+
+from analytics import TRACKED_ATTRIBUTES, remember_incidents
+from extensions import response_cache
+from models import (db, ArchivedIncident, ArchivedMedia, ArchivedNotification, ArchivedStatusHistory,
+                    Incident, Media, Notification, StatusHistory)
+
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_ARCHIVE_STATUSES = ('resolved', 'rejected')
+DEFAULT_ARCHIVE_AFTER_DAYS = 365
+DEFAULT_NOTIFICATION_RETENTION_DAYS = 180
+
+# (hot model, archive model) for the rows that follow their incident
+CHILD_TABLES = [
+    (Media, ArchivedMedia),
+    (StatusHistory, ArchivedStatusHistory),
+    (Notification, ArchivedNotification),
+]
+
+
+def _copy(model, archive_model, where, now=None):
+    """``INSERT INTO <archive> SELECT ... FROM <hot> WHERE ...``; the columns are shared by name."""
+    source = model.__table__
+    names = [column.name for column in source.columns]
+    columns = [source.c[name] for name in names]
+    if now is not None:
+        names.append('archived_at')
+        columns.append(literal(now, ArchivedIncident.archived_at.type))
+    db.session.execute(archive_model.__table__.insert().from_select(names, select(*columns).where(where)))
+
+
+def _archive_chunk(ids, now):
+    tracked = [getattr(Incident, name) for name in TRACKED_ATTRIBUTES]
+    rows = db.session.execute(select(*tracked).where(Incident.id.in_(ids))).mappings().all()
+
+    _copy(Incident, ArchivedIncident, Incident.id.in_(ids), now)
+    for model, archive_model in CHILD_TABLES:
+        _copy(model, archive_model, model.incident_id.in_(ids))
+
+    # Archival is not a delete: the rollups keep these, only the map tiles drop them
+    remember_incidents(rows)
+    # Cascades to the hot child rows copied above and to any outbox emails
+    db.session.execute(
+        delete(Incident).where(Incident.id.in_(ids)).execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def archive_incidents(older_than_days=None, chunk_size=DEFAULT_CHUNK_SIZE, max_chunks=None, pause=0.0):
+    """Archive closed incidents a chunk at a time; returns how many were moved.
+
+    ``max_chunks`` bounds one run; ``pause`` seconds between chunks leaves
+    room for other writers.
+    """
+    if older_than_days is None:
+        older_than_days = current_app.config.get('ARCHIVE_AFTER_DAYS', DEFAULT_ARCHIVE_AFTER_DAYS)
+    statuses = list(current_app.config.get('ARCHIVE_STATUSES', DEFAULT_ARCHIVE_STATUSES))
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+    # No ORDER BY: the first rows found on ix_incidents_status_updated_at will do
+    candidates = (
+        select(Incident.id)
+        .where(Incident.status.in_(statuses), Incident.updated_at < cutoff)
+        .limit(chunk_size)
+    )
+
+    moved = chunks = 0
+    try:
+        while max_chunks is None or chunks < max_chunks:
+            ids = db.session.scalars(candidates).all()
+            if not ids:
+                break
+            _archive_chunk(ids, datetime.utcnow())
+            moved += len(ids)
+            chunks += 1
+            if pause:
+                time.sleep(pause)
+    finally:
+        if moved:
+            response_cache.invalidate('incidents')
+    return moved
+
+
+def purge_notifications(older_than_days=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Delete hot and archived notifications sent before the retention cutoff; returns the count."""
+    if older_than_days is None:
+        older_than_days = current_app.config.get('NOTIFICATION_RETENTION_DAYS', DEFAULT_NOTIFICATION_RETENTION_DAYS)
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+    purged = 0
+    for model in (Notification, ArchivedNotification):
+        candidates = select(model.id).where(model.sent_at < cutoff).limit(chunk_size)
+        while True:
+            ids = db.session.scalars(candidates).all()
+            if not ids:
+                break
+            db.session.execute(delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False))
+            db.session.commit()
+            purged += len(ids)
+    return purged
+
+
+@click.command('archive-incidents')
+@click.option('--older-than-days', type=int, help='Default: ARCHIVE_AFTER_DAYS.')
+@click.option('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, show_default=True, help='Incidents per transaction.')
+@click.option('--max-chunks', type=int, help='Stop after this many chunks; the next run continues.')
+@click.option('--pause', type=float, default=0.0, show_default=True, help='Seconds to sleep between chunks.')
+@with_appcontext
+def archive_incidents_command(older_than_days, chunk_size, max_chunks, pause):
+    """Move closed incidents and their child rows into the archive tables."""
+    moved = archive_incidents(older_than_days, chunk_size, max_chunks, pause)
+    click.echo(f'Archived {moved} incidents')
+
+
+@click.command('purge-notifications')
+@click.option('--older-than-days', type=int, help='Default: NOTIFICATION_RETENTION_DAYS.')
+@click.option('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, show_default=True, help='Rows per transaction.')
+@with_appcontext
+def purge_notifications_command(older_than_days, chunk_size):
+    """Delete notifications older than the retention period."""
+    purged = purge_notifications(older_than_days, chunk_size)
+    click.echo(f'Purged {purged} notifications')
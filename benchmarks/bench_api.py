@@ -0,0 +1,343 @@
+# benchmarks/bench_api.py
+"""Latency, throughput and SQL statement counts for the main API endpoints.
+
+Runs each scenario against a synthetic dataset through the Flask test client
+(in-process, with per-request SQL statement counts) or a real gunicorn
+server (end-to-end over HTTP, with concurrent clients). Results are written
+as JSON; ``--save-baseline`` stores them under ``benchmarks/baselines/`` and
+later runs are compared against that file, exiting non-zero when a metric
+regresses by more than ``--threshold``.
+
+    python -m benchmarks.bench_api --incidents 100000 --driver testclient
+    python -m benchmarks.bench_api --incidents 1000000 --driver gunicorn --workers 4 --concurrency 16
+"""
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event
+
+from benchmarks.datasets import BENCH_PASSWORD, ensure_dataset
+from models import INCIDENT_TYPES
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), 'baselines')
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Higher is worse for latencies and statement counts, lower is worse for throughput
+LATENCY_METRICS = ('p50_ms', 'p95_ms', 'p99_ms')
+
+
+def _feed(rng, pages):
+    return 'GET', f'/incidents/?page={rng.randint(1, pages)}', {}
+
+
+def _all(rng, pages):
+    return 'GET', f'/incidents/all?page={rng.randint(1, pages)}&per_page=20', {'auth': True}
+
+
+def _create(rng, pages):
+    return 'POST', '/incidents/', {'auth': True, 'data': {
+        'title': 'Benchmark incident',
+        'description': 'Created by the API benchmark',
+        'type': rng.choice(INCIDENT_TYPES),
+        'latitude': str(-1.28 + rng.uniform(-0.1, 0.1)),
+        'longitude': str(36.82 + rng.uniform(-0.1, 0.1)),
+    }}
+
+
+def _login(rng, users):
+    return 'POST', '/auth/login', {'json': {
+        'email': f'user{rng.randint(1, users)}@example.com', 'password': BENCH_PASSWORD,
+    }}
+
+
+def _me(rng, users):
+    return 'GET', '/auth/me', {'auth': True}
+
+
+# name -> (request factory, which dataset size it draws from, expected status)
+SCENARIOS = {
+    'incidents_feed': (_feed, 'pages', 200),
+    'incidents_all': (_all, 'pages', 200),
+    'create_incident': (_create, 'pages', 201),
+    'login': (_login, 'users', 200),
+    'me': (_me, 'users', 200),
+}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, wall_seconds, statements=None, errors=0):
+    latencies = sorted(latencies)
+    result = {
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3),
+        'throughput_rps': round(len(latencies) / wall_seconds, 1) if wall_seconds else None,
+    }
+    if statements:
+        result['statements_per_request'] = max(statements)
+    return result
+
+
+class TestClientDriver:
+    """Sequential requests through ``app.test_client()``, counting SQL per request."""
+
+    name = 'testclient'
+
+    def __init__(self, database_url):
+        from app import create_app
+        from extensions import db
+
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': database_url,
+            'EMAIL_TRANSPORT': 'fake',
+            'MEDIA_UPLOAD_WORKERS': 0,
+            # Measure the database path, not cache hits
+            'RESPONSE_CACHE_ENABLED': False,
+            # Every scenario logs in from the same address
+            'RATE_LIMIT_ENABLED': False,
+        })
+        self.client = self.app.test_client()
+        self.statements = 0
+        with self.app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        self.statements += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def request(self, method, path, headers=None, **kwargs):
+        response = self.client.open(path, method=method, headers=headers, **kwargs)
+        return response.status_code, response.get_json(silent=True)
+
+    def run(self, requests_):
+        latencies, statements, errors = [], [], 0
+        started = time.perf_counter()
+        for method, path, kwargs, expected in requests_:
+            self.statements = 0
+            t0 = time.perf_counter()
+            status, _ = self.request(method, path, **kwargs)
+            latencies.append(time.perf_counter() - t0)
+            statements.append(self.statements)
+            errors += status != expected
+        return summarize(latencies, time.perf_counter() - started, statements, errors)
+
+
+class GunicornDriver:
+    """Concurrent HTTP clients against a gunicorn server on the same dataset."""
+
+    name = 'gunicorn'
+
+    def __init__(self, database_url, workers=2, threads=1, concurrency=8):
+        self.database_url = database_url
+        self.workers = workers
+        self.threads = threads
+        self.concurrency = concurrency
+        self.process = None
+        self._local = threading.local()
+
+    def __enter__(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        self.base_url = f'http://127.0.0.1:{port}'
+        env = dict(os.environ, DATABASE_URL=self.database_url, RATE_LIMIT_ENABLED='0')
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-w', str(self.workers), '--threads', str(self.threads),
+             '-b', f'127.0.0.1:{port}', '--log-level', 'warning', 'app:app'],
+            cwd=REPO_ROOT, env=env,
+        )
+        try:
+            self._wait_until_ready()
+        except Exception:
+            self.__exit__()
+            raise
+        return self
+
+    def _wait_until_ready(self, timeout=30):
+        import requests
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError('gunicorn exited during startup')
+            try:
+                requests.get(self.base_url + '/incidents/?per_page=1', timeout=5)
+                return
+            except requests.RequestException:
+                time.sleep(0.2)
+        raise RuntimeError('gunicorn did not start in time')
+
+    def __exit__(self, *exc):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait(timeout=30)
+        return False
+
+    def _session(self):
+        import requests
+
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def request(self, method, path, headers=None, **kwargs):
+        response = self._session().request(method, self.base_url + path, headers=headers, timeout=60, **kwargs)
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        return response.status_code, body
+
+    def _timed(self, item):
+        method, path, kwargs, expected = item
+        t0 = time.perf_counter()
+        try:
+            status, _ = self.request(method, path, **kwargs)
+        except Exception:
+            status = None
+        return time.perf_counter() - t0, status == expected
+
+    def run(self, requests_):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            results = list(executor.map(self._timed, requests_))
+        wall = time.perf_counter() - started
+        return summarize([latency for latency, _ in results], wall,
+                         errors=sum(1 for _, ok in results if not ok))
+
+
+def run_scenarios(driver, users, incidents, requests_per_scenario=200, scenarios=None, seed=0):
+    """Run each scenario against a started driver and return ``{name: summary}``."""
+    rng = random.Random(seed)
+    status, body = driver.request('POST', '/auth/login', json={'email': 'user1@example.com', 'password': BENCH_PASSWORD})
+    if status != 200:
+        raise RuntimeError(f'Benchmark login failed with HTTP {status}')
+    auth = {'Authorization': f"Bearer {body['access_token']}"}
+    sizes = {'pages': max(incidents // 10, 1), 'users': users}
+
+    results = {}
+    for name in scenarios or SCENARIOS:
+        factory, size, expected = SCENARIOS[name]
+        batch = []
+        for _ in range(requests_per_scenario):
+            method, path, kwargs = factory(rng, sizes[size])
+            headers = auth if kwargs.pop('auth', False) else None
+            batch.append((method, path, dict(kwargs, headers=headers), expected))
+        results[name] = driver.run(batch)
+    return results
+
+
+def compare(current, baseline, threshold=0.2):
+    """Return a human-readable line for every metric worse than baseline by more than ``threshold``."""
+    regressions = []
+    for name, base in baseline.items():
+        result = current.get(name)
+        if result is None:
+            continue
+        for metric in LATENCY_METRICS:
+            if base.get(metric) and result[metric] > base[metric] * (1 + threshold):
+                regressions.append(f'{name}.{metric}: {result[metric]} > baseline {base[metric]}')
+        if base.get('throughput_rps') and result['throughput_rps'] < base['throughput_rps'] * (1 - threshold):
+            regressions.append(f"{name}.throughput_rps: {result['throughput_rps']} < baseline {base['throughput_rps']}")
+        # Statement counts are deterministic, so any increase is a regression (an N+1 creeping in)
+        if 'statements_per_request' in base and result.get('statements_per_request', 0) > base['statements_per_request']:
+            regressions.append(f"{name}.statements_per_request: {result['statements_per_request']} > "
+                               f"baseline {base['statements_per_request']}")
+        if result['errors'] > base.get('errors', 0):
+            regressions.append(f"{name}.errors: {result['errors']} > baseline {base.get('errors', 0)}")
+    return regressions
+
+
+def baseline_path(driver_name, users, incidents):
+    return os.path.join(BASELINE_DIR, f'{driver_name}-{users}u-{incidents}i.json')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--incidents', type=int, default=100000)
+    parser.add_argument('--driver', choices=['testclient', 'gunicorn'], default='testclient')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per scenario')
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS), help='Run only these scenarios')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent HTTP clients (gunicorn driver)')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed relative regression')
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--output', help='Also write results to this JSON file')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    dataset_url = ensure_dataset(args.users, args.incidents)
+    print(f'dataset ready in {time.perf_counter() - started:.1f}s: {dataset_url}')
+
+    # Run on a copy so create_incident doesn't make the next run's dataset bigger
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        shutil.copyfile(dataset_url[len('sqlite:///'):], path)
+        database_url = f'sqlite:///{path}'
+        if args.driver == 'testclient':
+            driver = TestClientDriver(database_url)
+        else:
+            driver = GunicornDriver(database_url, workers=args.workers, concurrency=args.concurrency)
+        with driver:
+            results = run_scenarios(driver, args.users, args.incidents, args.requests, args.scenario)
+
+    for name, result in results.items():
+        statements = result.get('statements_per_request', '-')
+        print(f"{name:<16} p50={result['p50_ms']:>8.2f}ms p95={result['p95_ms']:>8.2f}ms "
+              f"p99={result['p99_ms']:>8.2f}ms rps={result['throughput_rps']:>8.1f} "
+              f"sql={statements} errors={result['errors']}")
+
+    report = {'driver': args.driver, 'users': args.users, 'incidents': args.incidents, 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    path = baseline_path(args.driver, args.users, args.incidents)
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'baseline saved to {path}')
+        return 0
+
+    if not os.path.exists(path):
+        print(f'no baseline at {path}; run with --save-baseline to create one')
+        return 0
+    with open(path) as f:
+        baseline = json.load(f)['results']
+    regressions = compare(results, baseline, args.threshold)
+    for line in regressions:
+        print(f'REGRESSION {line}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+# benchmarks/bench_passwords.py
+"""Cost per login attempt of the configured password hashing methods.
+
+For each method, times ``--attempts`` verifications through the app's
+password hasher with ``--concurrency`` client threads and a pool of the
+same size, and reports latency percentiles and attempts per second. Exits
+non-zero when a method's p95 exceeds ``--target-ms``, so a cost increase
+that would make logins too slow is caught before it ships.
+
+    python -m benchmarks.bench_passwords --method scrypt:32768:8:1 --method pbkdf2:sha256:600000 --target-ms 250
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import create_app
+from benchmarks.bench_api import percentile
+from extensions import password_hasher
+
+DEFAULT_TARGET_MS = 250.0
+PASSWORD = 'correct horse battery staple'
+
+
+def measure(method, attempts=50, concurrency=1):
+    """Return ``{'p50_ms', 'p95_ms', 'p99_ms', 'attempts_per_second'}`` for ``method``."""
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'PASSWORD_HASH_METHOD': method,
+        'PASSWORD_HASH_WORKERS': concurrency,
+        'PASSWORD_HASH_MAX_PENDING': max(concurrency, attempts),
+    })
+
+    def attempt(pwhash):
+        with app.app_context():
+            started = time.perf_counter()
+            if not password_hasher.verify(pwhash, PASSWORD):
+                raise RuntimeError(f'{method} failed to verify its own hash')
+            return time.perf_counter() - started
+
+    with app.app_context():
+        pwhash = password_hasher.hash(PASSWORD)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = sorted(executor.map(attempt, [pwhash] * attempts))
+    wall = time.perf_counter() - started
+
+    return {
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'attempts_per_second': round(attempts / wall, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--method', action='append', help='Werkzeug hash method; repeat to compare (default: the app setting)')
+    parser.add_argument('--attempts', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=1, help='Parallel attempts; above the core count latency includes queueing')
+    parser.add_argument('--target-ms', type=float, default=DEFAULT_TARGET_MS, help='Maximum p95 per attempt')
+    parser.add_argument('--output', help='Also write results to this JSON file')
+    args = parser.parse_args()
+
+    methods = args.method or [create_app().config['PASSWORD_HASH_METHOD']]
+    results = {}
+    for method in methods:
+        results[method] = result = measure(method, args.attempts, args.concurrency)
+        print(f"{method:<24} p50={result['p50_ms']:.1f}ms p95={result['p95_ms']:.1f}ms "
+              f"p99={result['p99_ms']:.1f}ms {result['attempts_per_second']:.1f} attempts/s")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    slow = [method for method, result in results.items() if result['p95_ms'] > args.target_ms]
+    for method in slow:
+        print(f'{method}: p95 {results[method]["p95_ms"]}ms exceeds the {args.target_ms:g}ms target')
+    sys.exit(1 if slow else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+# benchmarks/bench_serialization.py
+"""Encode time and payload size of an incident listing page per encoder.
+
+Serializes and encodes a page of ``--incidents`` ORM incidents (the work
+``GET /incidents/?per_page=N`` does after its query) ``--repeat`` times with:
+
+* ``stdlib``: the previous hand-built dicts (``isoformat()`` and ``float()``
+  per row) through the stdlib encoder, as Flask's default provider does
+* ``orjson``: the precompiled serializer through ``FastJSONProvider``
+* ``msgpack``: the precompiled serializer through MessagePack, when installed
+
+and reports median and p95 time per page and raw and gzipped payload size.
+
+    python -m benchmarks.bench_serialization --incidents 1000 --repeat 50
+"""
+import argparse
+import gzip
+import json
+import time
+from datetime import datetime, timedelta
+
+from app import create_app
+from benchmarks.bench_api import percentile
+from models import Incident, User
+from serialization import encode_default, msgpack, orjson, serialize_incident_row
+
+
+def _incidents(count):
+    reporters = [User(id=i, username=f'reporter{i}') for i in range(1, 51)]
+    start = datetime(2026, 1, 1, 8, 30)
+    return [
+        Incident(id=i, title=f'Incident {i} on Mombasa Road', description='Two vehicles collided near the junction.',
+                 type='Accident', status='pending', latitude=-1.28 - i / 10000, longitude=36.82 + i / 10000,
+                 created_at=start + timedelta(seconds=37 * i, microseconds=i), user=reporters[i % 50])
+        for i in range(count)
+    ]
+
+
+def _legacy_row(incident):
+    return {
+        'id': incident.id,
+        'title': incident.title,
+        'description': incident.description,
+        'type': incident.type,
+        'latitude': float(incident.latitude),
+        'longitude': float(incident.longitude),
+        'status': incident.status,
+        'created_at': incident.created_at.isoformat(),
+        'reporter': incident.user.username
+    }
+
+
+def _page(items):
+    return {'total': len(items), 'pages': 1, 'current_page': 1, 'incidents': items}
+
+
+def encoders(app):
+    """``{name: incidents -> bytes}`` for every encoder available here."""
+    def stdlib(incidents):
+        page = _page([_legacy_row(incident) for incident in incidents])
+        return json.dumps(page, sort_keys=True, separators=(',', ':')).encode()
+
+    def fast_json(incidents):
+        return app.json.dumps(_page([serialize_incident_row(incident) for incident in incidents])).encode()
+
+    def message_pack(incidents):
+        return msgpack.packb(_page([serialize_incident_row(incident) for incident in incidents]), default=encode_default)
+
+    available = {'stdlib': stdlib}
+    if orjson is not None:
+        available['orjson'] = fast_json
+    if msgpack is not None:
+        available['msgpack'] = message_pack
+    return available
+
+
+def measure(incidents=1000, repeat=50):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+    rows = _incidents(incidents)
+    results = {}
+    for name, encode in encoders(app).items():
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            body = encode(rows)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        results[name] = {
+            'p50_ms': round(percentile(timings, 50) * 1000, 3),
+            'p95_ms': round(percentile(timings, 95) * 1000, 3),
+            'bytes': len(body),
+            'gzip_bytes': len(gzip.compress(body)),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--incidents', type=int, default=1000, help='Incidents per page')
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--output', help='Also write results to this JSON file')
+    args = parser.parse_args()
+
+    results = measure(args.incidents, args.repeat)
+    for name, result in results.items():
+        print(f"{name:<8} p50={result['p50_ms']:.2f}ms p95={result['p95_ms']:.2f}ms "
+              f"{result['bytes']} bytes ({result['gzip_bytes']} gzipped)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
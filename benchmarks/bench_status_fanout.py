@@ -0,0 +1,101 @@
+# benchmarks/bench_status_fanout.py
+"""Throughput of status-change fan-out against a local fake Mailjet server.
+
+Compares the batched, pooled outbox worker with the previous pattern of one
+single-message request (and one fresh connection) per recipient.
+
+    python -m benchmarks.bench_status_fanout --recipients 1000 --latency-ms 20
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import requests
+
+from app import create_app
+from benchmarks.fake_mailjet import FakeMailjetServer
+from email_outbox import EmailWorker, MailjetTransport
+from models import db, Incident, OutboundEmail, User
+from notifications import queue_status_change_notifications
+
+
+class UnpooledSingleMessageTransport:
+    """The old behaviour: one request per message, no connection reuse."""
+
+    def __init__(self, api_url):
+        self.url = api_url.rstrip('/') + '/v3.1/send'
+
+    def send_batch(self, messages):
+        outcomes = []
+        for message in messages:
+            response = requests.post(self.url, data=json.dumps({'Messages': [message]}),
+                                     headers={'Content-Type': 'application/json'}, timeout=30)
+            outcomes.append((response.status_code == 200, None))
+        return outcomes
+
+
+def _setup(recipients):
+    db.drop_all()
+    db.create_all()
+    reporter = User(username='reporter', email='reporter@example.com', password_hash='x')
+    db.session.add(reporter)
+    db.session.flush()
+    db.session.execute(User.__table__.insert(), [
+        {'username': f'admin{i}', 'email': f'admin{i}@example.com', 'password_hash': 'x',
+         'is_admin': True, 'notify_status_changes': True}
+        for i in range(recipients - 1)
+    ])
+    incident = Incident(user_id=reporter.id, title='Benchmark incident', description='d',
+                        type='Accident', latitude=-1.28, longitude=36.82)
+    db.session.add(incident)
+    db.session.commit()
+    return incident
+
+
+def _run(label, recipients, transport, batch_size, concurrency, server):
+    incident = _setup(recipients)
+    requests_before = server.requests
+
+    started = time.perf_counter()
+    queued = queue_status_change_notifications(incident, 'pending', 'in_progress')
+    db.session.commit()
+    enqueue_seconds = time.perf_counter() - started
+
+    worker = EmailWorker(transport, batch_size=batch_size, concurrency=concurrency)
+    started = time.perf_counter()
+    while worker.run_once():
+        pass
+    send_seconds = time.perf_counter() - started
+    worker.shutdown()
+
+    sent = OutboundEmail.query.filter_by(status='sent').count()
+    print(f"{label:<28} queued={queued} sent={sent} enqueue={enqueue_seconds * 1000:.1f}ms "
+          f"send={send_seconds:.2f}s throughput={sent / send_seconds:.0f} msg/s "
+          f"http_requests={server.requests - requests_before}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--recipients', type=int, default=1000)
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='Simulated Mailjet latency per request')
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            'RESPONSE_CACHE_ENABLED': False,
+        })
+        with app.app_context(), FakeMailjetServer(latency=args.latency_ms / 1000) as server:
+            _run('batched + pooled session', args.recipients,
+                 MailjetTransport('key', 'secret', api_url=server.url, pool_size=args.concurrency),
+                 batch_size=50, concurrency=args.concurrency, server=server)
+            _run('one request per message', args.recipients,
+                 UnpooledSingleMessageTransport(server.url),
+                 batch_size=1, concurrency=args.concurrency, server=server)
+
+
+if __name__ == '__main__':
+    main()
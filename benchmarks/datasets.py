@@ -0,0 +1,33 @@
+# benchmarks/datasets.py
+"""Cached synthetic datasets for benchmarks, built with ``seed.seed_database``."""
+import os
+
+from models import db
+from seed import seed_database
+
+BENCH_PASSWORD = 'benchmark-password'
+
+
+def dataset_path(users, incidents, directory=None):
+    directory = directory or os.path.join(os.path.dirname(__file__), '.data')
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f'bench-{users}u-{incidents}i.db')
+
+
+def ensure_dataset(users, incidents, directory=None):
+    """Return a SQLite URL for a dataset of the given size, building it once.
+
+    User 1 is an admin and every user's password is ``BENCH_PASSWORD``.
+    """
+    from app import create_app
+
+    path = dataset_path(users, incidents, directory)
+    url = f'sqlite:///{path}'
+    if not os.path.exists(path):
+        app = create_app({'SQLALCHEMY_DATABASE_URI': url})
+        with app.app_context():
+            db.create_all()
+            seed_database(users, incidents, password=BENCH_PASSWORD, chunk_size=10000, seed=42)
+            db.session.execute(db.text('ANALYZE'))
+            db.session.commit()
+    return url
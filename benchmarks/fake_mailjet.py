@@ -0,0 +1,69 @@
+# benchmarks/fake_mailjet.py
+"""A local HTTP server that answers like Mailjet's v3.1 Send API."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, so connection reuse is observable
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        messages = json.loads(body).get('Messages', [])
+
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.messages += len(messages)
+            server.connections.add(self.client_address)
+        if server.latency:
+            time.sleep(server.latency)
+
+        payload = json.dumps({'Messages': [
+            {'Status': 'success', 'To': [{'Email': to['Email'], 'MessageID': 1}]}
+            for message in messages for to in message.get('To', [])[:1]
+        ]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeMailjetServer:
+    """Context manager; ``url`` can be passed as ``MAILJET_API_URL``."""
+
+    def __init__(self, latency=0.0):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.lock = threading.Lock()
+        self.httpd.requests = 0
+        self.httpd.messages = 0
+        self.httpd.connections = set()
+        self.httpd.latency = latency
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}/'
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    @property
+    def messages(self):
+        return self.httpd.messages
+
+    @property
+    def connections(self):
+        return len(self.httpd.connections)
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
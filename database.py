@@ -0,0 +1,117 @@
+# database.py
+"""Database URL, engine tuning and read-replica routing."""
+import os
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.sql import Select
+
+SQLITE_PRAGMAS = {
+    # Readers no longer block the writer (and vice versa) across processes
+    'journal_mode': 'WAL',
+    # Safe with WAL: only the last transactions can be lost on power failure
+    'synchronous': 'NORMAL',
+    # Off by default in SQLite; the schema relies on ON DELETE CASCADE
+    'foreign_keys': 'ON',
+}
+
+
+def normalize_url(url):
+    # Heroku/Render hand out postgres:// which SQLAlchemy 1.4+ rejects
+    if url and url.startswith('postgres://'):
+        return 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def database_url(instance_path):
+    default = f"sqlite:///{os.path.join(instance_path, 'ajali.db')}"
+    return normalize_url(os.getenv('DATABASE_URL', default))
+
+
+def engine_options(url):
+    """Pool settings for server databases; SQLite is tuned with PRAGMAs on connect."""
+    if url.startswith('sqlite'):
+        return {}
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),
+        # Drop connections the server or a proxy may have silently closed
+        'pool_pre_ping': True,
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+    }
+
+
+def _sqlite_on_connect(busy_timeout_ms):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f'PRAGMA busy_timeout = {int(busy_timeout_ms)}')
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+    return on_connect
+
+
+def configure_engines(app, db):
+    """Tune every engine the app uses and create the read-replica engine.
+
+    The replica is kept out of ``SQLALCHEMY_BINDS`` on purpose: binds get
+    their own metadata and would be targeted by ``create_all`` and
+    migrations, while the replica is read-only.
+    """
+    busy_timeout_ms = app.config.get('SQLITE_BUSY_TIMEOUT_MS', 5000)
+    with app.app_context():
+        engines = list(db.engines.values())
+
+    replica_url = normalize_url(app.config.get('DATABASE_REPLICA_URL'))
+    replica = create_engine(replica_url, **engine_options(replica_url)) if replica_url else None
+    if replica is not None:
+        engines.append(replica)
+    app.extensions['read_replica'] = replica
+
+    for engine in engines:
+        if engine.dialect.name == 'sqlite':
+            event.listen(engine, 'connect', _sqlite_on_connect(busy_timeout_ms))
+
+
+class RoutingSession(Session):
+    """Send SELECTs to the replica engine inside views marked ``read_replica``.
+
+    Flushes and any UPDATE/DELETE always go to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and isinstance(clause, Select)
+            and has_app_context()
+            and g.get('use_read_replica')
+        ):
+            replica = current_app.extensions.get('read_replica')
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def replica_reads():
+    """Route SELECTs in this block to the replica when one is configured."""
+    previous = g.get('use_read_replica', False)
+    g.use_read_replica = True
+    try:
+        yield
+    finally:
+        g.use_read_replica = previous
+
+
+def read_replica(view):
+    """Serve a read-only view from the replica when one is configured."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with replica_reads():
+            return view(*args, **kwargs)
+    return wrapper
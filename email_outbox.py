@@ -0,0 +1,285 @@
+# email_outbox.py
+"""Durable outbound email queue.
+
+Routes call ``enqueue_email`` inside the same transaction as the row the email
+is about, so an email is queued if and only if that write commits. A separate
+worker process (``flask email-worker``) claims due rows, sends them to Mailjet
+in batches from a thread pool and records every attempt as a ``Notification``.
+Failed sends are retried with exponential backoff until ``max_attempts``,
+after which the row is parked in the ``dead`` state for inspection.
+"""
+import json
+import os
+import random
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import and_, insert, or_, select, update
+
+from models import db, Notification, OutboundEmail
+
+# Mailjet's v3.1 Send API accepts at most 50 messages per request
+MAILJET_MAX_BATCH = 50
+
+
+def enqueue_email(user_id, message, kind, incident_id=None):
+    """Queue a Mailjet message; the caller owns the transaction and commits."""
+    email = OutboundEmail(
+        user_id=user_id,
+        incident_id=incident_id,
+        kind=kind,
+        message=json.dumps(message),
+    )
+    db.session.add(email)
+    return email
+
+
+class MailjetTransport:
+    """Mailjet v3.1 Send API over one pooled HTTP session.
+
+    ``mailjet_rest.Client`` opens a fresh connection per call; reusing a
+    keep-alive pool saves a TCP and TLS handshake on every batch.
+    """
+
+    def __init__(self, api_key, api_secret, api_url='https://api.mailjet.com/', pool_size=4, timeout=30):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.url = api_url.rstrip('/') + '/v3.1/send'
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.auth = (api_key, api_secret)
+        self.session.headers['Content-Type'] = 'application/json'
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def send_batch(self, messages):
+        """Send up to 50 messages; return one ``(ok, error)`` per message."""
+        result = self.session.post(self.url, data=json.dumps({'Messages': messages}), timeout=self.timeout)
+        try:
+            statuses = result.json().get('Messages', [])
+        except ValueError:
+            statuses = []
+
+        if len(statuses) != len(messages):
+            error = f'Mailjet returned HTTP {result.status_code}'
+            return [(False, error)] * len(messages)
+
+        outcomes = []
+        for status in statuses:
+            if status.get('Status') == 'success':
+                outcomes.append((True, None))
+            else:
+                outcomes.append((False, json.dumps(status.get('Errors', status))))
+        return outcomes
+
+    def close(self):
+        self.session.close()
+
+
+class FakeMailjetTransport:
+    """In-memory stand-in for tests and local development.
+
+    ``fail`` is an optional predicate on a message; matching messages are
+    reported as failed.
+    """
+
+    def __init__(self, fail=None):
+        self.fail = fail
+        self.batches = []
+        self._lock = threading.Lock()
+
+    @property
+    def sent(self):
+        return [message for batch in self.batches for message in batch]
+
+    def send_batch(self, messages):
+        with self._lock:
+            self.batches.append(list(messages))
+        return [
+            (False, 'fake failure') if self.fail and self.fail(message) else (True, None)
+            for message in messages
+        ]
+
+
+def make_transport(app):
+    transport = app.config.get('EMAIL_TRANSPORT', 'mailjet')
+    if transport == 'mailjet':
+        return MailjetTransport(
+            os.getenv('MJ_APIKEY_PUBLIC'),
+            os.getenv('MJ_APIKEY_PRIVATE'),
+            api_url=app.config.get('MAILJET_API_URL', 'https://api.mailjet.com/'),
+            pool_size=app.config.get('EMAIL_WORKER_CONCURRENCY', 4),
+        )
+    if transport == 'fake':
+        return FakeMailjetTransport()
+    if hasattr(transport, 'send_batch'):
+        return transport
+    raise ValueError(f'Unknown EMAIL_TRANSPORT: {transport!r}')
+
+
+class EmailWorker:
+    def __init__(self, transport, batch_size=MAILJET_MAX_BATCH, concurrency=4, max_attempts=5,
+                 base_backoff=30, max_backoff=3600, lease_seconds=300):
+        self.transport = transport
+        self.batch_size = min(batch_size, MAILJET_MAX_BATCH)
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.lease_seconds = lease_seconds
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='email-worker')
+
+    @classmethod
+    def from_app(cls, app, **overrides):
+        options = {
+            'batch_size': app.config.get('EMAIL_WORKER_BATCH_SIZE', MAILJET_MAX_BATCH),
+            'concurrency': app.config.get('EMAIL_WORKER_CONCURRENCY', 4),
+            'max_attempts': app.config.get('EMAIL_MAX_ATTEMPTS', 5),
+            'base_backoff': app.config.get('EMAIL_RETRY_BASE_SECONDS', 30),
+            'max_backoff': app.config.get('EMAIL_RETRY_MAX_SECONDS', 3600),
+        }
+        options.update({k: v for k, v in overrides.items() if v is not None})
+        return cls(make_transport(app), **options)
+
+    def backoff(self, attempts):
+        delay = min(self.base_backoff * 2 ** (attempts - 1), self.max_backoff)
+        # Jitter keeps a burst of failures from retrying in lockstep
+        return timedelta(seconds=delay * random.uniform(0.9, 1.1))
+
+    def _due(self, now):
+        return or_(
+            and_(OutboundEmail.status == 'pending', OutboundEmail.next_attempt_at <= now),
+            # Rows whose worker died mid-send become claimable after the lease
+            and_(OutboundEmail.status == 'sending',
+                 OutboundEmail.claimed_at < now - timedelta(seconds=self.lease_seconds)),
+        )
+
+    def claim(self, limit):
+        now = datetime.utcnow()
+        ids = db.session.scalars(
+            select(OutboundEmail.id).where(self._due(now)).order_by(OutboundEmail.next_attempt_at, OutboundEmail.id).limit(limit)
+        ).all()
+        if not ids:
+            return []
+
+        # Re-check the due condition in the UPDATE so concurrent workers never double-claim
+        token = uuid.uuid4().hex
+        db.session.execute(
+            update(OutboundEmail)
+            .where(OutboundEmail.id.in_(ids), self._due(now))
+            .values(status='sending', claim_token=token, claimed_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return db.session.scalars(
+            select(OutboundEmail).where(OutboundEmail.claim_token == token).order_by(OutboundEmail.id)
+        ).all()
+
+    def _send(self, messages):
+        try:
+            return self.transport.send_batch(messages)
+        except Exception as e:
+            return [(False, str(e))] * len(messages)
+
+    def run_once(self):
+        """Claim and send one round of due emails; return how many were attempted."""
+        rows = self.claim(self.batch_size * self.concurrency)
+        if not rows:
+            return 0
+
+        batches = [rows[i:i + self.batch_size] for i in range(0, len(rows), self.batch_size)]
+        # Decode on this thread; pool threads only touch plain dicts, never ORM rows
+        payloads = [[json.loads(row.message) for row in batch] for batch in batches]
+        outcomes = self._executor.map(self._send, payloads)
+
+        now = datetime.utcnow()
+        notifications = []
+        for batch, results in zip(batches, outcomes):
+            for row, (ok, error) in zip(batch, results):
+                attempts = row.attempts + 1
+                values = {'attempts': attempts, 'claim_token': None}
+                if ok:
+                    values.update(status='sent', sent_at=now, last_error=None)
+                else:
+                    values['last_error'] = error
+                    if attempts >= self.max_attempts:
+                        values['status'] = 'dead'
+                    else:
+                        values.update(status='pending', next_attempt_at=now + self.backoff(attempts))
+
+                # Skip rows another worker reclaimed after our lease expired; its outcome wins
+                result = db.session.execute(
+                    update(OutboundEmail)
+                    .where(OutboundEmail.id == row.id, OutboundEmail.claim_token == row.claim_token)
+                    .values(**values)
+                    .execution_options(synchronize_session=False)
+                )
+                if not result.rowcount:
+                    continue
+
+                notifications.append({
+                    'user_id': row.user_id,
+                    'incident_id': row.incident_id,
+                    'channel': 'email',
+                    'message': row.kind,
+                    'sent_at': now,
+                    'status': 'sent' if ok else 'failed',
+                })
+
+        if notifications:
+            db.session.execute(insert(Notification), notifications)
+        db.session.commit()
+        return len(rows)
+
+    def run_forever(self, poll_interval=5, stop_event=None):
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            try:
+                attempted = self.run_once()
+            except Exception:
+                db.session.rollback()
+                current_app.logger.exception('Email worker round failed')
+                attempted = 0
+            if not attempted:
+                stop_event.wait(poll_interval)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+        if hasattr(self.transport, 'close'):
+            self.transport.close()
+
+
+@click.command('email-worker')
+@click.option('--once', is_flag=True, help='Process one round of due emails and exit.')
+@click.option('--concurrency', type=int, help='Parallel Mailjet requests.')
+@click.option('--batch-size', type=int, help='Messages per Mailjet request (max 50).')
+@click.option('--poll-interval', type=float, default=5.0, show_default=True)
+@with_appcontext
+def email_worker_command(once, concurrency, batch_size, poll_interval):
+    """Send queued emails from the outbox."""
+    worker = EmailWorker.from_app(current_app, concurrency=concurrency, batch_size=batch_size)
+    try:
+        if once:
+            click.echo(f'Attempted {worker.run_once()} emails')
+        else:
+            worker.run_forever(poll_interval)
+    finally:
+        worker.shutdown()
+
+
+if __name__ == '__main__':
+    from app import create_app
+
+    with create_app().app_context():
+        worker = EmailWorker.from_app(current_app)
+        try:
+            worker.run_forever()
+        finally:
+            worker.shutdown()
@@ -1,10 +1,23 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 from flask_migrate import Migrate
+from response_cache import ResponseCache
+from media_pipeline import MediaPipeline
+from tile_cache import TileCache
+from identity import IdentityCache
+from passwords import PasswordHasher
+from rate_limit import RateLimiter
+from database import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 jwt = JWTManager()
 migrate = Migrate()
+response_cache = ResponseCache()
+media_pipeline = MediaPipeline()
+tile_cache = TileCache()
+identity_cache = IdentityCache()
+password_hasher = PasswordHasher()
+rate_limiter = RateLimiter()
 
 @jwt.user_identity_loader
 def user_identity_lookup(user_id):
@@ -12,6 +25,5 @@ def user_identity_lookup(user_id):
 
 @jwt.user_lookup_loader
 def user_lookup_callback(_jwt_header, jwt_data):
-    from models import User
-    identity = jwt_data["sub"]
-    return User.query.get(identity)
+    # A cached read-only snapshot, not a session-bound User
+    return identity_cache.load(jwt_data["sub"])
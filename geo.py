@@ -0,0 +1,184 @@
+# geo.py
+import math
+
+GEOHASH_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+
+# Upper bound on geohash cells used to cover a bounding box. More cells means a
+# tighter cover but a longer OR of index ranges.
+MAX_COVER_CELLS = 24
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        rng, value = (lng_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(chars)
+
+
+def decode_geohash(geohash):
+    """Return the cell's (min_lat, min_lng, max_lat, max_lng) bounds."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        bits = _BASE32.index(char)
+        for shift in range(4, -1, -1):
+            rng = lng_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if bits >> shift & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return lat_range[0], lng_range[0], lat_range[1], lng_range[1]
+
+
+def cell_size(precision):
+    """Return (lat_degrees, lng_degrees) covered by one geohash cell."""
+    total_bits = 5 * precision
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def split_bbox(min_lng, min_lat, max_lng, max_lat):
+    """Split a bbox crossing the antimeridian into two that do not."""
+    if min_lng <= max_lng:
+        return [(min_lng, min_lat, max_lng, max_lat)]
+    return [(min_lng, min_lat, 180.0, max_lat), (-180.0, min_lat, max_lng, max_lat)]
+
+
+def bbox_for_radius(latitude, longitude, radius_km):
+    """Smallest lat/lng box (possibly wrapping) containing the circle."""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat = max(-90.0, latitude - dlat)
+    max_lat = min(90.0, latitude + dlat)
+
+    # Near the poles the circle covers every longitude
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if max_lat >= 90.0 or min_lat <= -90.0 or cos_lat <= 1e-12:
+        return (-180.0, min_lat, 180.0, max_lat)
+
+    dlng = math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat))
+    if dlng >= 180.0:
+        return (-180.0, min_lat, 180.0, max_lat)
+
+    min_lng = longitude - dlng
+    max_lng = longitude + dlng
+    if min_lng < -180.0:
+        min_lng += 360.0
+    if max_lng > 180.0:
+        max_lng -= 360.0
+    return (min_lng, min_lat, max_lng, max_lat)
+
+
+def _cells_for_box(min_lng, min_lat, max_lng, max_lat, precision):
+    lat_step, lng_step = cell_size(precision)
+    lat_cells = 1 << ((5 * precision) // 2)
+    lng_cells = 1 << ((5 * precision + 1) // 2)
+
+    i0 = min(int((min_lng + 180.0) // lng_step), lng_cells - 1)
+    i1 = min(int((max_lng + 180.0) // lng_step), lng_cells - 1)
+    j0 = min(int((min_lat + 90.0) // lat_step), lat_cells - 1)
+    j1 = min(int((max_lat + 90.0) // lat_step), lat_cells - 1)
+    return i0, i1, j0, j1, lat_step, lng_step
+
+
+def cover_bbox(min_lng, min_lat, max_lng, max_lat, max_cells=MAX_COVER_CELLS):
+    """Return geohash prefixes whose union covers the bbox.
+
+    Picks the finest precision whose cover stays within ``max_cells`` so the
+    index ranges prune as tightly as possible.
+    """
+    boxes = split_bbox(min_lng, min_lat, max_lng, max_lat)
+
+    best = None
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        count = 0
+        for box in boxes:
+            i0, i1, j0, j1, _, _ = _cells_for_box(*box, precision)
+            count += (i1 - i0 + 1) * (j1 - j0 + 1)
+        if count > max_cells:
+            break
+        best = precision
+
+    if best is None:
+        # Even single-character cells exceed the budget: scan everything
+        return ['']
+
+    prefixes = set()
+    for box in boxes:
+        i0, i1, j0, j1, lat_step, lng_step = _cells_for_box(*box, best)
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                center_lng = -180.0 + (i + 0.5) * lng_step
+                center_lat = -90.0 + (j + 0.5) * lat_step
+                prefixes.add(encode_geohash(center_lat, center_lng, best))
+    return sorted(prefixes)
+
+
+def prefix_range(prefix):
+    """Half-open string range [low, high) matching every hash with ``prefix``."""
+    # '{' sorts directly after 'z', the last geohash character
+    return prefix, prefix + '{'
+
+
+# Web Mercator stops short of the poles
+MAX_MERCATOR_LAT = 85.0511287798066
+
+
+def tile_bounds(z, x, y):
+    """Return the (min_lng, min_lat, max_lng, max_lat) of a Web Mercator (slippy map) tile."""
+    n = 1 << z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+
+def tile_position(latitude, longitude, z):
+    """Fractional (x, y) tile coordinates of a point at zoom ``z``."""
+    n = 1 << z
+    latitude = max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, latitude))
+    lat_rad = math.radians(latitude)
+    x = (longitude + 180.0) / 360.0 * n
+    y = (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n
+    return x, y
+
+
+def tile_for_point(latitude, longitude, z):
+    n = 1 << z
+    x, y = tile_position(latitude, longitude, z)
+    return min(int(x), n - 1), min(int(y), n - 1)
@@ -0,0 +1,118 @@
+# identity.py
+"""The user behind a JWT, without a database round trip per request.
+
+``extensions.user_lookup_callback`` resolves the token's identity through
+``IdentityCache``: a read-only ``Identity`` snapshot of the user row kept for
+``JWT_USER_CACHE_TTL`` seconds. Views read it through flask_jwt_extended's
+``current_user`` and gate admin-only endpoints with ``admin_required``.
+
+Committing a change to, or the deletion of, a user drops their snapshot in
+this process; other workers pick it up when their copy expires, so the TTL
+is the longest a demoted admin keeps their rights elsewhere.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from functools import wraps
+
+from flask import current_app, has_app_context, jsonify
+from flask_jwt_extended import current_user, verify_jwt_in_request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+IDENTITY_FIELDS = ('id', 'username', 'email', 'phone', 'is_admin', 'notify_status_changes')
+
+Identity = namedtuple('Identity', IDENTITY_FIELDS)
+
+
+class IdentityCache:
+    """LRU + TTL map of user id to ``Identity``, guarded by a lock."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('JWT_USER_CACHE_TTL', 30)
+        app.config.setdefault('JWT_USER_CACHE_MAX_ENTRIES', 10000)
+        app.extensions['identity_cache'] = {'entries': OrderedDict(), 'lock': threading.Lock()}
+
+    @property
+    def _state(self):
+        return current_app.extensions['identity_cache']
+
+    def get(self, user_id):
+        state = self._state
+        with state['lock']:
+            entry = state['entries'].get(user_id)
+            if entry is None:
+                return None
+            expires_at, identity = entry
+            if expires_at <= time.monotonic():
+                del state['entries'][user_id]
+                return None
+            state['entries'].move_to_end(user_id)
+            return identity
+
+    def set(self, identity):
+        state = self._state
+        ttl = current_app.config['JWT_USER_CACHE_TTL']
+        with state['lock']:
+            state['entries'][identity.id] = (time.monotonic() + ttl, identity)
+            state['entries'].move_to_end(identity.id)
+            while len(state['entries']) > current_app.config['JWT_USER_CACHE_MAX_ENTRIES']:
+                state['entries'].popitem(last=False)
+
+    def invalidate(self, user_ids):
+        state = self._state
+        with state['lock']:
+            for user_id in user_ids:
+                state['entries'].pop(user_id, None)
+
+    def load(self, user_id):
+        """Return the ``Identity`` for ``user_id``, or None when there is no such user."""
+        from models import db, User
+
+        user_id = int(user_id)
+        identity = self.get(user_id)
+        if identity is not None:
+            return identity
+        row = db.session.execute(
+            db.select(*(getattr(User, name) for name in IDENTITY_FIELDS)).where(User.id == user_id)
+        ).first()
+        if row is None:
+            return None
+        identity = Identity(*row)
+        self.set(identity)
+        return identity
+
+
+def user_changed(session, user_id):
+    """Drop ``user_id``'s cached identity once ``session`` commits."""
+    session.info.setdefault('changed_users', set()).add(user_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def forget_changed_users(session):
+    user_ids = session.info.pop('changed_users', None)
+    if user_ids and has_app_context():
+        from extensions import identity_cache
+        identity_cache.invalidate(user_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def forget_rolled_back_user_changes(session):
+    session.info.pop('changed_users', None)
+
+
+def admin_required():
+    """Like ``jwt_required()``, answering 403 unless the token's user is an admin."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            verify_jwt_in_request()
+            if not current_user.is_admin:
+                return jsonify({'message': 'Unauthorized'}), 403
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
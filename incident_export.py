@@ -0,0 +1,218 @@
+# incident_export.py
+"""Streaming bulk export of incidents as NDJSON, CSV or GeoJSON.
+
+Incidents are read with ``yield_per`` (a server-side cursor where the driver
+supports one) and media and status history are fetched per batch with
+``selectinload``, so the export costs three queries per batch and memory
+stays flat however large the table is. Output is assembled into ~64KB
+chunks and optionally gzipped on the fly.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy.orm import contains_eager, raiseload, selectinload
+from werkzeug.datastructures import MultiDict
+
+from database import replica_reads
+from geo import bbox_for_radius, haversine_km
+from incident_queries import apply_filters, parse_spatial_args, within_bbox
+from models import db, Incident, Media, StatusHistory, User
+
+BATCH_SIZE = 1000
+CHUNK_BYTES = 64 * 1024
+
+CSV_COLUMNS = [
+    'id', 'title', 'description', 'type', 'status', 'latitude', 'longitude',
+    'created_at', 'updated_at', 'reporter_id', 'reporter_username', 'reporter_email',
+    'media_urls', 'status_history',
+]
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def export_query(args):
+    """Build the export query from listing-style filters.
+
+    Returns ``(query, near)``; rows within the ``near`` bounding box still
+    need the exact distance check done by ``iter_records``. Raises
+    ValueError on bad filters.
+    """
+    bbox, near = parse_spatial_args(args)
+    query = (
+        db.session.query(Incident)
+        .join(Incident.user)
+        .options(
+            contains_eager(Incident.user).load_only(User.username, User.email, raiseload=True),
+            selectinload(Incident.media).load_only(Media.file_url, raiseload=True),
+            selectinload(Incident.history).load_only(
+                StatusHistory.old_status, StatusHistory.new_status, StatusHistory.changed_by,
+                StatusHistory.changed_at, StatusHistory.note, raiseload=True,
+            ),
+            raiseload('*'),
+        )
+    )
+    query = apply_filters(query, args)
+    if bbox:
+        query = query.filter(within_bbox(bbox))
+    if near:
+        query = query.filter(within_bbox(bbox_for_radius(*near)))
+    return query.order_by(Incident.created_at.desc(), Incident.id.desc()), near
+
+
+def export_record(incident):
+    history = sorted(incident.history, key=lambda h: (h.changed_at or datetime.min, h.id))
+    return {
+        'id': incident.id,
+        'title': incident.title,
+        'description': incident.description,
+        'type': incident.type,
+        'status': incident.status,
+        'latitude': incident.latitude,
+        'longitude': incident.longitude,
+        'created_at': _isoformat(incident.created_at),
+        'updated_at': _isoformat(incident.updated_at),
+        'reporter': {
+            'id': incident.user_id,
+            'username': incident.user.username,
+            'email': incident.user.email,
+        },
+        'media': [media.file_url for media in incident.media if media.file_url],
+        'status_history': [
+            {
+                'old_status': h.old_status,
+                'new_status': h.new_status,
+                'changed_by': h.changed_by,
+                'changed_at': _isoformat(h.changed_at),
+                'note': h.note,
+            }
+            for h in history
+        ],
+    }
+
+
+def iter_records(query, near=None, batch_size=BATCH_SIZE):
+    with replica_reads():
+        for incident in query.yield_per(batch_size):
+            if near:
+                lat, lng, radius_km = near
+                if haversine_km(lat, lng, incident.latitude, incident.longitude) > radius_km:
+                    continue
+            yield export_record(incident)
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+def write_ndjson(records):
+    for record in records:
+        yield _dumps(record) + '\n'
+
+
+def write_csv(records):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for record in records:
+        reporter = record['reporter']
+        writer.writerow([
+            record['id'], record['title'], record['description'], record['type'], record['status'],
+            record['latitude'], record['longitude'], record['created_at'], record['updated_at'],
+            reporter['id'], reporter['username'], reporter['email'],
+            ' '.join(record['media']), _dumps(record['status_history']),
+        ])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def write_geojson(records):
+    yield '{"type":"FeatureCollection","features":[\n'
+    separator = ''
+    for record in records:
+        lat = record.pop('latitude')
+        lng = record.pop('longitude')
+        geometry = {'type': 'Point', 'coordinates': [lng, lat]} if lat is not None and lng is not None else None
+        feature = {'type': 'Feature', 'id': record['id'], 'geometry': geometry, 'properties': record}
+        yield separator + _dumps(feature)
+        separator = ',\n'
+    yield '\n]}\n'
+
+
+# format -> (writer, mimetype, file extension)
+EXPORT_FORMATS = {
+    'ndjson': (write_ndjson, 'application/x-ndjson', 'ndjson'),
+    'csv': (write_csv, 'text/csv', 'csv'),
+    'geojson': (write_geojson, 'application/geo+json', 'geojson'),
+}
+
+
+def encode_chunks(pieces, compress=False, chunk_bytes=CHUNK_BYTES):
+    """Join text pieces into byte chunks of about ``chunk_bytes``, gzipping if asked."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+    buffer = []
+    size = 0
+
+    def emit(data):
+        return compressor.compress(data) if compressor else data
+
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_bytes:
+            data = emit(''.join(buffer).encode())
+            buffer = []
+            size = 0
+            if data:
+                yield data
+    if buffer:
+        data = emit(''.join(buffer).encode())
+        if data:
+            yield data
+    if compressor:
+        yield compressor.flush()
+
+
+def stream_export(query, near, fmt, compress=False):
+    writer = EXPORT_FORMATS[fmt][0]
+    return encode_chunks(writer(iter_records(query, near)), compress=compress)
+
+
+def export_filename(fmt):
+    return f"incidents-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{EXPORT_FORMATS[fmt][2]}"
+
+
+@click.command('export-incidents')
+@click.option('--format', 'fmt', type=click.Choice(list(EXPORT_FORMATS)), default='ndjson', show_default=True)
+@click.option('--output', '-o', type=click.Path(allow_dash=True), default='-', show_default=True,
+              help='File to write; "-" for stdout.')
+@click.option('--gzip', 'compress', is_flag=True, help='Gzip the output (implied by a .gz output name).')
+@click.option('--status')
+@click.option('--type', 'incident_type')
+@click.option('--reporter', help='Reporter username.')
+@click.option('--bbox', help='min_lng,min_lat,max_lng,max_lat')
+@click.option('--near', help='lat,lng')
+@click.option('--radius-km', type=float)
+@with_appcontext
+def export_incidents_command(fmt, output, compress, status, incident_type, reporter, bbox, near, radius_km):
+    """Stream incidents with their reporter, media and status history."""
+    options = {'status': status, 'type': incident_type, 'reporter': reporter,
+               'bbox': bbox, 'near': near, 'radius_km': radius_km}
+    args = MultiDict({key: str(value) for key, value in options.items() if value is not None})
+    compress = compress or output.endswith('.gz')
+
+    try:
+        query, near_filter = export_query(args)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+    with click.open_file(output, 'wb') as f:
+        for chunk in stream_export(query, near_filter, fmt, compress=compress):
+            f.write(chunk)
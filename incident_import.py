@@ -0,0 +1,225 @@
+# incident_import.py
+"""Bulk ingest of incidents from partner agencies.
+
+Rows are validated a chunk at a time, one field across the whole chunk per
+pass, then each chunk's valid rows are written with one multi-row INSERT and
+their confirmation emails queued in the outbox in the same transaction. A
+chunk that fails to insert is rolled back on its own; earlier chunks stay
+committed. Every input row gets exactly one entry in the result report.
+"""
+import json
+import math
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import insert
+
+from analytics import record_incidents
+from geo import encode_geohash
+from models import db, Incident, OutboundEmail, User, INCIDENT_TYPES
+from send_incident_email import build_incident_confirmation_message
+
+DEFAULT_CHUNK_SIZE = 500
+REQUIRED_FIELDS = ('title', 'description', 'type', 'latitude', 'longitude')
+TEXT_FIELDS = ('title', 'description', 'type')
+MAX_LENGTHS = {'title': 150, 'type': 100}
+COORDINATE_RANGES = {'latitude': (-90.0, 90.0), 'longitude': (-180.0, 180.0)}
+
+
+def parse_ndjson(lines):
+    """Yield one decoded row per non-blank line; undecodable lines become ``ValueError`` rows."""
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield ValueError(f'invalid JSON: {e}')
+
+
+def _chunks(rows, size):
+    chunk = []
+    for index, row in enumerate(rows):
+        chunk.append((index, row))
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def validate_batch(chunk, types=INCIDENT_TYPES):
+    """Check a chunk of ``(index, row)`` pairs field by field.
+
+    Returns ``(valid, errors)``: ``valid`` holds ``(index, values)`` with
+    cleaned values ready to insert, ``errors`` maps index to messages.
+    """
+    errors = {}
+    rows = []
+    for index, row in chunk:
+        if isinstance(row, ValueError):
+            errors[index] = [str(row)]
+        elif not isinstance(row, dict):
+            errors[index] = ['row must be a JSON object']
+        else:
+            rows.append((index, row))
+
+    def fail(index, message):
+        errors.setdefault(index, []).append(message)
+
+    for field in REQUIRED_FIELDS:
+        for index, row in rows:
+            value = row.get(field)
+            if value is None or (isinstance(value, str) and not value.strip()):
+                fail(index, f'{field} is required')
+            elif field in TEXT_FIELDS and not isinstance(value, str):
+                fail(index, f'{field} must be a string')
+
+    for field, limit in MAX_LENGTHS.items():
+        for index, row in rows:
+            value = row.get(field)
+            if isinstance(value, str) and len(value) > limit:
+                fail(index, f'{field} must be at most {limit} characters')
+
+    allowed_types = set(types)
+    for index, row in rows:
+        value = row.get('type')
+        if isinstance(value, str) and value not in allowed_types:
+            fail(index, f"type must be one of: {', '.join(types)}")
+
+    coordinates = {}
+    for field, (low, high) in COORDINATE_RANGES.items():
+        for index, row in rows:
+            value = row.get(field)
+            if value is None or value == '':
+                continue
+            # JSON numbers only: no strings, and True is not 1
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                fail(index, f'{field} must be a number')
+                continue
+            number = float(value)
+            if not math.isfinite(number) or not low <= number <= high:
+                fail(index, f'{field} must be between {low:g} and {high:g}')
+                continue
+            coordinates[index, field] = number
+
+    valid = []
+    for index, row in rows:
+        if index in errors:
+            continue
+        latitude = coordinates[index, 'latitude']
+        longitude = coordinates[index, 'longitude']
+        valid.append((index, {
+            'title': row['title'].strip(),
+            'description': row['description'].strip(),
+            'type': row['type'],
+            'latitude': latitude,
+            'longitude': longitude,
+        }))
+    return valid, errors
+
+
+def _insert_chunk(valid, user, now):
+    rows = [
+        dict(values, user_id=user.id, status='pending', created_at=now, updated_at=now,
+             # Bulk inserts skip the ORM event that normally fills this in
+             geohash=encode_geohash(values['latitude'], values['longitude']))
+        for _, values in valid
+    ]
+    ids = db.session.scalars(
+        insert(Incident).returning(Incident.id, sort_by_parameter_order=True), rows
+    ).all()
+    # No flush happens, so the analytics rollups are updated by hand
+    record_incidents(rows)
+
+    if user.email:
+        created_at = now.strftime('%Y-%m-%d %H:%M:%S')
+        emails = []
+        for incident_id, row in zip(ids, rows):
+            message = build_incident_confirmation_message(user.email, user.username, {
+                'title': row['title'],
+                'description': row['description'],
+                'location': f"{row['latitude']}, {row['longitude']}",
+                'created_at': created_at,
+            })
+            emails.append({
+                'user_id': user.id,
+                'incident_id': incident_id,
+                'kind': 'incident_confirmation',
+                'message': json.dumps(message),
+                'status': 'pending',
+                'attempts': 0,
+                'next_attempt_at': now,
+                'created_at': now,
+            })
+        db.session.execute(insert(OutboundEmail), emails)
+    return ids
+
+
+def import_incidents(rows, user, chunk_size=DEFAULT_CHUNK_SIZE, types=INCIDENT_TYPES):
+    """Validate and insert ``rows`` for ``user``; yield one result per row in input order.
+
+    Results are ``{'index', 'status': 'created', 'id'}``, ``{'index',
+    'status': 'invalid', 'errors'}`` or ``{'index', 'status': 'failed',
+    'error'}`` when the database rejected the row's chunk.
+    """
+    for chunk in _chunks(rows, chunk_size):
+        valid, errors = validate_batch(chunk, types)
+        results = {index: {'index': index, 'status': 'invalid', 'errors': messages}
+                   for index, messages in errors.items()}
+
+        if valid:
+            try:
+                ids = _insert_chunk(valid, user, datetime.utcnow())
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                for index, _ in valid:
+                    results[index] = {'index': index, 'status': 'failed', 'error': str(e)}
+            else:
+                for (index, _), incident_id in zip(valid, ids):
+                    results[index] = {'index': index, 'status': 'created', 'id': incident_id}
+
+        for index, _ in chunk:
+            yield results[index]
+
+
+def summarize(results):
+    summary = {'created': 0, 'invalid': 0, 'failed': 0}
+    for result in results:
+        summary[result['status']] += 1
+    return summary
+
+
+@click.command('import-incidents')
+@click.argument('source', type=click.File('rb'))
+@click.option('--user-email', required=True, help='Account the incidents are reported under.')
+@click.option('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, show_default=True, help='Rows per transaction.')
+@click.option('--report', type=click.File('w'), help='Write one NDJSON result line per input row here.')
+@with_appcontext
+def import_incidents_command(source, user_email, chunk_size, report):
+    """Import incidents from an NDJSON file or a JSON array ("-" for stdin)."""
+    from extensions import response_cache
+
+    user = User.query.filter_by(email=user_email).first()
+    if user is None:
+        raise click.BadParameter(f'no user with email {user_email}', param_hint='--user-email')
+
+    # NDJSON is streamed line by line; a JSON array has to be read whole
+    if source.peek(64).lstrip()[:1] == b'[':
+        rows = json.load(source)
+    else:
+        rows = parse_ndjson(source)
+
+    summary = {'created': 0, 'invalid': 0, 'failed': 0}
+    for result in import_incidents(rows, user, chunk_size=chunk_size):
+        summary[result['status']] += 1
+        if report:
+            report.write(json.dumps(result) + '\n')
+
+    if summary['created']:
+        response_cache.invalidate('incidents')
+    click.echo(f"Created: {summary['created']}, invalid: {summary['invalid']}, failed: {summary['failed']}")
@@ -0,0 +1,472 @@
+# incident_queries.py
+"""Shared query building and serialization for incident listings.
+
+Every listing goes through ``listing_query`` so the reporter and any
+requested aggregates come back in the same SELECT as the incident row, and
+``raiseload`` turns any accidental lazy load into an error instead of an
+extra query per row. ``fields=`` or ``view=compact`` narrows the SELECT to
+the columns the client asked for, so a feed of titles and map pins never
+reads the descriptions.
+"""
+import base64
+import hashlib
+from datetime import datetime
+
+from sqlalchemy import and_, case, func, literal, or_, select, union_all
+from sqlalchemy.orm import contains_eager, load_only, raiseload, selectinload
+
+from geo import bbox_for_radius, cover_bbox, haversine_km, prefix_range, split_bbox
+from incident_search import add_highlights, parse_terms, search
+from models import db, ArchivedIncident, Incident, Media, StatusHistory, User
+from serialization import (
+    INCIDENT_FIELDS, INCIDENT_PATHS, incident_serializer, serialize_incident_row, serialize_media,
+    serialize_status_change,
+)
+
+DEFAULT_RADIUS_KM = 5.0
+MAX_RADIUS_KM = 500.0
+# First circle searched for near=; it doubles until a page is filled
+FIRST_RING_KM = 0.5
+
+# The (created_at, id) sort key is loaded whatever fields are requested
+KEY_COLUMNS = ('id', 'created_at')
+
+# Named field sets for view=; fields= takes precedence
+VIEWS = {
+    'full': INCIDENT_FIELDS,
+    'compact': ('id', 'title', 'type', 'latitude', 'longitude', 'status', 'created_at'),
+}
+
+# Optional per-row aggregates, selected as correlated subqueries on demand
+INCLUDES = {
+    'media_count': lambda: (
+        select(func.count(Media.id))
+        .where(Media.incident_id == Incident.id)
+        .correlate(Incident)
+        .scalar_subquery()
+    ),
+    'status_changed_at': lambda: (
+        select(func.max(StatusHistory.changed_at))
+        .where(StatusHistory.incident_id == Incident.id)
+        .correlate(Incident)
+        .scalar_subquery()
+    ),
+}
+
+
+def parse_include(args):
+    include = [name.strip() for name in args.get('include', '').split(',') if name.strip()]
+    unknown = [name for name in include if name not in INCLUDES]
+    if unknown:
+        raise ValueError(f"Unknown include: {', '.join(unknown)}")
+    return include
+
+
+def parse_list(args, name, allowed, default):
+    values = [value.strip() for value in args.get(name, '').split(',') if value.strip()]
+    unknown = [value for value in values if value not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown {name}: {', '.join(unknown)}")
+    return values or list(default)
+
+
+def parse_fields(args):
+    """The fields to return from ``fields=`` or ``view=``, ``id`` first and without repeats."""
+    view = args.get('view', 'full')
+    if view not in VIEWS:
+        raise ValueError(f"Unknown view: {view}")
+    fields = parse_list(args, 'fields', INCIDENT_FIELDS, VIEWS[view])
+    return tuple(dict.fromkeys(['id'] + fields))
+
+
+def _listing_options(model, fields):
+    columns = {getattr(model, name) for name in fields + KEY_COLUMNS if name not in INCIDENT_PATHS}
+    options = [load_only(*columns, raiseload=True)]
+    if 'reporter' in fields:
+        options.append(contains_eager(model.user).load_only(User.username, raiseload=True))
+    options.append(raiseload('*'))
+    return options
+
+
+def listing_query(include=(), fields=INCIDENT_FIELDS):
+    """Incidents joined to their reporter, loading only the columns behind ``fields``."""
+    query = db.session.query(Incident).join(Incident.user).options(*_listing_options(Incident, fields))
+    for name in include:
+        query = query.add_columns(INCLUDES[name]().label(name))
+    return query
+
+
+def archive_listing_query(fields=INCIDENT_FIELDS):
+    """``listing_query`` over the archive table (no per-row aggregates)."""
+    return (
+        db.session.query(ArchivedIncident)
+        .join(ArchivedIncident.user)
+        .options(*_listing_options(ArchivedIncident, fields))
+    )
+
+
+def apply_filters(query, args, model=Incident):
+    """Exact-match filters shared by every listing: ``status``, ``type`` and ``reporter``.
+
+    The query must already be joined to the reporter.
+    """
+    if args.get('status'):
+        query = query.filter(model.status == args['status'])
+    if args.get('type'):
+        query = query.filter(model.type == args['type'])
+    if args.get('reporter'):
+        query = query.filter(User.username == args['reporter'])
+    return query
+
+
+def _split_row(row):
+    if isinstance(row, (Incident, ArchivedIncident)):
+        return row, {}
+    extras = dict(row._mapping)
+    return extras.pop(Incident.__name__), extras
+
+
+def serialize_incident(row, serialize=serialize_incident_row):
+    incident, extras = _split_row(row)
+    data = serialize(incident)
+    # Aggregates requested with include=
+    data.update(extras)
+    return data
+
+
+def detail_version(incident_id):
+    """Fingerprint an incident and its children in one indexed query.
+
+    Returns ``(etag, last_modified)``, or None if the incident does not exist.
+    Every write that changes the detail response moves one of these values:
+    ``updated_at`` on the incident or reporter, a media row added, finishing
+    (``uploaded_at``) or failing (the pending count), or a status change.
+    """
+    def child(column, model):
+        return select(column).where(model.incident_id == Incident.id).correlate(Incident).scalar_subquery()
+
+    row = (
+        db.session.query(
+            Incident.updated_at,
+            User.updated_at,
+            child(func.count(Media.id), Media),
+            child(func.max(Media.uploaded_at), Media),
+            child(func.count(case((Media.status == 'pending', 1))), Media),
+            child(func.count(StatusHistory.id), StatusHistory),
+            child(func.max(StatusHistory.changed_at), StatusHistory),
+        )
+        .join(Incident.user)
+        .filter(Incident.id == incident_id)
+        .first()
+    )
+    if row is None:
+        return None
+    etag = hashlib.sha1(repr((incident_id,) + tuple(row)).encode()).hexdigest()
+    timestamps = [value for value in (row[0], row[1], row[3], row[6]) if value is not None]
+    return etag, max(timestamps, default=None)
+
+
+def detail_query():
+    """The incident with its reporter, media and status timeline: three SELECTs."""
+    return (
+        db.session.query(Incident)
+        .join(Incident.user)
+        .options(
+            contains_eager(Incident.user).load_only(User.username, raiseload=True),
+            selectinload(Incident.media),
+            selectinload(Incident.history),
+            raiseload('*'),
+        )
+    )
+
+
+def serialize_incident_detail(incident):
+    data = serialize_incident(incident)
+    data['updated_at'] = incident.updated_at
+    data['reporter_id'] = incident.user_id
+    data['media'] = [serialize_media(media) for media in sorted(incident.media, key=lambda m: m.id)]
+    history = sorted(incident.history, key=lambda h: (h.changed_at or datetime.min, h.id))
+    data['status_history'] = [serialize_status_change(h) for h in history]
+    return data
+
+
+def _parse_floats(raw, count, name):
+    try:
+        values = [float(v) for v in raw.split(',')]
+    except ValueError:
+        raise ValueError(f'{name} must be {count} comma-separated numbers')
+    if len(values) != count:
+        raise ValueError(f'{name} must be {count} comma-separated numbers')
+    return values
+
+
+def parse_spatial_args(args):
+    """Read ``bbox=min_lng,min_lat,max_lng,max_lat`` and ``near=lat,lng&radius_km=``.
+
+    Returns ``(bbox, near)`` where ``near`` is ``(lat, lng, radius_km)``.
+    Raises ValueError with a client-facing message on bad input.
+    """
+    bbox = near = None
+
+    if args.get('bbox'):
+        min_lng, min_lat, max_lng, max_lat = _parse_floats(args['bbox'], 4, 'bbox')
+        if not (-90 <= min_lat <= max_lat <= 90) or not (-180 <= min_lng <= 180 and -180 <= max_lng <= 180):
+            raise ValueError('bbox is out of range')
+        bbox = (min_lng, min_lat, max_lng, max_lat)
+
+    if args.get('near'):
+        lat, lng = _parse_floats(args['near'], 2, 'near')
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValueError('near is out of range')
+        radius_km = args.get('radius_km', DEFAULT_RADIUS_KM, type=float)
+        if radius_km is None or not (0 < radius_km <= MAX_RADIUS_KM):
+            raise ValueError(f'radius_km must be between 0 and {MAX_RADIUS_KM:g}')
+        near = (lat, lng, radius_km)
+
+    return bbox, near
+
+
+def within_bbox(bbox, model=Incident):
+    """Index-backed filter: geohash prefix ranges, then exact lat/lng bounds."""
+    clauses = []
+    for min_lng, min_lat, max_lng, max_lat in split_bbox(*bbox):
+        ranges = []
+        for prefix in cover_bbox(min_lng, min_lat, max_lng, max_lat):
+            low, high = prefix_range(prefix)
+            ranges.append(and_(model.geohash >= low, model.geohash < high))
+        clauses.append(and_(
+            or_(*ranges),
+            model.latitude.between(min_lat, max_lat),
+            model.longitude.between(min_lng, max_lng),
+        ))
+    return or_(*clauses)
+
+
+def parse_bool(value, default):
+    if value is None:
+        return default
+    return value.strip().lower() not in ('0', 'false', 'no', 'off', '')
+
+
+def encode_cursor(incident):
+    raw = f"{incident.created_at.isoformat()}|{incident.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, incident_id = base64.urlsafe_b64decode(padded).decode().rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(incident_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+
+
+def _after_cursor(query, cursor, model=Incident):
+    if not cursor:
+        return query
+    created_at, incident_id = decode_cursor(cursor)
+    return query.filter(or_(
+        model.created_at < created_at,
+        and_(model.created_at == created_at, model.id < incident_id),
+    ))
+
+
+def _keyset_page(query, cursor, per_page, include_total, serialize):
+    """Seek past ``(created_at, id)`` instead of OFFSET so every page costs the same."""
+    total = query.order_by(None).count() if include_total else None
+    query = _after_cursor(query, cursor)
+
+    # One extra row tells us whether another page exists without a COUNT
+    rows = query.order_by(Incident.created_at.desc(), Incident.id.desc()).limit(per_page + 1).all()
+    items = rows[:per_page]
+
+    page = {
+        'incidents': [serialize_incident(row, serialize) for row in items],
+        'next_cursor': encode_cursor(_split_row(items[-1])[0]) if len(rows) > per_page else None
+    }
+    if include_total:
+        page['total'] = total
+    return page
+
+
+def paginate_incidents(query, args, fields=INCIDENT_FIELDS):
+    """Paginate a listing query from request args.
+
+    Three modes: distance order when ``near`` is given (``total`` only with
+    ``include_total=true``), keyset pagination when ``cursor`` is present
+    (empty for the first page), OFFSET pages otherwise.
+    ``q`` keeps only full-text matches, orders OFFSET pages by relevance and
+    adds a ``highlight`` of whichever of title and description are among
+    ``fields``. ``include_archived=true`` merges in archived incidents (see
+    ``_paginate_with_archive``). ``fields`` must be the ones the query was
+    built with.
+    Raises ValueError with a client-facing message on bad input.
+    """
+    bbox, near = parse_spatial_args(args)
+    terms = parse_terms(args['q']) if args.get('q') else None
+    serialize = incident_serializer(tuple(fields))
+    if parse_bool(args.get('include_archived'), False):
+        if terms or near or args.get('include'):
+            raise ValueError('include_archived cannot be combined with q, near or include')
+        archived = apply_filters(archive_listing_query(fields), args, ArchivedIncident)
+        return _paginate_with_archive(query, archived, args, bbox, serialize)
+    page = _paginate(query, args, bbox, near, terms, serialize)
+    if terms:
+        # Only for the text fields the client asked for
+        add_highlights(page['incidents'], terms, fields)
+    return page
+
+
+def _paginate_with_archive(query, archived, args, bbox, serialize):
+    """Pages over hot and archived incidents in one ``(created_at, id)`` order.
+
+    The page is picked in SQL from a ``UNION ALL`` of both tables' keys
+    ordered by ``(created_at, id)``, so only key columns are read up to the
+    end of the page and only the page's own rows are loaded.
+    """
+    per_page = max(args.get('per_page', 10, type=int), 1)
+    sources = [(query, Incident), (archived, ArchivedIncident)]
+    if bbox:
+        sources = [(source.filter(within_bbox(bbox, model)), model) for source, model in sources]
+
+    cursor_mode = 'cursor' in args
+    include_total = parse_bool(args.get('include_total'), not cursor_mode)
+    page = max(args.get('page', 1, type=int), 1)
+
+    total = 0
+    keys = []
+    for source, model in sources:
+        if include_total:
+            total += source.order_by(None).count()
+        if cursor_mode:
+            source = _after_cursor(source, args.get('cursor'), model)
+        keys.append(source.order_by(None).with_entities(
+            model.id.label('id'), model.created_at.label('created_at'),
+            literal(model is ArchivedIncident).label('archived'),
+        ).statement)
+    merged = union_all(*keys)
+    merged = merged.order_by(merged.selected_columns.created_at.desc(), merged.selected_columns.id.desc())
+    if cursor_mode:
+        merged = merged.limit(per_page + 1)
+    else:
+        merged = merged.limit(per_page).offset((page - 1) * per_page)
+    keys = db.session.execute(merged).all()
+    has_more = len(keys) > per_page
+    keys = keys[:per_page]
+
+    loaded = {}
+    for source, model in sources:
+        ids = [key.id for key in keys if bool(key.archived) == (model is ArchivedIncident)]
+        if ids:
+            loaded.update(((model, row.id), row) for row in source.filter(model.id.in_(ids)))
+    items = [loaded[(ArchivedIncident if key.archived else Incident, key.id)] for key in keys]
+
+    incidents = []
+    for row in items:
+        item = serialize_incident(row, serialize)
+        item['archived'] = isinstance(row, ArchivedIncident)
+        incidents.append(item)
+
+    if cursor_mode:
+        result = {
+            'incidents': incidents,
+            'next_cursor': encode_cursor(items[-1]) if has_more else None
+        }
+        if include_total:
+            result['total'] = total
+        return result
+    return {
+        'total': total if include_total else None,
+        'pages': (total + per_page - 1) // per_page if include_total else None,
+        'current_page': page,
+        'incidents': incidents
+    }
+
+
+def _paginate(query, args, bbox, near, terms, serialize):
+    page = args.get('page', 1, type=int)
+    per_page = max(args.get('per_page', 10, type=int), 1)
+    cursor_mode = 'cursor' in args
+    order = (Incident.created_at.desc(), Incident.id.desc())
+
+    if bbox:
+        query = query.filter(within_bbox(bbox))
+    if terms:
+        query, rank = search(query, terms)
+
+    if cursor_mode:
+        if near:
+            raise ValueError('cursor pagination cannot be combined with near')
+        include_total = parse_bool(args.get('include_total'), False)
+        return _keyset_page(query, args.get('cursor'), per_page, include_total, serialize)
+
+    if not near:
+        include_total = parse_bool(args.get('include_total'), True)
+        if terms:
+            order = (rank,) + order
+        pagination = query.order_by(*order).paginate(
+            page=page, per_page=per_page, error_out=False, count=include_total
+        )
+        return {
+            'total': pagination.total,
+            'pages': pagination.pages if include_total else None,
+            'current_page': pagination.page,
+            'incidents': [serialize_incident(row, serialize) for row in pagination.items]
+        }
+
+    lat, lng, radius_km = near
+    # Distances need the coordinates even when the client didn't ask for them
+    query = query.options(load_only(Incident.latitude, Incident.longitude, raiseload=True))
+
+    page = max(page, 1)
+    start = (page - 1) * per_page
+    matches = _nearest(query, lat, lng, radius_km, start + per_page)
+    items = []
+    for distance, _, row in matches[start:start + per_page]:
+        item = serialize_incident(row, serialize)
+        item['distance_km'] = round(distance, 3)
+        items.append(item)
+
+    # Counting means measuring every match in the radius, so it is opt-in
+    include_total = parse_bool(args.get('include_total'), False)
+    total = _count_within(query, lat, lng, radius_km) if include_total else None
+    return {
+        'total': total,
+        'pages': (total + per_page - 1) // per_page if include_total else None,
+        'current_page': page,
+        'incidents': items
+    }
+
+
+def _nearest(query, lat, lng, radius_km, count):
+    """The ``count`` nearest matches within ``radius_km``, as sorted ``(distance, id, row)``.
+
+    Searches circles of doubling radius until one holds ``count`` matches:
+    nothing outside that circle can be nearer than what is inside it. Rows
+    loaded stay proportional to ``count`` rather than to every match in
+    ``radius_km``, at the price of a few cheap, indexed queries when the
+    area is sparse.
+    """
+    radius = min(FIRST_RING_KM, radius_km)
+    while True:
+        matches = []
+        for row in query.filter(within_bbox(bbox_for_radius(lat, lng, radius))).all():
+            incident = _split_row(row)[0]
+            # Refine the index cover with the exact great-circle distance
+            distance = haversine_km(lat, lng, incident.latitude, incident.longitude)
+            if distance <= radius:
+                matches.append((distance, incident.id, row))
+        if len(matches) >= count or radius >= radius_km:
+            matches.sort(key=lambda m: (m[0], m[1]))
+            return matches[:count]
+        radius = min(radius * 2, radius_km)
+
+
+def _count_within(query, lat, lng, radius_km):
+    """Matches within the radius, reading just their coordinates."""
+    coordinates = query.with_entities(Incident.latitude, Incident.longitude).order_by(None)
+    return sum(
+        1 for latitude, longitude in coordinates.filter(within_bbox(bbox_for_radius(lat, lng, radius_km)))
+        if haversine_km(lat, lng, latitude, longitude) <= radius_km
+    )
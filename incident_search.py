@@ -0,0 +1,127 @@
+# incident_search.py
+"""Full-text search over incident titles and descriptions.
+
+``q`` is split into words; every word must match, as a prefix, in the title
+or the description. Matches are ranked with BM25 on SQLite (FTS5) and
+``ts_rank_cd`` on PostgreSQL, titles weighing more than descriptions. The
+indexes themselves are defined next to ``Incident`` in models.py.
+"""
+import re
+
+from markupsafe import escape
+from sqlalchemy import column, func, literal_column, select, table
+
+from models import db, Incident
+
+MAX_TERMS = 8
+# The search engines wrap matches in these private-use characters; the
+# excerpt is HTML-escaped before they become <mark> tags, so the rest of a
+# user's title or description can never be read as markup
+HIGHLIGHT_START = '\ue000'
+HIGHLIGHT_END = '\ue001'
+SNIPPET_TOKENS = 24
+# BM25 column weights: title, description
+FTS_WEIGHTS = (4.0, 1.0)
+
+WORD = re.compile(r'\w+')
+
+incidents_fts = table('incidents_fts', column('rowid'))
+FTS = literal_column('incidents_fts')
+SEARCH_VECTOR = literal_column('incidents.search_vector')
+
+
+def parse_terms(q):
+    """Lower-cased words of ``q``; raises ValueError when there are none."""
+    terms = [term.lower() for term in WORD.findall(q)][:MAX_TERMS]
+    if not terms:
+        raise ValueError('q must contain at least one word')
+    return terms
+
+
+def _dialect():
+    return db.engine.dialect.name
+
+
+def _fts_match(terms):
+    # Quoted, so words can't act as FTS5 operators; * makes each a prefix
+    return FTS.op('MATCH')(' '.join(f'"{term}"*' for term in terms))
+
+
+def _ts_query(terms):
+    return func.to_tsquery('english', ' & '.join(f'{term}:*' for term in terms))
+
+
+def match_ranks(terms):
+    """Subquery of matching ``(id, rank)``; lower ranks are better matches."""
+    dialect = _dialect()
+    if dialect == 'sqlite':
+        query = select(
+            incidents_fts.c.rowid.label('id'),
+            func.bm25(FTS, *FTS_WEIGHTS).label('rank'),
+        ).where(_fts_match(terms))
+    elif dialect == 'postgresql':
+        tsquery = _ts_query(terms)
+        query = select(
+            Incident.id.label('id'),
+            (-func.ts_rank_cd(SEARCH_VECTOR, tsquery)).label('rank'),
+        ).where(SEARCH_VECTOR.op('@@')(tsquery))
+    else:
+        raise NotImplementedError(f'Incident search does not support {dialect}')
+    return query.subquery('search_ranks')
+
+
+def search(query, terms):
+    """Restrict a listing query to matches; returns ``(query, rank)`` to order by."""
+    ranks = match_ranks(terms)
+    return query.join(ranks, ranks.c.id == Incident.id), ranks.c.rank
+
+
+HIGHLIGHT_FIELDS = ('title', 'description')
+
+
+def highlights(ids, terms, fields=HIGHLIGHT_FIELDS):
+    """Excerpts of ``fields`` with matches wrapped in ``<mark>`` for ``ids``.
+
+    Titles are highlighted whole, descriptions as a snippet around the matches.
+    """
+    if not ids:
+        return {}
+    if _dialect() == 'sqlite':
+        key = incidents_fts.c.rowid
+        expressions = {
+            'title': func.highlight(FTS, 0, HIGHLIGHT_START, HIGHLIGHT_END),
+            'description': func.snippet(FTS, 1, HIGHLIGHT_START, HIGHLIGHT_END, '…', SNIPPET_TOKENS),
+        }
+        where = (_fts_match(terms), key.in_(ids))
+    else:
+        tsquery = _ts_query(terms)
+        marks = f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}'
+        key = Incident.id
+        expressions = {
+            'title': func.ts_headline('english', Incident.title, tsquery, f'{marks}, HighlightAll=true'),
+            'description': func.ts_headline('english', Incident.description, tsquery,
+                                            f'{marks}, MaxWords={SNIPPET_TOKENS}, MinWords={SNIPPET_TOKENS // 2}'),
+        }
+        where = (key.in_(ids),)
+    query = select(key, *(expressions[field] for field in fields)).where(*where)
+    return {
+        incident_id: dict(zip(fields, (_mark(excerpt) for excerpt in excerpts)))
+        for incident_id, *excerpts in db.session.execute(query)
+    }
+
+
+def _mark(excerpt):
+    if excerpt is None:
+        return None
+    return str(escape(excerpt)).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_END, '</mark>')
+
+
+def add_highlights(items, terms, fields=HIGHLIGHT_FIELDS):
+    """Add a ``highlight`` of the requested title and description fields; none if neither was requested."""
+    fields = [field for field in HIGHLIGHT_FIELDS if field in fields]
+    if not fields:
+        return items
+    found = highlights([item['id'] for item in items], terms, fields)
+    for item in items:
+        item['highlight'] = found.get(item['id'])
+    return items
@@ -0,0 +1,233 @@
+# media_pipeline.py
+"""Background media ingestion for incident reports.
+
+``create_incident`` streams each upload to a local spool directory, records a
+``Media`` row in the ``pending`` state and hands the file to this pipeline.
+A bounded thread pool pushes spooled files to the storage backend
+concurrently and marks each row ``uploaded`` or ``failed`` as it finishes, so
+the request never waits on Cloudinary.
+
+Files are spooled before the incident's transaction starts and renamed after
+their row commits (``claim``), so the spool name carries the media id. If the
+process dies before an upload finishes, ``flask recover-media`` resubmits
+pending rows whose file is still spooled, marks the rest failed and removes
+orphaned spool files. Run it at startup or from cron.
+"""
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from werkzeug.utils import secure_filename
+
+VIDEO_EXTENSIONS = {'mp4', 'mov'}
+
+# Prefix of spool files whose Media row has committed: media-<id>_<filename>
+CLAIMED_PREFIX = 'media-'
+
+# Pending uploads older than this are assumed to belong to a dead process
+DEFAULT_RECOVER_AFTER_MINUTES = 30
+
+# Cloudinary rejects single-request uploads above 100MB; stay well under it
+CLOUDINARY_CHUNKED_THRESHOLD = 20 * 1024 * 1024
+
+
+def guess_media_type(filename):
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return 'video' if extension in VIDEO_EXTENSIONS else 'image'
+
+
+class CloudinaryStorage:
+    def store(self, path, filename):
+        """Upload a spooled file; return ``(url, media_type)``."""
+        import cloudinary.uploader
+
+        if os.path.getsize(path) > CLOUDINARY_CHUNKED_THRESHOLD:
+            result = cloudinary.uploader.upload_large(path, resource_type='auto')
+        else:
+            result = cloudinary.uploader.upload(path, resource_type='auto')
+        media_type = 'image' if result['resource_type'] == 'image' else 'video'
+        return result['secure_url'], media_type
+
+
+class LocalFileStorage:
+    """Keep files on the local filesystem; used in tests and local development."""
+
+    def __init__(self, root, base_url='/media/'):
+        self.root = root
+        self.base_url = base_url
+
+    def store(self, path, filename):
+        os.makedirs(self.root, exist_ok=True)
+        name = f'{uuid.uuid4().hex}_{secure_filename(filename)}'
+        shutil.copyfile(path, os.path.join(self.root, name))
+        return self.base_url + name, guess_media_type(filename)
+
+
+class MediaPipeline:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('MEDIA_STORAGE', 'cloudinary')
+        app.config.setdefault('MEDIA_UPLOAD_WORKERS', 4)
+        app.config.setdefault('MEDIA_SPOOL_FOLDER', os.path.join(app.instance_path, 'spool'))
+        app.config.setdefault('MEDIA_LOCAL_FOLDER', os.path.join(app.instance_path, 'media'))
+
+        storage = app.config['MEDIA_STORAGE']
+        if storage == 'cloudinary':
+            storage = CloudinaryStorage()
+        elif storage == 'local':
+            storage = LocalFileStorage(app.config['MEDIA_LOCAL_FOLDER'])
+        elif not hasattr(storage, 'store'):
+            raise ValueError(f'Unknown MEDIA_STORAGE: {storage!r}')
+
+        workers = app.config['MEDIA_UPLOAD_WORKERS']
+        # 0 workers uploads inline on the request thread, which tests rely on
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='media-upload') if workers else None
+        app.extensions['media_pipeline'] = {'storage': storage, 'executor': executor, 'pending': set(), 'lock': threading.Lock()}
+
+    @property
+    def _state(self):
+        return current_app.extensions['media_pipeline']
+
+    def spool(self, file):
+        """Stream an uploaded file to the spool directory and return its path."""
+        spool_folder = current_app.config['MEDIA_SPOOL_FOLDER']
+        os.makedirs(spool_folder, exist_ok=True)
+        path = os.path.join(spool_folder, f'{uuid.uuid4().hex}_{secure_filename(file.filename)}')
+        file.save(path)
+        return path
+
+    def claim(self, path, media_id):
+        """Rename a spooled file after its Media row committed; returns the new path."""
+        name = os.path.basename(path).split('_', 1)[1]
+        claimed = os.path.join(os.path.dirname(path), f'{CLAIMED_PREFIX}{media_id}_{name}')
+        os.replace(path, claimed)
+        return claimed
+
+    def recover(self, older_than_minutes=DEFAULT_RECOVER_AFTER_MINUTES):
+        """Finish or fail uploads interrupted by a restart.
+
+        Returns ``(resubmitted, failed, removed)``: pending rows handed to the
+        pipeline again, pending rows marked failed because their file is gone,
+        and orphaned spool files deleted.
+        """
+        from extensions import db, response_cache
+        from models import Media
+
+        cutoff = datetime.utcnow() - timedelta(minutes=older_than_minutes)
+        file_cutoff = time.time() - older_than_minutes * 60
+        folder = current_app.config['MEDIA_SPOOL_FOLDER']
+
+        claimed = {}
+        orphans = []
+        for name in os.listdir(folder) if os.path.isdir(folder) else []:
+            path = os.path.join(folder, name)
+            media_id, _, _ = name[len(CLAIMED_PREFIX):].partition('_')
+            if name.startswith(CLAIMED_PREFIX) and media_id.isdigit():
+                claimed[int(media_id)] = path
+            elif os.path.getmtime(path) < file_cutoff:
+                # Spooled by a request that never committed or never claimed it
+                orphans.append(path)
+
+        resubmit = []
+        failed = 0
+        stale = Media.query.filter(Media.status == 'pending', Media.uploaded_at < cutoff).all()
+        for media in stale:
+            path = claimed.pop(media.id, None)
+            if path is not None:
+                resubmit.append((media.id, path, os.path.basename(path).split('_', 1)[1]))
+            else:
+                media.status = 'failed'
+                media.error = 'Upload interrupted and the spooled file is gone'
+                failed += 1
+        db.session.commit()
+        if failed:
+            response_cache.invalidate('incidents')
+
+        # Claimed files whose row is gone or no longer pending
+        orphans += [path for path in claimed.values() if os.path.getmtime(path) < file_cutoff]
+        for path in orphans:
+            os.remove(path)
+
+        for media_id, path, filename in resubmit:
+            self.submit(media_id, path, filename)
+        return len(resubmit), failed, len(orphans)
+
+    def submit(self, media_id, path, filename):
+        state = self._state
+        app = current_app._get_current_object()
+        if state['executor'] is None:
+            self._upload(app, state['storage'], media_id, path, filename)
+            return
+
+        future = state['executor'].submit(self._upload, app, state['storage'], media_id, path, filename)
+        with state['lock']:
+            state['pending'].add(future)
+        future.add_done_callback(lambda f: self._forget(state, f))
+
+    @staticmethod
+    def _forget(state, future):
+        with state['lock']:
+            state['pending'].discard(future)
+
+    def wait(self):
+        """Block until every submitted upload has finished."""
+        state = self._state
+        with state['lock']:
+            futures = list(state['pending'])
+        for future in futures:
+            future.result()
+
+    @staticmethod
+    def _upload(app, storage, media_id, path, filename):
+        from extensions import db, response_cache
+        from models import Media
+
+        with app.app_context():
+            try:
+                url, media_type = storage.store(path, filename)
+            except Exception as e:
+                app.logger.error(f"Media upload failed for media {media_id}: {e}")
+                url = None
+                error = str(e)
+            else:
+                error = None
+            finally:
+                if os.path.exists(path):
+                    os.remove(path)
+
+            media = db.session.get(Media, media_id)
+            if media is None:
+                return
+            if error is None:
+                media.file_url = url
+                media.media_type = media_type
+                media.status = 'uploaded'
+                media.uploaded_at = datetime.utcnow()
+            else:
+                media.status = 'failed'
+                media.error = error
+            db.session.commit()
+            response_cache.invalidate('incidents')
+
+
+@click.command('recover-media')
+@click.option('--older-than-minutes', type=int, default=DEFAULT_RECOVER_AFTER_MINUTES, show_default=True,
+              help='Only touch uploads pending for longer than this.')
+@with_appcontext
+def recover_media_command(older_than_minutes):
+    """Resubmit or fail media uploads interrupted by a restart."""
+    from extensions import media_pipeline
+
+    resubmitted, failed, removed = media_pipeline.recover(older_than_minutes)
+    media_pipeline.wait()
+    click.echo(f'Resubmitted {resubmitted} uploads, marked {failed} failed, removed {removed} spool files')
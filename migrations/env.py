@@ -51,6 +51,15 @@ def get_metadata():
     return target_db.metadata
 
 
+def include_name(name, type_, parent_names):
+    # Full-text search objects are created by hand (models.INCIDENT_SEARCH_DDL)
+    if type_ == 'table':
+        return not name.startswith('incidents_fts')
+    if type_ in ('column', 'index'):
+        return name not in ('search_vector', 'ix_incidents_search_vector')
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -65,7 +74,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_name=include_name
     )
 
     with context.begin_transaction():
@@ -91,12 +101,19 @@ def run_migrations_online():
                 logger.info('No changes in schema detected.')
 
     conf_args = current_app.extensions['migrate'].configure_args
+    conf_args.setdefault("include_name", include_name)
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
 
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        if connection.dialect.name == 'sqlite':
+            # Batch migrations copy and drop tables; with enforcement on, the
+            # drop would cascade into child rows. The PRAGMA is ignored inside
+            # a transaction, so commit it before the migration's one begins.
+            connection.exec_driver_sql('PRAGMA foreign_keys = OFF')
+            connection.commit()
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
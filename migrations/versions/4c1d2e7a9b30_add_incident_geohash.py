@@ -0,0 +1,51 @@
+"""add geohash and spatial indexes to incidents
+
+Revision ID: 4c1d2e7a9b30
+Revises: 08067a4b9335
+Create Date: 2026-10-18 15:02:11.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from geo import encode_geohash
+
+
+# revision identifiers, used by Alembic.
+revision = '4c1d2e7a9b30'
+down_revision = '08067a4b9335'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('incidents', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('geohash', sa.String(length=12), nullable=True))
+        batch_op.create_index('ix_incidents_geohash', ['geohash'], unique=False)
+        batch_op.create_index('ix_incidents_lat_lng', ['latitude', 'longitude'], unique=False)
+
+    # Backfill existing rows
+    conn = op.get_bind()
+    incidents = sa.table(
+        'incidents',
+        sa.column('id', sa.Integer),
+        sa.column('latitude', sa.Float),
+        sa.column('longitude', sa.Float),
+        sa.column('geohash', sa.String),
+    )
+    rows = conn.execute(
+        sa.select(incidents.c.id, incidents.c.latitude, incidents.c.longitude)
+        .where(incidents.c.latitude.isnot(None), incidents.c.longitude.isnot(None))
+    ).fetchall()
+    if rows:
+        conn.execute(
+            incidents.update().where(incidents.c.id == sa.bindparam('b_id')).values(geohash=sa.bindparam('b_geohash')),
+            [{'b_id': r.id, 'b_geohash': encode_geohash(float(r.latitude), float(r.longitude))} for r in rows]
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('incidents', schema=None) as batch_op:
+        batch_op.drop_index('ix_incidents_lat_lng')
+        batch_op.drop_index('ix_incidents_geohash')
+        batch_op.drop_column('geohash')
@@ -0,0 +1,26 @@
+"""add (created_at, id) index for keyset pagination
+
+Revision ID: 7e3f9a12c4d8
+Revises: 4c1d2e7a9b30
+Create Date: 2026-10-18 15:31:47.612093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e3f9a12c4d8'
+down_revision = '4c1d2e7a9b30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('incidents', schema=None) as batch_op:
+        batch_op.create_index('ix_incidents_created_at_id', ['created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('incidents', schema=None) as batch_op:
+        batch_op.drop_index('ix_incidents_created_at_id')
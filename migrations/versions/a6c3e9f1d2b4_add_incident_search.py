@@ -0,0 +1,68 @@
+"""add full-text search over incident title and description
+
+Revision ID: a6c3e9f1d2b4
+Revises: f2b8d5a1c7e3
+Create Date: 2026-10-18 20:05:12.118240
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6c3e9f1d2b4'
+down_revision = 'f2b8d5a1c7e3'
+branch_labels = None
+depends_on = None
+
+# Keep in step with models.INCIDENT_SEARCH_DDL
+SEARCH_DDL = {
+    'sqlite': [
+        "CREATE VIRTUAL TABLE incidents_fts USING fts5("
+        "title, description, content='incidents', content_rowid='id', "
+        "tokenize='porter unicode61 remove_diacritics 2', prefix='2 3')",
+        "CREATE TRIGGER incidents_fts_insert AFTER INSERT ON incidents BEGIN "
+        "INSERT INTO incidents_fts (rowid, title, description) VALUES (new.id, new.title, new.description); "
+        "END",
+        "CREATE TRIGGER incidents_fts_delete AFTER DELETE ON incidents BEGIN "
+        "INSERT INTO incidents_fts (incidents_fts, rowid, title, description) "
+        "VALUES ('delete', old.id, old.title, old.description); "
+        "END",
+        "CREATE TRIGGER incidents_fts_update AFTER UPDATE OF title, description ON incidents BEGIN "
+        "INSERT INTO incidents_fts (incidents_fts, rowid, title, description) "
+        "VALUES ('delete', old.id, old.title, old.description); "
+        "INSERT INTO incidents_fts (rowid, title, description) VALUES (new.id, new.title, new.description); "
+        "END",
+        # Index the rows that already exist
+        "INSERT INTO incidents_fts (incidents_fts) VALUES ('rebuild')",
+    ],
+    'postgresql': [
+        # The generated column is computed for existing rows as it is added
+        "ALTER TABLE incidents ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED",
+        "CREATE INDEX ix_incidents_search_vector ON incidents USING gin (search_vector)",
+    ],
+}
+
+DROP_DDL = {
+    'sqlite': [
+        "DROP TRIGGER IF EXISTS incidents_fts_update",
+        "DROP TRIGGER IF EXISTS incidents_fts_delete",
+        "DROP TRIGGER IF EXISTS incidents_fts_insert",
+        "DROP TABLE IF EXISTS incidents_fts",
+    ],
+    'postgresql': [
+        "DROP INDEX IF EXISTS ix_incidents_search_vector",
+        "ALTER TABLE incidents DROP COLUMN IF EXISTS search_vector",
+    ],
+}
+
+
+def upgrade():
+    for statement in SEARCH_DDL.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
+
+
+def downgrade():
+    for statement in DROP_DDL.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
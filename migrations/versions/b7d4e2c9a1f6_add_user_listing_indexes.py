@@ -0,0 +1,28 @@
+"""add indexes for the admin user listing
+
+Revision ID: b7d4e2c9a1f6
+Revises: a6c3e9f1d2b4
+Create Date: 2026-10-18 22:41:09.218734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d4e2c9a1f6'
+down_revision = 'a6c3e9f1d2b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_users_created_at_id', 'users', ['created_at', 'id'], unique=False)
+    op.create_index('ix_users_username_lower', 'users', [sa.text('lower(username)')], unique=False)
+    op.create_index('ix_users_email_lower', 'users', [sa.text('lower(email)')], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_users_email_lower', table_name='users')
+    op.drop_index('ix_users_username_lower', table_name='users')
+    op.drop_index('ix_users_created_at_id', table_name='users')
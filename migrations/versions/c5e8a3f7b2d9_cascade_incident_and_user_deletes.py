@@ -0,0 +1,86 @@
+"""cascade deletes from users and incidents to their child rows
+
+Revision ID: c5e8a3f7b2d9
+Revises: b7d4e2c9a1f6
+Create Date: 2026-10-18 23:26:47.530912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e8a3f7b2d9'
+down_revision = 'b7d4e2c9a1f6'
+branch_labels = None
+depends_on = None
+
+# (table, column, referred table), parents before children
+FOREIGN_KEYS = [
+    ('incidents', 'user_id', 'users'),
+    ('media', 'incident_id', 'incidents'),
+    ('status_history', 'incident_id', 'incidents'),
+    ('notifications', 'user_id', 'users'),
+    ('notifications', 'incident_id', 'incidents'),
+    ('email_outbox', 'user_id', 'users'),
+    ('email_outbox', 'incident_id', 'incidents'),
+]
+
+# SQLite constraints were created unnamed; batch mode finds them through this convention
+NAMING_CONVENTION = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+
+# Batch mode recreates incidents on SQLite, which drops its triggers.
+# Keep in step with models.INCIDENT_SEARCH_DDL.
+SQLITE_SEARCH_TRIGGERS = [
+    "CREATE TRIGGER incidents_fts_insert AFTER INSERT ON incidents BEGIN "
+    "INSERT INTO incidents_fts (rowid, title, description) VALUES (new.id, new.title, new.description); "
+    "END",
+    "CREATE TRIGGER incidents_fts_delete AFTER DELETE ON incidents BEGIN "
+    "INSERT INTO incidents_fts (incidents_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "END",
+    "CREATE TRIGGER incidents_fts_update AFTER UPDATE OF title, description ON incidents BEGIN "
+    "INSERT INTO incidents_fts (incidents_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO incidents_fts (rowid, title, description) VALUES (new.id, new.title, new.description); "
+    "END",
+    "INSERT INTO incidents_fts (incidents_fts) VALUES ('rebuild')",
+]
+
+
+def _constraint_name(dialect, table, column, referred):
+    if dialect == 'sqlite':
+        return NAMING_CONVENTION['fk'] % {
+            'table_name': table, 'column_0_name': column, 'referred_table_name': referred,
+        }
+    # PostgreSQL's default name
+    return f'{table}_{column}_fkey'
+
+
+def _replace_foreign_keys(ondelete):
+    dialect = op.get_bind().dialect.name
+    tables = []
+    for table, _, _ in FOREIGN_KEYS:
+        if table not in tables:
+            tables.append(table)
+
+    for table in tables:
+        with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch_op:
+            for fk_table, column, referred in FOREIGN_KEYS:
+                if fk_table != table:
+                    continue
+                name = _constraint_name(dialect, table, column, referred)
+                batch_op.drop_constraint(name, type_='foreignkey')
+                batch_op.create_foreign_key(name, referred, [column], ['id'], ondelete=ondelete)
+
+    if dialect == 'sqlite':
+        for statement in SQLITE_SEARCH_TRIGGERS:
+            op.execute(statement)
+
+
+def upgrade():
+    _replace_foreign_keys('CASCADE')
+
+
+def downgrade():
+    _replace_foreign_keys(None)
@@ -0,0 +1,31 @@
+"""add upload status to media
+
+Revision ID: c83a0f5e2b71
+Revises: b52e81f0d6a4
+Create Date: 2026-10-18 16:48:02.530917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c83a0f5e2b71'
+down_revision = 'b52e81f0d6a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('media', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('status', sa.String(length=20), nullable=True, server_default='uploaded'))
+        batch_op.add_column(sa.Column('error', sa.Text(), nullable=True))
+        batch_op.alter_column('file_url', existing_type=sa.String(length=255), nullable=True)
+
+
+def downgrade():
+    op.execute("DELETE FROM media WHERE file_url IS NULL")
+    with op.batch_alter_table('media', schema=None) as batch_op:
+        batch_op.alter_column('file_url', existing_type=sa.String(length=255), nullable=False)
+        batch_op.drop_column('error')
+        batch_op.drop_column('status')
@@ -0,0 +1,26 @@
+"""add notify_status_changes to users
+
+Revision ID: d19b6c4e8f02
+Revises: c83a0f5e2b71
+Create Date: 2026-10-18 17:20:44.871356
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd19b6c4e8f02'
+down_revision = 'c83a0f5e2b71'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('notify_status_changes', sa.Boolean(), nullable=True, server_default=sa.false()))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('notify_status_changes')
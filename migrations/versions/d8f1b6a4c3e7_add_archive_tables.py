@@ -0,0 +1,123 @@
+"""add archive tables for closed incidents
+
+Revision ID: d8f1b6a4c3e7
+Revises: c5e8a3f7b2d9
+Create Date: 2026-10-19 00:12:38.406215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8f1b6a4c3e7'
+down_revision = 'c5e8a3f7b2d9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('incidents_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(length=150), nullable=False),
+    sa.Column('description', sa.Text(), nullable=False),
+    sa.Column('type', sa.String(length=100), nullable=False),
+    sa.Column('status', sa.String(length=50), nullable=True),
+    sa.Column('latitude', sa.Float(), nullable=True),
+    sa.Column('longitude', sa.Float(), nullable=True),
+    sa.Column('geohash', sa.String(length=12), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('incidents_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_incidents_archive_created_at_id', ['created_at', 'id'], unique=False)
+        batch_op.create_index('ix_incidents_archive_geohash', ['geohash'], unique=False)
+        batch_op.create_index('ix_incidents_archive_status_created_at', ['status', 'created_at'], unique=False)
+        batch_op.create_index('ix_incidents_archive_type_created_at', ['type', 'created_at'], unique=False)
+        batch_op.create_index('ix_incidents_archive_user_id_created_at', ['user_id', 'created_at'], unique=False)
+
+    op.create_table('media_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('incident_id', sa.Integer(), nullable=False),
+    sa.Column('media_type', sa.String(length=50), nullable=True),
+    sa.Column('file_url', sa.String(length=255), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('uploaded_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['incident_id'], ['incidents_archive.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('media_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_media_archive_incident_id', ['incident_id'], unique=False)
+
+    op.create_table('notifications_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('incident_id', sa.Integer(), nullable=True),
+    sa.Column('channel', sa.String(length=50), nullable=True),
+    sa.Column('message', sa.Text(), nullable=True),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.Column('status', sa.String(length=50), nullable=True),
+    sa.ForeignKeyConstraint(['incident_id'], ['incidents_archive.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('notifications_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_notifications_archive_incident_id', ['incident_id'], unique=False)
+        batch_op.create_index('ix_notifications_archive_sent_at', ['sent_at'], unique=False)
+        batch_op.create_index('ix_notifications_archive_user_id', ['user_id'], unique=False)
+
+    op.create_table('status_history_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('incident_id', sa.Integer(), nullable=False),
+    sa.Column('changed_by', sa.String(length=120), nullable=True),
+    sa.Column('old_status', sa.String(length=50), nullable=True),
+    sa.Column('new_status', sa.String(length=50), nullable=True),
+    sa.Column('changed_at', sa.DateTime(), nullable=True),
+    sa.Column('note', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['incident_id'], ['incidents_archive.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('status_history_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_status_history_archive_incident_id_changed_at', ['incident_id', 'changed_at'], unique=False)
+
+    with op.batch_alter_table('incidents', schema=None) as batch_op:
+        batch_op.create_index('ix_incidents_status_updated_at', ['status', 'updated_at'], unique=False)
+
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.create_index('ix_notifications_sent_at', ['sent_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.drop_index('ix_notifications_sent_at')
+
+    with op.batch_alter_table('incidents', schema=None) as batch_op:
+        batch_op.drop_index('ix_incidents_status_updated_at')
+
+    with op.batch_alter_table('status_history_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_status_history_archive_incident_id_changed_at')
+
+    op.drop_table('status_history_archive')
+    with op.batch_alter_table('notifications_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_notifications_archive_user_id')
+        batch_op.drop_index('ix_notifications_archive_sent_at')
+        batch_op.drop_index('ix_notifications_archive_incident_id')
+
+    op.drop_table('notifications_archive')
+    with op.batch_alter_table('media_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_media_archive_incident_id')
+
+    op.drop_table('media_archive')
+    with op.batch_alter_table('incidents_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_incidents_archive_user_id_created_at')
+        batch_op.drop_index('ix_incidents_archive_type_created_at')
+        batch_op.drop_index('ix_incidents_archive_status_created_at')
+        batch_op.drop_index('ix_incidents_archive_geohash')
+        batch_op.drop_index('ix_incidents_archive_created_at_id')
+
+    op.drop_table('incidents_archive')
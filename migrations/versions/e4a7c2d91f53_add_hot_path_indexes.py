@@ -0,0 +1,40 @@
+"""add indexes for hot filter and sort columns
+
+Revision ID: e4a7c2d91f53
+Revises: d19b6c4e8f02
+Create Date: 2026-10-18 17:52:16.904127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a7c2d91f53'
+down_revision = 'd19b6c4e8f02'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('users', 'ix_users_username', ['username']),
+    ('users', 'ix_users_admin_subscriptions', ['is_admin', 'notify_status_changes']),
+    ('incidents', 'ix_incidents_status_created_at', ['status', 'created_at']),
+    ('incidents', 'ix_incidents_type_created_at', ['type', 'created_at']),
+    ('incidents', 'ix_incidents_user_id_created_at', ['user_id', 'created_at']),
+    ('media', 'ix_media_incident_id', ['incident_id']),
+    ('status_history', 'ix_status_history_incident_id_changed_at', ['incident_id', 'changed_at']),
+    ('notifications', 'ix_notifications_user_id_sent_at', ['user_id', 'sent_at']),
+    ('notifications', 'ix_notifications_incident_id', ['incident_id']),
+    ('email_outbox', 'ix_email_outbox_user_id', ['user_id']),
+    ('email_outbox', 'ix_email_outbox_incident_id', ['incident_id']),
+]
+
+
+def upgrade():
+    for table, name, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    for table, name, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,72 @@
+"""never reuse incident, media, status history and notification ids
+
+Revision ID: e6b2f9d4a8c1
+Revises: d8f1b6a4c3e7
+Create Date: 2026-10-19 09:41:12.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6b2f9d4a8c1'
+down_revision = 'd8f1b6a4c3e7'
+branch_labels = None
+depends_on = None
+
+# (hot table, archive table). Without AUTOINCREMENT SQLite hands out
+# max(id) + 1, so ids of archived rows were reused by new rows and the next
+# archive run failed on the archive primary key. PostgreSQL sequences never
+# go backwards, so there is nothing to do there.
+TABLES = [
+    ('incidents', 'incidents_archive'),
+    ('media', 'media_archive'),
+    ('status_history', 'status_history_archive'),
+    ('notifications', 'notifications_archive'),
+]
+
+# Recreating incidents drops its triggers. Keep in step with models.INCIDENT_SEARCH_DDL.
+SQLITE_SEARCH_TRIGGERS = [
+    "CREATE TRIGGER incidents_fts_insert AFTER INSERT ON incidents BEGIN "
+    "INSERT INTO incidents_fts (rowid, title, description) VALUES (new.id, new.title, new.description); "
+    "END",
+    "CREATE TRIGGER incidents_fts_delete AFTER DELETE ON incidents BEGIN "
+    "INSERT INTO incidents_fts (incidents_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "END",
+    "CREATE TRIGGER incidents_fts_update AFTER UPDATE OF title, description ON incidents BEGIN "
+    "INSERT INTO incidents_fts (incidents_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO incidents_fts (rowid, title, description) VALUES (new.id, new.title, new.description); "
+    "END",
+]
+
+
+def _recreate(autoincrement):
+    for table, _ in TABLES:
+        with op.batch_alter_table(table, recreate='always',
+                                  table_kwargs={'sqlite_autoincrement': autoincrement}):
+            pass
+    for statement in SQLITE_SEARCH_TRIGGERS:
+        op.execute(statement)
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    _recreate(True)
+
+    # Start past every id already used, archived ones included
+    for table, archive in TABLES:
+        op.execute(sa.text('DELETE FROM sqlite_sequence WHERE name = :table').bindparams(table=table))
+        op.execute(sa.text(
+            f'INSERT INTO sqlite_sequence (name, seq) SELECT :table, max(coalesce((SELECT max(id) FROM {table}), 0), '
+            f'coalesce((SELECT max(id) FROM {archive}), 0))'
+        ).bindparams(table=table))
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    _recreate(False)
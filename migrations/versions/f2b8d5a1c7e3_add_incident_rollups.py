@@ -0,0 +1,55 @@
+"""add incident analytics rollup tables
+
+Revision ID: f2b8d5a1c7e3
+Revises: e4a7c2d91f53
+Create Date: 2026-10-18 19:20:44.513802
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b8d5a1c7e3'
+down_revision = 'e4a7c2d91f53'
+branch_labels = None
+depends_on = None
+
+# Keep in step with analytics.MAX_CELL_PRECISION
+MAX_CELL_PRECISION = 6
+
+
+def upgrade():
+    op.create_table('incident_daily_stats',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('status', sa.String(length=50), nullable=False),
+    sa.Column('type', sa.String(length=100), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'status', 'type')
+    )
+    op.create_table('incident_geo_cells',
+    sa.Column('precision', sa.Integer(), nullable=False),
+    sa.Column('cell', sa.String(length=12), nullable=False),
+    sa.Column('status', sa.String(length=50), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('precision', 'cell', 'status')
+    )
+
+    # Backfill from existing incidents; the app keeps them current from here on
+    op.execute(
+        "INSERT INTO incident_daily_stats (day, status, type, count) "
+        "SELECT date(created_at), COALESCE(status, 'pending'), type, COUNT(*) "
+        "FROM incidents GROUP BY date(created_at), COALESCE(status, 'pending'), type"
+    )
+    for precision in range(1, MAX_CELL_PRECISION + 1):
+        op.execute(
+            "INSERT INTO incident_geo_cells (precision, cell, status, count) "
+            f"SELECT {precision}, substr(geohash, 1, {precision}), COALESCE(status, 'pending'), COUNT(*) "
+            "FROM incidents WHERE geohash IS NOT NULL "
+            f"GROUP BY substr(geohash, 1, {precision}), COALESCE(status, 'pending')"
+        )
+
+
+def downgrade():
+    op.drop_table('incident_geo_cells')
+    op.drop_table('incident_daily_stats')
@@ -1,7 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import MetaData
+from sqlalchemy.orm import object_session
 from datetime import datetime
 from extensions import db
+from geo import encode_geohash
+from identity import user_changed
 
 
 metadata = MetaData()
@@ -16,19 +19,43 @@ class User(db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     phone = db.Column(db.String(20), nullable=True)
     is_admin = db.Column(db.Boolean, default=False)
+    notify_status_changes = db.Column(db.Boolean, default=False)  # admins opt in to status fan-out
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    incidents = db.relationship('Incident', backref='user', lazy=True)
-    notifications = db.relationship('Notification', backref='user', lazy=True)
+    # Children are removed by ON DELETE CASCADE; the ORM never loads them to delete
+    incidents = db.relationship('Incident', backref='user', lazy=True,
+                                cascade='all, delete-orphan', passive_deletes=True)
+    notifications = db.relationship('Notification', backref='user', lazy=True,
+                                    cascade='all, delete-orphan', passive_deletes=True)
+
+    __table_args__ = (
+        db.Index('ix_users_username', 'username'),
+        db.Index('ix_users_admin_subscriptions', 'is_admin', 'notify_status_changes'),
+        # Admin user listing: keyset order and case-insensitive prefix search
+        db.Index('ix_users_created_at_id', 'created_at', 'id'),
+        db.Index('ix_users_username_lower', db.func.lower(username)),
+        db.Index('ix_users_email_lower', db.func.lower(email)),
+    )
+
+
+@db.event.listens_for(User, 'after_update')
+@db.event.listens_for(User, 'after_delete')
+def forget_cached_identity(mapper, connection, target):
+    # JWTs resolve to cached snapshots of the user; drop it once this commits
+    user_changed(object_session(target), target.id)
+
+
+# Vocabulary for Incident.type, enforced on bulk import
+INCIDENT_TYPES = ['Theft', 'Accident', 'Vandalism', 'Suspicious Activity', 'Other']
 
 
 class Incident(db.Model):
     __tablename__ = 'incidents'
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
 
     title = db.Column(db.String(150), nullable=False)
     description = db.Column(db.Text, nullable=False)
@@ -37,29 +64,111 @@ class Incident(db.Model):
 
     latitude = db.Column(db.Float, nullable=True)
     longitude = db.Column(db.Float, nullable=True)
+    geohash = db.Column(db.String(12), nullable=True)  # kept in sync with lat/lng
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    media = db.relationship('Media', backref='incident', lazy=True)
-    history = db.relationship('StatusHistory', backref='incident', lazy=True)
-    notifications = db.relationship('Notification', backref='incident', lazy=True)
+    media = db.relationship('Media', backref='incident', lazy=True,
+                            cascade='all, delete-orphan', passive_deletes=True)
+    history = db.relationship('StatusHistory', backref='incident', lazy=True,
+                              cascade='all, delete-orphan', passive_deletes=True)
+    notifications = db.relationship('Notification', backref='incident', lazy=True,
+                                    cascade='all, delete-orphan', passive_deletes=True)
+
+    __table_args__ = (
+        db.Index('ix_incidents_geohash', 'geohash'),
+        db.Index('ix_incidents_lat_lng', 'latitude', 'longitude'),
+        db.Index('ix_incidents_created_at_id', 'created_at', 'id'),
+        # The rowid (id) trails every SQLite index, so these also serve the
+        # (created_at, id) DESC ordering via a backwards scan
+        db.Index('ix_incidents_status_created_at', 'status', 'created_at'),
+        db.Index('ix_incidents_type_created_at', 'type', 'created_at'),
+        db.Index('ix_incidents_user_id_created_at', 'user_id', 'created_at'),
+        # Archival job: closed incidents not touched since a cutoff
+        db.Index('ix_incidents_status_updated_at', 'status', 'updated_at'),
+        # Never hand out an id again once its row is deleted or archived
+        {'sqlite_autoincrement': True},
+    )
+
+
+@db.event.listens_for(Incident, 'before_insert')
+@db.event.listens_for(Incident, 'before_update')
+def sync_incident_geohash(mapper, connection, target):
+    if target.latitude is None or target.longitude is None:
+        target.geohash = None
+        return
+    # Form posts hand us strings; normalise before hashing
+    target.latitude = float(target.latitude)
+    target.longitude = float(target.longitude)
+    target.geohash = encode_geohash(target.latitude, target.longitude)
+
+
+# Full-text index over title and description (queried by incident_search.py).
+# SQLite keeps an external-content FTS5 table in step through triggers, so
+# Core bulk inserts are indexed too; PostgreSQL uses a generated tsvector
+# column. Neither is mapped: create_all builds them through these hooks and
+# migrations/env.py hides them from autogenerate.
+INCIDENT_SEARCH_DDL = {
+    'sqlite': [
+        "CREATE VIRTUAL TABLE incidents_fts USING fts5("
+        "title, description, content='incidents', content_rowid='id', "
+        "tokenize='porter unicode61 remove_diacritics 2', prefix='2 3')",
+        "CREATE TRIGGER incidents_fts_insert AFTER INSERT ON incidents BEGIN "
+        "INSERT INTO incidents_fts (rowid, title, description) VALUES (new.id, new.title, new.description); "
+        "END",
+        "CREATE TRIGGER incidents_fts_delete AFTER DELETE ON incidents BEGIN "
+        "INSERT INTO incidents_fts (incidents_fts, rowid, title, description) "
+        "VALUES ('delete', old.id, old.title, old.description); "
+        "END",
+        "CREATE TRIGGER incidents_fts_update AFTER UPDATE OF title, description ON incidents BEGIN "
+        "INSERT INTO incidents_fts (incidents_fts, rowid, title, description) "
+        "VALUES ('delete', old.id, old.title, old.description); "
+        "INSERT INTO incidents_fts (rowid, title, description) VALUES (new.id, new.title, new.description); "
+        "END",
+    ],
+    'postgresql': [
+        "ALTER TABLE incidents ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED",
+        "CREATE INDEX ix_incidents_search_vector ON incidents USING gin (search_vector)",
+    ],
+}
+
+
+@db.event.listens_for(Incident.__table__, 'after_create')
+def create_incident_search(target, connection, **kw):
+    for statement in INCIDENT_SEARCH_DDL.get(connection.dialect.name, []):
+        connection.exec_driver_sql(statement)
+
+
+@db.event.listens_for(Incident.__table__, 'before_drop')
+def drop_incident_search(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql('DROP TABLE IF EXISTS incidents_fts')
 
 class Media(db.Model):
     __tablename__ = 'media'
 
     id = db.Column(db.Integer, primary_key=True)
-    incident_id = db.Column(db.Integer, db.ForeignKey('incidents.id'), nullable=False)
+    incident_id = db.Column(db.Integer, db.ForeignKey('incidents.id', ondelete='CASCADE'), nullable=False)
 
     media_type = db.Column(db.String(50))  
-    file_url = db.Column(db.String(255), nullable=False)
+    file_url = db.Column(db.String(255), nullable=True)  # set once the upload finishes
+    status = db.Column(db.String(20), default='uploaded')  # pending, uploaded or failed
+    error = db.Column(db.Text)
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_media_incident_id', 'incident_id'),
+        {'sqlite_autoincrement': True},
+    )
+
 class StatusHistory(db.Model):
     __tablename__ = 'status_history'
 
     id = db.Column(db.Integer, primary_key=True)
-    incident_id = db.Column(db.Integer, db.ForeignKey('incidents.id'), nullable=False)
+    incident_id = db.Column(db.Integer, db.ForeignKey('incidents.id', ondelete='CASCADE'), nullable=False)
 
     changed_by = db.Column(db.String(120))  # (email or username)
     old_status = db.Column(db.String(50))
@@ -67,14 +176,161 @@ class StatusHistory(db.Model):
     changed_at = db.Column(db.DateTime, default=datetime.utcnow)
     note = db.Column(db.Text)
 
+    __table_args__ = (
+        db.Index('ix_status_history_incident_id_changed_at', 'incident_id', 'changed_at'),
+        {'sqlite_autoincrement': True},
+    )
+
 class Notification(db.Model):
     __tablename__ = 'notifications'
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    incident_id = db.Column(db.Integer, db.ForeignKey('incidents.id'), nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    incident_id = db.Column(db.Integer, db.ForeignKey('incidents.id', ondelete='CASCADE'), nullable=True)
 
     channel = db.Column(db.String(50))  #  email or sms
     message = db.Column(db.Text)
     sent_at = db.Column(db.DateTime, default=datetime.utcnow)
-    status = db.Column(db.String(50))  # sent or failed
\ No newline at end of file
+    status = db.Column(db.String(50))  # sent or failed
+
+    __table_args__ = (
+        db.Index('ix_notifications_user_id_sent_at', 'user_id', 'sent_at'),
+        db.Index('ix_notifications_incident_id', 'incident_id'),
+        db.Index('ix_notifications_sent_at', 'sent_at'),  # retention purge
+        {'sqlite_autoincrement': True},
+    )
+
+class OutboundEmail(db.Model):
+    """Email waiting to be sent by the outbox worker (see email_outbox.py)."""
+    __tablename__ = 'email_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    incident_id = db.Column(db.Integer, db.ForeignKey('incidents.id', ondelete='CASCADE'), nullable=True)
+
+    kind = db.Column(db.String(50), nullable=False)  # welcome, incident_confirmation, ...
+    message = db.Column(db.Text, nullable=False)  # Mailjet v3.1 message as JSON
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sending, sent or dead
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claim_token = db.Column(db.String(32), nullable=True)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+        db.Index('ix_email_outbox_claim_token', 'claim_token'),
+        db.Index('ix_email_outbox_user_id', 'user_id'),
+        db.Index('ix_email_outbox_incident_id', 'incident_id'),
+    )
+
+
+class IncidentDailyStat(db.Model):
+    """Incidents per created day, status and type; maintained by analytics.py."""
+    __tablename__ = 'incident_daily_stats'
+
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(50), primary_key=True)
+    type = db.Column(db.String(100), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class IncidentGeoCell(db.Model):
+    """Incidents per geohash cell (at several precisions) and status; maintained by analytics.py."""
+    __tablename__ = 'incident_geo_cells'
+
+    precision = db.Column(db.Integer, primary_key=True)
+    cell = db.Column(db.String(12), primary_key=True)
+    status = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Cold storage for closed incidents (see archive.py). Same columns and ids as
+# the hot tables, so rows are moved with INSERT ... SELECT and listings can
+# merge both; archived_at records when a row was moved. The hot tables use
+# AUTOINCREMENT on SQLite so an archived id is never handed out again.
+
+class ArchivedIncident(db.Model):
+    __tablename__ = 'incidents_archive'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+
+    title = db.Column(db.String(150), nullable=False)
+    description = db.Column(db.Text, nullable=False)
+    type = db.Column(db.String(100), nullable=False)
+    status = db.Column(db.String(50))
+
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+    geohash = db.Column(db.String(12), nullable=True)
+
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+    user = db.relationship('User', lazy=True)
+
+    __table_args__ = (
+        db.Index('ix_incidents_archive_created_at_id', 'created_at', 'id'),
+        db.Index('ix_incidents_archive_geohash', 'geohash'),
+        db.Index('ix_incidents_archive_status_created_at', 'status', 'created_at'),
+        db.Index('ix_incidents_archive_type_created_at', 'type', 'created_at'),
+        db.Index('ix_incidents_archive_user_id_created_at', 'user_id', 'created_at'),
+    )
+
+
+class ArchivedMedia(db.Model):
+    __tablename__ = 'media_archive'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    incident_id = db.Column(db.Integer, db.ForeignKey('incidents_archive.id', ondelete='CASCADE'), nullable=False)
+
+    media_type = db.Column(db.String(50))
+    file_url = db.Column(db.String(255), nullable=True)
+    status = db.Column(db.String(20))
+    error = db.Column(db.Text)
+    uploaded_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_media_archive_incident_id', 'incident_id'),
+    )
+
+
+class ArchivedStatusHistory(db.Model):
+    __tablename__ = 'status_history_archive'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    incident_id = db.Column(db.Integer, db.ForeignKey('incidents_archive.id', ondelete='CASCADE'), nullable=False)
+
+    changed_by = db.Column(db.String(120))
+    old_status = db.Column(db.String(50))
+    new_status = db.Column(db.String(50))
+    changed_at = db.Column(db.DateTime)
+    note = db.Column(db.Text)
+
+    __table_args__ = (
+        db.Index('ix_status_history_archive_incident_id_changed_at', 'incident_id', 'changed_at'),
+    )
+
+
+class ArchivedNotification(db.Model):
+    __tablename__ = 'notifications_archive'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    incident_id = db.Column(db.Integer, db.ForeignKey('incidents_archive.id', ondelete='CASCADE'), nullable=True)
+
+    channel = db.Column(db.String(50))
+    message = db.Column(db.Text)
+    sent_at = db.Column(db.DateTime)
+    status = db.Column(db.String(50))
+
+    __table_args__ = (
+        db.Index('ix_notifications_archive_incident_id', 'incident_id'),
+        db.Index('ix_notifications_archive_sent_at', 'sent_at'),
+        db.Index('ix_notifications_archive_user_id', 'user_id'),
+    )
@@ -0,0 +1,87 @@
+# notifications.py
+"""Fan-out of incident status changes to the reporter and subscribed admins.
+
+The email body is a fixed Mailjet template; the incident title, statuses and
+recipient name are passed as ``Variables``, so each recipient's message only
+differs in its ``To`` and ``name``. Messages are queued in the outbox with one bulk INSERT in the
+caller's transaction, and the outbox worker sends them in 50-message batches
+over a pooled HTTP session.
+"""
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, insert, or_, select
+
+from models import db, OutboundEmail, User
+
+SENDER = {
+    "Email": "wariobaajona@gmail.com",
+    "Name": "Ajali Support"
+}
+
+
+# User-controlled text only ever reaches the template as a variable: written
+# into the parts, a '{{' or '{%' in a title would be parsed by Mailjet
+STATUS_CHANGE_TEMPLATE = {
+    "From": SENDER,
+    "Subject": "Incident status update: {{var:title}}",
+    "TextPart": (
+        "Hello {{var:name}}, the incident "
+        "'{{var:title}}' has changed from {{var:old_status}} to {{var:new_status}}."
+    ),
+    "HTMLPart": (
+        "<h3>Hello {{var:name}},</h3>"
+        "<p>The incident <strong>{{var:title}}</strong> has changed from "
+        "<strong>{{var:old_status}}</strong> to <strong>{{var:new_status}}</strong>.</p>"
+        "<p>Thank you for using Ajali.</p>"
+    ),
+    "TemplateLanguage": True,
+}
+
+
+def render_status_change(incident, old_status, new_status):
+    """The message shared by every recipient of one status transition."""
+    return dict(STATUS_CHANGE_TEMPLATE, Variables={
+        "title": incident.title,
+        "old_status": old_status,
+        "new_status": new_status,
+    })
+
+
+def status_change_recipients(incident):
+    """The reporter plus every admin subscribed to status changes, in one query."""
+    rows = db.session.execute(
+        select(User.id, User.email, User.username).where(or_(
+            User.id == incident.user_id,
+            and_(User.is_admin.is_(True), User.notify_status_changes.is_(True)),
+        )).order_by(User.id)
+    ).all()
+    return [row for row in rows if row.email]
+
+
+def queue_status_change_notifications(incident, old_status, new_status):
+    """Queue one email per recipient; the caller commits with the status change."""
+    recipients = status_change_recipients(incident)
+    if not recipients:
+        return 0
+
+    template = render_status_change(incident, old_status, new_status)
+    now = datetime.utcnow()
+    rows = []
+    for recipient in recipients:
+        message = dict(template)
+        message["To"] = [{"Email": recipient.email, "Name": recipient.username}]
+        message["Variables"] = dict(template["Variables"], name=recipient.username)
+        rows.append({
+            'user_id': recipient.id,
+            'incident_id': incident.id,
+            'kind': 'status_change',
+            'message': json.dumps(message),
+            'status': 'pending',
+            'attempts': 0,
+            'next_attempt_at': now,
+            'created_at': now,
+        })
+
+    db.session.execute(insert(OutboundEmail), rows)
+    return len(rows)
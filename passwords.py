@@ -0,0 +1,88 @@
+# passwords.py
+"""Password hashing with a configurable cost, checked off the request thread.
+
+``PASSWORD_HASH_METHOD`` takes any Werkzeug method string, e.g.
+``scrypt:32768:8:1`` or ``pbkdf2:sha256:600000``. Hashing runs on a small
+thread pool: hashlib's scrypt and PBKDF2 release the GIL, so with threaded
+workers (``gunicorn --threads``) hashes run in parallel while the other
+request threads keep serving, and no more than ``PASSWORD_HASH_WORKERS``
+burn CPU per process. Once ``PASSWORD_HASH_MAX_PENDING`` hashes are queued
+or running, further ones raise ``PasswordHasherBusy`` (login answers 503)
+instead of piling up behind a credential-stuffing burst.
+
+A successful login whose stored hash was made with another method or cost
+is rehashed with the current one, so changing the setting reaches users as
+they sign in.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Werkzeug's parameters for a bare or partial method name
+METHOD_DEFAULTS = {
+    'scrypt': 'scrypt:32768:8:1',
+    'pbkdf2': 'pbkdf2:sha256:600000',
+    'pbkdf2:sha256': 'pbkdf2:sha256:600000',
+}
+
+
+class PasswordHasherBusy(Exception):
+    """Too many password hashes are already queued in this process."""
+
+
+def canonical_method(method):
+    return METHOD_DEFAULTS.get(method, method)
+
+
+class PasswordHasher:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+        app.config.setdefault('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1))
+        app.config.setdefault('PASSWORD_HASH_MAX_PENDING', 32)
+        app.config.setdefault('PASSWORD_HASH_TIMEOUT', 10)
+
+        workers = app.config['PASSWORD_HASH_WORKERS']
+        # 0 workers hashes inline on the request thread
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash') if workers else None
+        app.extensions['password_hasher'] = {
+            'executor': executor,
+            'slots': threading.BoundedSemaphore(app.config['PASSWORD_HASH_MAX_PENDING']),
+        }
+
+    @property
+    def _state(self):
+        return current_app.extensions['password_hasher']
+
+    @property
+    def method(self):
+        return canonical_method(current_app.config['PASSWORD_HASH_METHOD'])
+
+    def _run(self, fn, *args):
+        state = self._state
+        if state['executor'] is None:
+            return fn(*args)
+        if not state['slots'].acquire(blocking=False):
+            raise PasswordHasherBusy()
+        # The slot is held until the hash finishes, even if we stop waiting
+        future = state['executor'].submit(fn, *args)
+        future.add_done_callback(lambda f: state['slots'].release())
+        try:
+            return future.result(timeout=current_app.config['PASSWORD_HASH_TIMEOUT'])
+        except TimeoutError:
+            raise PasswordHasherBusy()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        return pwhash.split('$', 1)[0] != self.method
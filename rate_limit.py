@@ -0,0 +1,245 @@
+# rate_limit.py
+"""Token-bucket rate limits for the unauthenticated auth endpoints.
+
+Each limited endpoint has buckets keyed by client IP and by the email in the
+request body (``RATE_LIMITS``). A request takes one token from each; an empty
+bucket answers 429 with ``Retry-After`` before the view runs, so throttled
+attempts never reach the user lookup or the password hash. A check is one
+read-modify-write of a single key.
+
+Stores, chosen by ``RATE_LIMIT_STORAGE``:
+
+* ``memory``: per process; right for a single worker.
+* ``sqlite``: a small SQLite file shared by every worker on the host.
+* ``redis``: any Redis-compatible server, shared across hosts.
+
+Buckets start full, so ``"5/minute"`` allows a burst of five and then one
+more every twelve seconds.
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, jsonify, request
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+DEFAULT_LIMITS = {
+    'login': {'ip': '20/minute', 'email': '5/minute'},
+    'register': {'ip': '5/minute', 'email': '3/hour'},
+}
+
+
+def now():
+    return time.time()
+
+
+def parse_limit(spec):
+    """``"5/minute"`` -> ``(capacity, tokens per second)``."""
+    try:
+        count, period = spec.split('/')
+        capacity = int(count)
+        seconds = PERIODS[period.strip().rstrip('s')]
+    except (ValueError, KeyError):
+        raise ValueError(f'Invalid rate limit {spec!r}; expected e.g. "5/minute"')
+    return capacity, capacity / seconds
+
+
+def take_token(state, at, capacity, rate):
+    """Refill a ``(tokens, updated_at)`` bucket and try to take one token.
+
+    Returns ``(allowed, retry_after_seconds, new_state)``.
+    """
+    tokens, updated_at = state if state else (capacity, at)
+    tokens = min(capacity, tokens + max(0.0, at - updated_at) * rate)
+    if tokens >= 1:
+        return True, 0.0, (tokens - 1, at)
+    return False, (1 - tokens) / rate, (tokens, at)
+
+
+class MemoryStore:
+    """Buckets in a dict guarded by a lock, least recently used dropped first."""
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, at):
+        with self._lock:
+            allowed, retry_after, state = take_token(self._buckets.get(key), at, capacity, rate)
+            self._buckets[key] = state
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        return allowed, retry_after
+
+
+class SQLiteStore:
+    """Buckets in a SQLite file, so every worker process on a host shares them.
+
+    ``take`` purges buckets untouched for ``max_age`` seconds (the longest
+    refill time, after which they would be full) every ``purge_interval``.
+    """
+
+    def __init__(self, path, max_age=PERIODS['day'], purge_interval=300):
+        self.path = path
+        self.max_age = max_age
+        self.purge_interval = purge_interval
+        self._purged_at = None
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated_at REAL)'
+            )
+            self._local.connection = connection
+        return connection
+
+    def take(self, key, capacity, rate, at):
+        connection = self._connection()
+        # IMMEDIATE takes the write lock up front so concurrent workers serialize
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            state = connection.execute('SELECT tokens, updated_at FROM buckets WHERE key = ?', (key,)).fetchone()
+            allowed, retry_after, (tokens, updated_at) = take_token(state, at, capacity, rate)
+            connection.execute(
+                'INSERT INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at',
+                (key, tokens, updated_at),
+            )
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        if self._purged_at is None or at - self._purged_at >= self.purge_interval:
+            self._purged_at = at
+            self.purge(at - self.max_age)
+        return allowed, retry_after
+
+    def purge(self, before):
+        """Delete buckets untouched since ``before``; they would be full again anyway."""
+        self._connection().execute('DELETE FROM buckets WHERE updated_at < ?', (before,))
+
+
+# Same arithmetic as take_token, atomically on the server
+TAKE_SCRIPT = """
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local capacity, rate, at = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local tokens, updated_at = tonumber(state[1]), tonumber(state[2])
+if tokens == nil then tokens, updated_at = capacity, at end
+tokens = math.min(capacity, tokens + math.max(0, at - updated_at) * rate)
+local allowed, retry_after = 0, (1 - tokens) / rate
+if tokens >= 1 then tokens, allowed, retry_after = tokens - 1, 1, 0 end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', at)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(retry_after)}
+"""
+
+
+class RedisStore:
+    def __init__(self, client, prefix='ajali:ratelimit:'):
+        self.prefix = prefix
+        self._take = client.register_script(TAKE_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_STORAGE='redis' requires the redis package")
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def take(self, key, capacity, rate, at):
+        allowed, retry_after = self._take(keys=[self.prefix + key], args=[capacity, rate, at])
+        return bool(allowed), float(retry_after)
+
+
+class RateLimiter:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATE_LIMIT_ENABLED', os.getenv('RATE_LIMIT_ENABLED', '1') != '0')
+        app.config.setdefault('RATE_LIMIT_STORAGE', 'memory')
+        app.config.setdefault('RATE_LIMIT_SQLITE_PATH', os.path.join(app.instance_path, 'rate_limits.db'))
+        app.config.setdefault('RATE_LIMIT_PURGE_INTERVAL', 300)
+        app.config.setdefault('RATE_LIMIT_REDIS_URL', 'redis://localhost:6379/0')
+        app.config.setdefault('RATE_LIMITS', DEFAULT_LIMITS)
+        # Proxies in front of the app that append to X-Forwarded-For
+        app.config.setdefault('RATE_LIMIT_TRUSTED_PROXIES', 0)
+
+        limits = {
+            name: {scope: parse_limit(spec) for scope, spec in scopes.items()}
+            for name, scopes in app.config['RATE_LIMITS'].items()
+        }
+        # Seconds for the slowest bucket to refill from empty
+        max_age = max((capacity / rate for scopes in limits.values() for capacity, rate in scopes.values()), default=0)
+
+        storage = app.config['RATE_LIMIT_STORAGE']
+        if storage == 'memory':
+            store = MemoryStore()
+        elif storage == 'sqlite':
+            store = SQLiteStore(app.config['RATE_LIMIT_SQLITE_PATH'], max_age=max_age,
+                                purge_interval=app.config['RATE_LIMIT_PURGE_INTERVAL'])
+        elif storage == 'redis':
+            store = RedisStore.from_url(app.config['RATE_LIMIT_REDIS_URL'])
+        elif hasattr(storage, 'take'):
+            store = storage
+        else:
+            raise ValueError(f'Unknown RATE_LIMIT_STORAGE: {storage!r}')
+
+        app.extensions['rate_limit'] = {'store': store, 'limits': limits}
+
+    @staticmethod
+    def client_ip():
+        proxies = current_app.config['RATE_LIMIT_TRUSTED_PROXIES']
+        forwarded = [ip.strip() for ip in request.headers.get('X-Forwarded-For', '').split(',') if ip.strip()]
+        if proxies and len(forwarded) >= proxies:
+            return forwarded[-proxies]
+        return request.remote_addr or 'unknown'
+
+    @staticmethod
+    def _email():
+        data = request.get_json(silent=True)
+        email = data.get('email') if isinstance(data, dict) else None
+        return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+    def check(self, name):
+        """Take a token from each of ``name``'s buckets; return seconds to wait, or 0."""
+        state = current_app.extensions['rate_limit']
+        at = now()
+        for scope, (capacity, rate) in state['limits'].get(name, {}).items():
+            value = self.client_ip() if scope == 'ip' else self._email()
+            if value is None:
+                continue
+            allowed, retry_after = state['store'].take(f'{name}:{scope}:{value}', capacity, rate, at)
+            if not allowed:
+                return retry_after
+        return 0
+
+    def limit(self, name):
+        """Answer 429 with ``Retry-After`` once any of ``name``'s buckets is empty."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if current_app.config['RATE_LIMIT_ENABLED']:
+                    retry_after = self.check(name)
+                    if retry_after:
+                        response = jsonify({'message': 'Too many requests, try again later'})
+                        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+                        return response, 429
+                return view(*args, **kwargs)
+            return wrapper
+        return decorator
@@ -0,0 +1,222 @@
+# response_cache.py
+"""Cache for public GET responses, invalidated by bumping a namespace generation.
+
+Cache keys embed the namespace generation read *before* the view runs, so a
+response computed from data that a concurrent write has since changed is
+stored under a dead key and never served. Writes call ``invalidate`` after
+committing.
+
+The ``memory`` backend keeps entries in each process but reads and bumps
+generations in a SQLite file (``RESPONSE_CACHE_GENERATIONS_PATH``), so an
+invalidation from any gunicorn worker or CLI job on the host (``flask
+import-incidents``, ``flask archive-incidents``, ``flask seed``) reaches
+every worker's cache. Setting the path to None keeps generations in the
+process, which is only correct with a single process. Across hosts use the
+``redis`` backend (any Redis-compatible server).
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, make_response, request
+
+from serialization import response_format
+
+
+class SQLiteGenerations:
+    """Namespace generations in a SQLite file shared by every process on the host."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS generations (namespace TEXT PRIMARY KEY, value INTEGER)')
+            self._local.connection = connection
+        return connection
+
+    def get(self, namespace):
+        row = self._connection().execute(
+            'SELECT value FROM generations WHERE namespace = ?', (namespace,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, namespace):
+        self._connection().execute(
+            'INSERT INTO generations (namespace, value) VALUES (?, 1) '
+            'ON CONFLICT (namespace) DO UPDATE SET value = value + 1',
+            (namespace,),
+        )
+
+
+class MemoryBackend:
+    """LRU + TTL store guarded by a lock; safe across threads in one process.
+
+    ``generations`` (a ``SQLiteGenerations``) shares invalidations between
+    processes; without it they stay in this process.
+    """
+
+    def __init__(self, max_entries=1024, generations=None):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._shared_generations = generations
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def generation(self, namespace):
+        if self._shared_generations is not None:
+            return self._shared_generations.get(namespace)
+        with self._lock:
+            return self._generations.get(namespace, 0)
+
+    def bump(self, namespace):
+        if self._shared_generations is not None:
+            self._shared_generations.bump(namespace)
+            return
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+
+
+class RedisBackend:
+    """Store entries in a Redis-compatible server; Redis enforces TTL and LRU."""
+
+    def __init__(self, client, prefix='ajali:cache:'):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RESPONSE_CACHE_BACKEND='redis' requires the redis package")
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        status, content_type, etag, body = raw.split(b'\n', 3)
+        return int(status), content_type.decode(), etag.decode(), body
+
+    def set(self, key, value, ttl):
+        status, content_type, etag, body = value
+        raw = b'\n'.join([str(status).encode(), content_type.encode(), etag.encode(), body])
+        self.client.set(self.prefix + key, raw, ex=max(int(ttl), 1))
+
+    def generation(self, namespace):
+        return int(self.client.get(f'{self.prefix}gen:{namespace}') or 0)
+
+    def bump(self, namespace):
+        self.client.incr(f'{self.prefix}gen:{namespace}')
+
+
+class ResponseCache:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RESPONSE_CACHE_ENABLED', True)
+        app.config.setdefault('RESPONSE_CACHE_BACKEND', 'memory')
+        app.config.setdefault('RESPONSE_CACHE_TTL', 30)
+        app.config.setdefault('RESPONSE_CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('RESPONSE_CACHE_REDIS_URL', 'redis://localhost:6379/0')
+        app.config.setdefault('RESPONSE_CACHE_GENERATIONS_PATH', os.path.join(app.instance_path, 'response_cache.db'))
+
+        backend = app.config['RESPONSE_CACHE_BACKEND']
+        if backend == 'memory':
+            path = app.config['RESPONSE_CACHE_GENERATIONS_PATH']
+            generations = SQLiteGenerations(path) if path else None
+            store = MemoryBackend(app.config['RESPONSE_CACHE_MAX_ENTRIES'], generations)
+        elif backend == 'redis':
+            store = RedisBackend.from_url(app.config['RESPONSE_CACHE_REDIS_URL'])
+        elif hasattr(backend, 'get') and hasattr(backend, 'bump'):
+            store = backend
+        else:
+            raise ValueError(f'Unknown RESPONSE_CACHE_BACKEND: {backend!r}')
+        app.extensions['response_cache'] = store
+
+    @property
+    def backend(self):
+        return current_app.extensions['response_cache']
+
+    def invalidate(self, namespace):
+        self.backend.bump(namespace)
+
+    @staticmethod
+    def _normalize_args(args, defaults):
+        items = []
+        for key in sorted(args.keys()):
+            for value in sorted(args.getlist(key)):
+                if defaults.get(key) == value:
+                    continue
+                items.append(f'{key}={value}')
+        return '&'.join(items)
+
+    def cached(self, namespace, defaults=None):
+        """Serve a GET view from the cache, answering ``If-None-Match`` with 304."""
+        defaults = defaults or {}
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not current_app.config['RESPONSE_CACHE_ENABLED']:
+                    return view(*args, **kwargs)
+
+                store = self.backend
+                generation = store.generation(namespace)
+                # JSON and MessagePack bodies of one URL are cached apart
+                key = (f'{namespace}:{generation}:{response_format()}:'
+                       f'{request.path}?{self._normalize_args(request.args, defaults)}')
+
+                entry = store.get(key)
+                if entry is None:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    body = response.get_data()
+                    etag = hashlib.sha1(body).hexdigest()
+                    store.set(key, (200, response.content_type, etag, body), current_app.config['RESPONSE_CACHE_TTL'])
+                    cache_status = 'MISS'
+                else:
+                    status, content_type, etag, body = entry
+                    response = current_app.response_class(body, status=status, content_type=content_type)
+                    cache_status = 'HIT'
+
+                response.set_etag(etag)
+                response.cache_control.no_cache = True
+                response.vary.add('Accept')
+                response.headers['X-Cache'] = cache_status
+                return response.make_conditional(request)
+            return wrapper
+        return decorator
@@ -2,5 +2,6 @@
 from flask import Blueprint
 from .auth import auth_bp
 from .incidents import incidents_bp
+from .analytics import analytics_bp
 
-__all__ = ['auth_bp', 'incidents_bp']
\ No newline at end of file
+__all__ = ['auth_bp', 'incidents_bp', 'analytics_bp']
\ No newline at end of file
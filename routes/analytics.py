@@ -0,0 +1,92 @@
+# routes/analytics.py
+from datetime import date
+from flask import Blueprint, request, jsonify
+from identity import admin_required
+from database import read_replica
+from analytics import MAX_CELL_PRECISION, geo_cells, grouped_counts, time_series, zoom_to_precision
+from geo import cover_bbox, decode_geohash, split_bbox
+from incident_queries import parse_spatial_args
+
+analytics_bp = Blueprint('analytics', __name__)
+
+
+def _filters(args):
+    """Date range and dimension filters shared by the rollup endpoints."""
+    filters = {'status': args.get('status'), 'incident_type': args.get('type')}
+    for name, key in (('start', 'from'), ('end', 'to')):
+        value = args.get(key)
+        try:
+            filters[name] = date.fromisoformat(value) if value else None
+        except ValueError:
+            raise ValueError(f'{key} must be a date (YYYY-MM-DD)')
+    return filters
+
+
+@analytics_bp.route('/counts', methods=['GET'])
+@admin_required()
+@read_replica
+def get_counts():
+    by = request.args.get('by', 'status')
+    if by not in ('status', 'type'):
+        return jsonify({'message': 'by must be status or type'}), 400
+    try:
+        counts = grouped_counts(by, **_filters(request.args))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    return jsonify({'by': by, 'counts': counts, 'total': sum(counts.values())}), 200
+
+
+@analytics_bp.route('/series', methods=['GET'])
+@admin_required()
+@read_replica
+def get_series():
+    interval = request.args.get('interval', 'day')
+    if interval not in ('day', 'week', 'month'):
+        return jsonify({'message': 'interval must be day, week or month'}), 400
+    try:
+        series = time_series(interval, **_filters(request.args))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    return jsonify({'interval': interval, 'series': series}), 200
+
+
+@analytics_bp.route('/heatmap', methods=['GET'])
+@admin_required()
+@read_replica
+def get_heatmap():
+    try:
+        if 'precision' in request.args:
+            precision = request.args.get('precision', type=int)
+            if precision is None or not 1 <= precision <= MAX_CELL_PRECISION:
+                raise ValueError(f'precision must be between 1 and {MAX_CELL_PRECISION}')
+        else:
+            zoom = request.args.get('zoom', 0, type=int)
+            if not 0 <= zoom <= 22:
+                raise ValueError('zoom must be between 0 and 22')
+            precision = zoom_to_precision(zoom)
+        bbox, _ = parse_spatial_args(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    boxes = split_bbox(*bbox) if bbox else [(-180.0, -90.0, 180.0, 90.0)]
+    prefixes = [prefix for box in boxes for prefix in cover_bbox(*box)]
+    counts = geo_cells(precision, prefixes, status=request.args.get('status'))
+
+    cells = []
+    for cell, count in sorted(counts.items()):
+        min_lat, min_lng, max_lat, max_lng = decode_geohash(cell)
+        latitude, longitude = (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
+        # The prefix cover overshoots the box; keep cells whose centre is inside
+        if bbox and not any(b[1] <= latitude <= b[3] and b[0] <= longitude <= b[2] for b in boxes):
+            continue
+        cells.append({
+            'cell': cell,
+            'count': count,
+            'latitude': latitude,
+            'longitude': longitude,
+            'bounds': [min_lng, min_lat, max_lng, max_lat],
+        })
+
+    return jsonify({'precision': precision, 'cells': cells}), 200
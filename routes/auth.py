@@ -1,13 +1,27 @@
 from flask import Blueprint, request, jsonify, current_app
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from mail import send_welcome_email
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, current_user
+from mail import build_welcome_message
+from email_outbox import enqueue_email
 from models import User
 from app import db  
+from database import read_replica
+from extensions import password_hasher, rate_limiter, response_cache
+from passwords import PasswordHasherBusy
+from identity import admin_required
+from user_queries import paginate_users
+from bulk_delete import delete_users, parse_ids
+from serialization import respond
 
 auth_bp = Blueprint('auth', __name__)
 
+
+def _hasher_busy():
+    response = jsonify({'message': 'Too many sign-in attempts in progress, try again shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 @auth_bp.route('/register', methods=['POST'])
+@rate_limiter.limit('register')
 def register():
     data = request.get_json()
     
@@ -17,7 +31,10 @@ def register():
     if User.query.filter_by(username=data['username']).first():
         return jsonify({'message': 'Username already exists'}), 400
     
-    hashed_password = generate_password_hash(data['password'])
+    try:
+        hashed_password = password_hasher.hash(data['password'])
+    except PasswordHasherBusy:
+        return _hasher_busy()
     
     new_user = User(
         username=data['username'],
@@ -27,22 +44,35 @@ def register():
     )
     
     db.session.add(new_user)
-    db.session.commit()
+    db.session.flush()
 
-    status_code, response = send_welcome_email(new_user.email, new_user.username)
-    if status_code != 200:
-        current_app.logger.error(f"Failed to send welcome email: {response}")
+    # Queued in the same transaction; the email worker sends it
+    enqueue_email(new_user.id, build_welcome_message(new_user.email, new_user.username), 'welcome')
+    db.session.commit()
 
     return jsonify({'message': 'User created successfully'}), 201
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limiter.limit('login')
 def login():
     data = request.get_json()
     user = User.query.filter_by(email=data['email']).first()
     
-    if not user or not check_password_hash(user.password_hash, data['password']):
+    try:
+        valid = user is not None and password_hasher.verify(user.password_hash, data['password'])
+    except PasswordHasherBusy:
+        return _hasher_busy()
+    if not valid:
         return jsonify({'message': 'Invalid credentials'}), 401
-    
+
+    # Move hashes made with an older method or cost to the current one
+    if password_hasher.needs_rehash(user.password_hash):
+        try:
+            user.password_hash = password_hasher.hash(data['password'])
+            db.session.commit()
+        except PasswordHasherBusy:
+            pass
+
     access_token = create_access_token(identity=user.id)
     return jsonify(access_token=access_token), 200
 
@@ -53,11 +83,8 @@ def get_current_user():
 
     @jwt_required()
     def protected_get():
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-
-        if not user:
-            return jsonify({"error": "User not found"}), 404
+        # Resolved from the identity cache, no query
+        user = current_user
 
         return jsonify({
             "user": {
@@ -86,31 +113,17 @@ def get_current_user():
 
 
 @auth_bp.route('/users', methods=['GET'])
-@jwt_required()
+@admin_required()
+@read_replica
 def get_all_users():
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
-
-    if not current_user or not current_user.is_admin:
-        return jsonify({'message': 'Unauthorized'}), 403
-
-    users = User.query.all()
-    return jsonify({
-        'users': [
-            {
-                'id': user.id,
-                'username': user.username,
-                'email': user.email,
-                'phone': user.phone,
-                'is_admin': user.is_admin,
-                'created_at': user.created_at.isoformat()
-            }
-            for user in users
-        ]
-    }), 200
+    try:
+        page = paginate_users(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    return respond(page)
 
 @auth_bp.route('/users/<int:user_id>', methods=['DELETE', 'OPTIONS'])
-@jwt_required()
+@admin_required()
 def delete_user(user_id):
     if request.method == 'OPTIONS':
         # Handle preflight request
@@ -121,15 +134,6 @@ def delete_user(user_id):
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response, 200
 
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
-
-    # Check if current user is admin
-    if not current_user:
-        return jsonify({'message': 'User not found'}), 404
-    if not current_user.is_admin:
-        return jsonify({'message': 'Unauthorized - Admin access required'}), 403
-
     # Check if user exists
     user_to_delete = User.query.get(user_id)
     if not user_to_delete:
@@ -140,10 +144,10 @@ def delete_user(user_id):
         return jsonify({'message': 'Cannot delete yourself'}), 400
 
     try:
-        # Delete the user
-        db.session.delete(user_to_delete)
-        db.session.commit()
-        
+        # Their incidents and other rows go with them; rollups are kept in step
+        delete_users([user_id])
+        response_cache.invalidate('incidents')
+
         response = jsonify({'message': 'User deleted successfully'})
         response.headers.add('Access-Control-Allow-Origin', 'http://localhost:5173')
         return response, 200
@@ -151,4 +155,22 @@ def delete_user(user_id):
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Error deleting user: {str(e)}")
-        return jsonify({'message': 'Failed to delete user', 'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'message': 'Failed to delete user', 'error': str(e)}), 500
+
+@auth_bp.route('/users/bulk-delete', methods=['POST'])
+@admin_required()
+def bulk_delete_users():
+    try:
+        ids = parse_ids(request.get_json(silent=True), current_app.config.get('BULK_DELETE_MAX_IDS', 100000))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    if current_user.id in ids:
+        return jsonify({'message': 'Cannot delete yourself'}), 400
+
+    try:
+        users_deleted, incidents_deleted = delete_users(
+            ids, chunk_size=current_app.config.get('BULK_DELETE_CHUNK_SIZE', 5000)
+        )
+    finally:
+        response_cache.invalidate('incidents')
+    return jsonify({'deleted_users': users_deleted, 'deleted_incidents': incidents_deleted}), 200
@@ -1,75 +1,77 @@
 # app/routes/incidents.py
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, request, jsonify, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity, current_user
 from werkzeug.utils import secure_filename
 import os
 from models import db, Incident, Media, StatusHistory, User
+from extensions import response_cache, media_pipeline, tile_cache
+from media_pipeline import guess_media_type
+from database import read_replica
+from identity import admin_required
 from flask import current_app
-import cloudinary.uploader
-
-from send_incident_email import send_incident_confirmation_email
+from werkzeug.http import is_resource_modified
+
+from send_incident_email import build_incident_confirmation_message
+from email_outbox import enqueue_email
+from notifications import queue_status_change_notifications
+from incident_queries import (
+    apply_filters, detail_query, detail_version, listing_query, paginate_incidents, parse_fields, parse_include,
+    serialize_incident_detail,
+)
+from serialization import respond, response_format, serialize_media
+from incident_import import import_incidents, parse_ndjson, summarize
+from bulk_delete import delete_incidents, parse_ids
+from incident_export import EXPORT_FORMATS, export_filename, export_query, stream_export
+from tiles import TILE_MIMETYPE, build_tile, tile_filters, valid_tile
 
 from datetime import datetime
+from itertools import islice
+import hashlib
 
 incidents_bp = Blueprint('incidents', __name__, url_prefix='/incidents')
 
+
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in {'png', 'jpg', 'jpeg', 'gif', 'mp4', 'mov'}
 
+
 @incidents_bp.route('/', methods=['GET'])
+@response_cache.cached('incidents', defaults={'page': '1', 'per_page': '10', 'view': 'full'})
+@read_replica
 def get_incidents():
-    status = request.args.get('status')
-    reporter = request.args.get('reporter')  
-    query = Incident.query.join(User)
-    
-    if status:
-        query = query.filter(Incident.status == status)
-
-    if reporter:
-        query = query.filter(User.username == reporter)  
-
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-
-    pagination = query.order_by(Incident.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
-    incidents = pagination.items
+    try:
+        # Only the columns behind fields= or view= are selected
+        fields = parse_fields(request.args)
+        # status, type and reporter filters
+        query = apply_filters(listing_query(parse_include(request.args), fields), request.args)
 
-    return jsonify({
-    'total': pagination.total,
-    'pages': pagination.pages,
-    'current_page': pagination.page,
-    'incidents': [{
-        'id': incident.id,
-        'title': incident.title,
-        'description': incident.description,
-        'type': incident.type,  
-        'latitude': float(incident.latitude),
-        'longitude': float(incident.longitude),
-        'status': incident.status,
-        'created_at': incident.created_at.isoformat(),
-        'reporter': incident.user.username
-    } for incident in incidents]
-    }), 200
+        return respond(paginate_incidents(query, request.args, fields))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
 
 
 
 @incidents_bp.route('', methods=['POST'])
+@incidents_bp.route('/', methods=['POST'])
 @jwt_required()
 def create_incident():
     current_user_id = get_jwt_identity()
     data = request.form
-    
-    print("🔥 FORM DATA:", request.form)
-    print("🔥 FILES:", request.files)
-    print("Incoming form data:", data)
 
     required_fields = ['title', 'description', 'type', 'latitude', 'longitude']
     #for field in required_fields:
     #    if field not in data or not data[field].strip():
      #       return jsonify({'message': f'{field} is required.'}), 400
 
+    spooled = []
     try:
+        # Spool uploads to local disk before touching the database, so the
+        # write transaction below never waits on a file copy
+        for file in request.files.getlist('files'):
+            if file and allowed_file(file.filename):
+                spooled.append((media_pipeline.spool(file), file.filename))
+
         # Create incident
         new_incident = Incident(
             user_id=current_user_id,
@@ -80,56 +82,102 @@ def create_incident():
             longitude=data['longitude']
         )
         db.session.add(new_incident)
-        db.session.commit()
-
-        # Handle file uploads
-        if 'files' in request.files:
-            print("🔥 Files received:", request.files)
-            files = request.files.getlist('files')
-
-            for file in files:
-                if file and allowed_file(file.filename):
-                    try:
-                        upload_result = cloudinary.uploader.upload(file)
-                        print("✅ Cloudinary upload result:", upload_result)
-
-                        media_type = 'image' if upload_result["resource_type"] == "image" else 'video'
-                        media = Media(
-                            incident_id=new_incident.id,
-                            file_url=upload_result["secure_url"],
-                            media_type=media_type
-                        )
-                        db.session.add(media)
-
-                    except Exception as cloud_error:
-                        print("❌ Cloudinary Upload Failed:", str(cloud_error))
-                        return jsonify({
-                            'message': 'Image upload failed',
-                            'error': str(cloud_error)
-                        }), 400
-
-            db.session.commit()
-        else:
-            print("🚫 No 'files' key in request.files")
-
-        #  Send confirmation email
-        user = User.query.get(current_user_id)
-        if user and user.email:
+        media = [
+            Media(incident=new_incident, media_type=guess_media_type(filename), status='pending')
+            for _, filename in spooled
+        ]
+        db.session.add_all(media)
+        db.session.flush()
+
+        #  Queue confirmation email in the same transaction as the incident
+        user = current_user
+        if user.email:
             incident_data = {
                 'title': new_incident.title,
                 'description': new_incident.description,
                 'location': f"{new_incident.latitude}, {new_incident.longitude}",
                 'created_at': new_incident.created_at.strftime('%Y-%m-%d %H:%M:%S')
             }
-            status_code, response = send_incident_confirmation_email(user.email, user.username, incident_data)
-            current_app.logger.info(f"Email sent: {status_code} - {response}")
-
-        return jsonify({'message': 'Incident created successfully', 'id': new_incident.id}), 201
+            enqueue_email(
+                user.id,
+                build_incident_confirmation_message(user.email, user.username, incident_data),
+                'incident_confirmation',
+                incident_id=new_incident.id
+            )
+
+        incident_id = new_incident.id
+        uploads = [(m.id, path, filename) for m, (path, filename) in zip(media, spooled)]
+        db.session.commit()
+        response_cache.invalidate('incidents')
 
     except Exception as e:
         db.session.rollback()
+        for path, _ in spooled:
+            if os.path.exists(path):
+                os.remove(path)
+        return jsonify({'message': str(e)}), 400
+
+    # The media pipeline pushes the spooled files to storage
+    for media_id, path, filename in uploads:
+        media_pipeline.submit(media_id, media_pipeline.claim(path, media_id), filename)
+
+    if uploads:
+        return jsonify({
+            'message': 'Incident created, media upload in progress',
+            'id': incident_id,
+            'media': [media_id for media_id, _, _ in uploads]
+        }), 202
+
+    return jsonify({'message': 'Incident created successfully', 'id': incident_id}), 201
+
+@incidents_bp.route('/bulk', methods=['POST'])
+@jwt_required()
+def bulk_create_incidents():
+    user = current_user
+    max_rows = current_app.config.get('BULK_IMPORT_MAX_ROWS', 10000)
+
+    # NDJSON (one incident per line) or a JSON array / {"incidents": [...]}
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        rows = list(islice(parse_ndjson(request.stream), max_rows + 1))
+    else:
+        payload = request.get_json(silent=True)
+        rows = payload.get('incidents') if isinstance(payload, dict) else payload
+        if not isinstance(rows, list):
+            return jsonify({'message': 'Expected a JSON array of incidents or NDJSON'}), 400
+
+    if not rows:
+        return jsonify({'message': 'No incidents in request'}), 400
+    if len(rows) > max_rows:
+        return jsonify({'message': f'At most {max_rows} incidents per request'}), 413
+
+    results = list(import_incidents(rows, user, chunk_size=current_app.config.get('BULK_IMPORT_CHUNK_SIZE', 500)))
+    summary = summarize(results)
+    if summary['created']:
+        response_cache.invalidate('incidents')
+
+    if summary['created'] == len(results):
+        status_code = 201
+    elif summary['created']:
+        status_code = 207
+    else:
+        status_code = 400
+    return jsonify({'summary': summary, 'results': results}), status_code
+
+@incidents_bp.route('/bulk-delete', methods=['POST'])
+@admin_required()
+def bulk_delete_incidents():
+    try:
+        ids = parse_ids(request.get_json(silent=True), current_app.config.get('BULK_DELETE_MAX_IDS', 100000))
+    except ValueError as e:
         return jsonify({'message': str(e)}), 400
 
+    # One DELETE per chunk; child rows cascade in the database
+    try:
+        deleted = delete_incidents(ids, chunk_size=current_app.config.get('BULK_DELETE_CHUNK_SIZE', 5000))
+    finally:
+        response_cache.invalidate('incidents')
+    return jsonify({'deleted': deleted}), 200
+
 @incidents_bp.route('/<int:id>', methods=['PUT']) 
 @jwt_required()
 def update_incident(id):
@@ -151,26 +199,42 @@ def update_incident(id):
             incident.longitude = data['longitude']
         
         db.session.commit()
+        response_cache.invalidate('incidents')
         return jsonify({'message': 'Incident updated successfully'}), 200
     
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': str(e)}), 400
 
+@incidents_bp.route('/<int:id>', methods=['GET'])
+@jwt_required()
+@read_replica
+def get_incident(id):
+    version = detail_version(id)
+    if version is None:
+        return jsonify({'message': 'Incident not found'}), 404
+
+    # Repeat views are answered from the fingerprint alone, before loading anything
+    etag, last_modified = version
+    etag = f'{etag}-{response_format()}'
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = current_app.response_class(status=304)
+    else:
+        incident = detail_query().filter(Incident.id == id).first()
+        if incident is None:
+            return jsonify({'message': 'Incident not found'}), 404
+        response = respond(serialize_incident_detail(incident))
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
+
 @incidents_bp.route('/<int:id>/media', methods=['GET'])
 @jwt_required()
+@read_replica
 def get_incident_media(id):
     incident = Incident.query.get_or_404(id)
-    media_list = [
-        {
-            "id": m.id,
-            "media_type": m.media_type,
-            "file_url": m.file_url,
-            "uploaded_at": m.uploaded_at.isoformat()
-        }
-        for m in incident.media
-    ]
-    return jsonify(media_list), 200
+    return respond([serialize_media(m) for m in incident.media])
 
 
 
@@ -181,45 +245,37 @@ def delete_incident(incident_id):
     if not incident:
         return jsonify({"message": "Incident not found"}), 404
 
-    # Delete associated media
-    for media in incident.media:
-        db.session.delete(media)
-
-    # Delete associated status history
-    for status in incident.history:
-        db.session.delete(status)
-
-    # Now delete the incident itself
+    # Media, status history and notifications go with it (ON DELETE CASCADE)
     db.session.delete(incident)
     db.session.commit()
+    response_cache.invalidate('incidents')
 
     return jsonify({"message": "Incident and associated media/status history deleted"}), 200
 
 
 @incidents_bp.route('/<int:id>/status', methods=['PUT'])
-@jwt_required()
+@admin_required()
 def update_incident_status(id):
-    current_user = User.query.get(get_jwt_identity())
-    
-    if not current_user.is_admin:
-        return jsonify({'message': 'Unauthorized'}), 403
-    
     incident = Incident.query.get_or_404(id)
     data = request.get_json()
     
     try:
+        old_status = incident.status
         status_update = StatusHistory(
             incident_id=incident.id,
-            old_status=incident.status,
+            old_status=old_status,
             new_status=data['status'],
         )
         
         incident.status = data['status']
         
         db.session.add(status_update)
+
+        # Email the reporter and subscribed admins (sent by the outbox worker)
+        queue_status_change_notifications(incident, old_status, data['status'])
+
         db.session.commit()
-        
-        # add notification logic (email/SMS)
+        response_cache.invalidate('incidents')
         
         return jsonify({'message': 'Status updated successfully'}), 200
     
@@ -229,49 +285,57 @@ def update_incident_status(id):
 
 @incidents_bp.route('/all', methods=['GET'])
 @jwt_required()
+@read_replica
 def get_all_incidents():
     try:
-        # Get query parameters for filtering
-        status = request.args.get('status')
-        incident_type = request.args.get('type')
-        
-        # Base query
-        query = Incident.query.join(User)
-        
-        # Apply filters if they exist
-        if status:
-            query = query.filter(Incident.status == status)
-        if incident_type:
-            query = query.filter(Incident.type == incident_type)
-            
-        # Get pagination parameters
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
-        
-        # Execute query with pagination
-        pagination = query.order_by(Incident.created_at.desc()).paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
-        )
-        incidents = pagination.items
-        
-        return jsonify({
-            'total': pagination.total,
-            'pages': pagination.pages,
-            'current_page': pagination.page,
-            'incidents': [{
-                'id': incident.id,
-                'title': incident.title,
-                'description': incident.description,
-                'type': incident.type,
-                'latitude': float(incident.latitude),
-                'longitude': float(incident.longitude),
-                'status': incident.status,
-                'created_at': incident.created_at.isoformat(),
-                'reporter': incident.user.username
-            } for incident in incidents]
-        }), 200
+        try:
+            # Base query with the status, type and reporter filters, selecting only the requested fields
+            fields = parse_fields(request.args)
+            query = apply_filters(listing_query(parse_include(request.args), fields), request.args)
+
+            # Pagination (page/per_page, cursor) and spatial parameters
+            return respond(paginate_incidents(query, request.args, fields))
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
         
     except Exception as e:
-        return jsonify({'message': str(e)}), 500
\ No newline at end of file
+        return jsonify({'message': str(e)}), 500
+
+@incidents_bp.route('/tiles/<int:z>/<int:x>/<int:y>', methods=['GET'])
+@read_replica
+def get_incident_tile(z, x, y):
+    if not valid_tile(z, x, y):
+        return jsonify({'message': 'Tile not found'}), 404
+
+    # status, type and reporter filters; each combination is cached separately
+    filters = tile_filters(request.args)
+    data, cache_status = tile_cache.get_or_build(z, x, y, filters, lambda: build_tile(z, x, y, filters))
+
+    response = current_app.response_class(data, mimetype=TILE_MIMETYPE)
+    response.set_etag(hashlib.sha1(data).hexdigest())
+    response.cache_control.no_cache = True
+    response.headers['X-Cache'] = cache_status
+    return response.make_conditional(request)
+
+@incidents_bp.route('/export', methods=['GET'])
+@admin_required()
+def export_incidents():
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'message': f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+
+    try:
+        query, near = export_query(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    compress = 'gzip' in request.accept_encodings
+    response = current_app.response_class(
+        stream_with_context(stream_export(query, near, fmt, compress=compress)),
+        mimetype=EXPORT_FORMATS[fmt][1],
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="{export_filename(fmt)}"'
+    response.vary.add('Accept-Encoding')
+    if compress:
+        response.content_encoding = 'gzip'
+    return response
@@ -1,105 +1,277 @@
-from datetime import datetime
+# seed.py
+"""Synthetic data for development and capacity testing.
+
+    flask seed --users 1000 --incidents 1000000
+
+Rows are generated lazily and written with chunked ``executemany`` inserts, so
+memory stays flat however many incidents are requested. Ids are assigned up
+front (continuing after any existing rows), which lets media, status history
+and notifications be written in the same chunk as their incident without
+reading anything back.
+"""
+import math
 import random
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, select, text
+
+from analytics import rebuild_rollups
+from extensions import password_hasher, response_cache, tile_cache
+from geo import encode_geohash
+from models import db, User, Incident, Media, StatusHistory, Notification, INCIDENT_TYPES
+
+MEDIA_TYPES = ['image', 'image', 'image', 'video']
+
+# (name, latitude, longitude, relative weight, spread in km)
+CITIES = [
+    ('Nairobi', -1.2864, 36.8172, 45, 12),
+    ('Mombasa', -4.0435, 39.6682, 15, 8),
+    ('Kisumu', -0.0917, 34.7680, 8, 6),
+    ('Nakuru', -0.3031, 36.0800, 8, 6),
+    ('Eldoret', 0.5143, 35.2698, 6, 5),
+    ('Thika', -1.0333, 37.0693, 4, 4),
+    ('Kampala', 0.3476, 32.5825, 7, 8),
+    ('Dar es Salaam', -6.7924, 39.2083, 7, 10),
+]
+
+# Allowed status changes; every history chain starts at 'pending'
+TRANSITIONS = {
+    'pending': ['in_progress', 'in_progress', 'rejected'],
+    'in_progress': ['resolved', 'resolved', 'rejected'],
+    'resolved': [],
+    'rejected': [],
+}
+
+DEFAULT_CHUNK_SIZE = 5000
+KM_PER_DEGREE = 111.32
+
+
+class IncidentGenerator:
+    def __init__(self, rng, user_ids, now=None, days=365, media_ratio=0.3, history_ratio=0.7):
+        self.rng = rng
+        self.user_ids = user_ids
+        self.now = now or datetime.utcnow()
+        self.days = days
+        self.media_ratio = media_ratio
+        self.history_ratio = history_ratio
+        self._cumulative_weights = []
+        total = 0
+        for city in CITIES:
+            total += city[3]
+            self._cumulative_weights.append(total)
+
+    def coordinates(self):
+        """A point normally distributed around a weighted random city centre."""
+        _, lat, lng, _, spread_km = self.rng.choices(CITIES, cum_weights=self._cumulative_weights)[0]
+        lat += self.rng.gauss(0, spread_km) / KM_PER_DEGREE
+        lng += self.rng.gauss(0, spread_km) / (KM_PER_DEGREE * math.cos(math.radians(lat)))
+        return round(lat, 6), round(lng, 6)
+
+    def status_chain(self):
+        """Walk ``TRANSITIONS`` from 'pending'; the incident ends in the last status."""
+        chain = []
+        status = 'pending'
+        while TRANSITIONS[status] and self.rng.random() < self.history_ratio:
+            new_status = self.rng.choice(TRANSITIONS[status])
+            chain.append((status, new_status))
+            status = new_status
+        return status, chain
+
+    def rows(self, incident_id):
+        """Rows for one incident and its children, keyed by table."""
+        rng = self.rng
+        user_id = rng.choice(self.user_ids)
+        lat, lng = self.coordinates()
+        created_at = self.now - timedelta(seconds=rng.randrange(self.days * 24 * 3600))
+        status, chain = self.status_chain()
+
+        changed_at = created_at
+        history = []
+        for old_status, new_status in chain:
+            changed_at = min(changed_at + timedelta(minutes=rng.randrange(10, 3 * 24 * 60)), self.now)
+            history.append({
+                'incident_id': incident_id,
+                'changed_by': 'admin@example.com',
+                'old_status': old_status,
+                'new_status': new_status,
+                'changed_at': changed_at,
+                'note': f'Changed from {old_status} to {new_status}',
+            })
+
+        incident_type = rng.choice(INCIDENT_TYPES)
+        incident = {
+            'id': incident_id,
+            'user_id': user_id,
+            'title': f'{incident_type} report #{incident_id}',
+            'description': f'Synthetic {incident_type.lower()} report #{incident_id}',
+            'type': incident_type,
+            'status': status,
+            'latitude': lat,
+            'longitude': lng,
+            # Core inserts skip the ORM event that normally fills this in
+            'geohash': encode_geohash(lat, lng),
+            'created_at': created_at,
+            'updated_at': changed_at,
+        }
+
+        media = []
+        if rng.random() < self.media_ratio:
+            for n in range(rng.randint(1, 3)):
+                media_type = rng.choice(MEDIA_TYPES)
+                extension = 'mp4' if media_type == 'video' else 'jpg'
+                media.append({
+                    'incident_id': incident_id,
+                    'media_type': media_type,
+                    'file_url': f'https://example.com/media/{incident_id}_{n}.{extension}',
+                    'status': 'uploaded',
+                    'error': None,
+                    'uploaded_at': created_at,
+                })
+
+        notifications = [{
+            'user_id': user_id,
+            'incident_id': incident_id,
+            'channel': 'email',
+            'message': 'incident_confirmation',
+            'sent_at': created_at,
+            'status': 'sent',
+        }]
+        return {'incidents': [incident], 'media': media, 'status_history': history, 'notifications': notifications}
 
-from models import db, User, Incident, Media, StatusHistory, Notification
-from app import create_app  
-from werkzeug.security import generate_password_hash
 
-app = create_app()  # app instance here
+def _next_id(model):
+    return (db.session.scalar(select(func.max(model.id))) or 0) + 1
 
-def seed_database():
-    with app.app_context():
+
+def _insert_chunks(table, rows, chunk_size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            db.session.execute(table.insert(), chunk)
+            db.session.commit()
+            chunk = []
+    if chunk:
+        db.session.execute(table.insert(), chunk)
+        db.session.commit()
+
+
+def _sync_sequences(models):
+    # Explicit ids don't advance PostgreSQL's serial sequences
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for model in models:
+        table = model.__tablename__
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 1))"
+        ))
+    db.session.commit()
+
+
+def seed_database(users=5, incidents=10, password='password', chunk_size=DEFAULT_CHUNK_SIZE,
+                  seed=None, reset=False, progress=None):
+    """Append ``users`` users and ``incidents`` incidents; user ids are reused if ``users`` is 0."""
+    if reset:
         db.drop_all()
         db.create_all()
 
-        def random_phone():
-            return f"+1{random.randint(200, 999)}{random.randint(100, 999)}{random.randint(1000, 9999)}"
-
-        def random_coordinates():
-            return round(random.uniform(-90, 90), 6), round(random.uniform(-180, 180), 6)
-
-        # Create users
-        users = []
-        for i in range(1, 6):
-            is_admin = i == 1
-            user = User(
-                username=f"User {i}",
-                email=f"user{i}@example.com",
-                password_hash=generate_password_hash(f"password{i}"),
-                phone=random_phone(),
-                is_admin=is_admin
-            )
-            db.session.add(user)
-            users.append(user)
+    rng = random.Random(seed)
+    # Hashing is deliberately slow; every seeded user shares one hash
+    password_hash = password_hasher.hash(password)
+    now = datetime.utcnow()
 
-        db.session.commit()
+    first_user_id = _next_id(User)
+    admin_exists = db.session.scalar(select(User.id).where(User.is_admin.is_(True)).limit(1)) is not None
 
-        # Create incidents
-        incident_types = ['Theft', 'Accident', 'Vandalism', 'Suspicious Activity', 'Other']
-        statuses = ['pending', 'in_progress', 'resolved', 'rejected']
-        incidents = []
-
-        for i in range(10):
-            lat, lng = random_coordinates()
-            incident = Incident(
-                user_id=random.choice(users).id,
-                title=f"Incident Case #{i+1}",
-                description=f"Detailed description of incident #{i+1}",
-                type=random.choice(incident_types),
-                status=random.choice(statuses),
-                latitude=lat,
-                longitude=lng
-            )
-            db.session.add(incident)
-            incidents.append(incident)
+    def user_rows():
+        for user_id in range(first_user_id, first_user_id + users):
+            yield {
+                'id': user_id,
+                'username': f'user{user_id}',
+                'email': f'user{user_id}@example.com',
+                'password_hash': password_hash,
+                'phone': f'+2547{rng.randint(10000000, 99999999)}',
+                'is_admin': not admin_exists and user_id == first_user_id,
+                'notify_status_changes': False,
+                'created_at': now,
+                'updated_at': now,
+            }
 
-        db.session.commit()
+    _insert_chunks(User.__table__, user_rows(), chunk_size)
 
-        # Add media
-        media_types = ['image', 'video', 'document']
-        for incident in incidents[:5]:
-            for m in range(random.randint(1, 3)):
-                media = Media(
-                    incident_id=incident.id,
-                    media_type=random.choice(media_types),
-                    file_url=f"https://example.com/media/{incident.id}_{m}.jpg"
-                )
-                db.session.add(media)
-
-        # Add status history
-        for incident in incidents:
-            current_status = 'pending'
-            for _ in range(random.randint(1, 3)):
-                new_status = random.choice([s for s in statuses if s != current_status])
-                history = StatusHistory(
-                    incident_id=incident.id,
-                    changed_by="admin@example.com",
-                    old_status=current_status,
-                    new_status=new_status,
-                    note=f"Changed from {current_status} to {new_status}"
-                )
-                db.session.add(history)
-                current_status = new_status
-            incident.status = current_status
-
-        # Add notifications
-        for user in users[:3]:
-            for _ in range(random.randint(2, 4)):
-                incident = random.choice(incidents)
-                notification = Notification(
-                    user_id=user.id,
-                    incident_id=incident.id,
-                    channel=random.choice(['email', 'sms']),
-                    message=f"Notification for {user.username}",
-                    status='sent'
-                )
-                db.session.add(notification)
+    if users:
+        user_ids = range(first_user_id, first_user_id + users)
+    else:
+        user_ids = db.session.scalars(select(User.id)).all()
+    if incidents and not user_ids:
+        raise ValueError('Seeding incidents needs at least one user')
 
+    generator = IncidentGenerator(rng, user_ids, now=now)
+    tables = {
+        'incidents': Incident.__table__,
+        'media': Media.__table__,
+        'status_history': StatusHistory.__table__,
+        'notifications': Notification.__table__,
+    }
+    counts = dict.fromkeys(tables, 0)
+    buffers = {name: [] for name in tables}
+
+    def flush():
+        # Parents first so foreign keys hold within the chunk
+        for name, table in tables.items():
+            if buffers[name]:
+                db.session.execute(table.insert(), buffers[name])
+                counts[name] += len(buffers[name])
+                buffers[name].clear()
         db.session.commit()
+        if progress:
+            progress(counts['incidents'])
+
+    first_incident_id = _next_id(Incident)
+    for incident_id in range(first_incident_id, first_incident_id + incidents):
+        for name, rows in generator.rows(incident_id).items():
+            buffers[name].extend(rows)
+        if len(buffers['incidents']) >= chunk_size:
+            flush()
+    flush()
+
+    # Bulk inserts bypass the incremental rollup hook and tile invalidation
+    rebuild_rollups()
+    db.session.commit()
+    tile_cache.clear()
+    _sync_sequences([User, Incident, Media, StatusHistory, Notification])
+    response_cache.invalidate('incidents')
+    counts['users'] = users
+    return counts
+
+
+@click.command('seed')
+@click.option('--users', type=int, default=5, show_default=True, help='Users to create.')
+@click.option('--incidents', type=int, default=10, show_default=True, help='Incidents to create.')
+@click.option('--password', default='password', show_default=True, help='Password for every seeded user.')
+@click.option('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, show_default=True, help='Rows per INSERT batch.')
+@click.option('--seed', 'random_seed', type=int, help='Random seed for a reproducible dataset.')
+@click.option('--reset', is_flag=True, help='Drop and recreate all tables first.')
+@with_appcontext
+def seed_command(users, incidents, password, chunk_size, random_seed, reset):
+    """Bulk-load synthetic users and incidents."""
+    started = datetime.utcnow()
+
+    def progress(done):
+        elapsed = (datetime.utcnow() - started).total_seconds() or 1
+        click.echo(f'  {done}/{incidents} incidents ({done / elapsed:.0f}/s)')
+
+    counts = seed_database(users, incidents, password=password, chunk_size=chunk_size,
+                           seed=random_seed, reset=reset, progress=progress if incidents > chunk_size else None)
+    click.echo(f"Seeded: {counts['users']} users, {counts['incidents']} incidents")
+    click.echo(f"Media: {counts['media']},  StatusHistories: {counts['status_history']}")
+    click.echo(f"Notifications: {counts['notifications']}")
 
-        print(f"Seeded: {len(users)} users, {len(incidents)} incidents")
-        print(f"Media: {Media.query.count()},  StatusHistories: {StatusHistory.query.count()}")
-        print(f"Notifications: {Notification.query.count()}")
 
 if __name__ == '__main__':
-    seed_database()
\ No newline at end of file
+    from app import create_app
+
+    with create_app().app_context():
+        print(seed_database(reset=True))
@@ -0,0 +1,157 @@
+# serialization.py
+"""Response encoding: a fast JSON provider, precompiled row serializers and
+MessagePack negotiation.
+
+``FastJSONProvider`` replaces Flask's stdlib encoder with orjson when it is
+installed, so ``jsonify`` encodes in C; datetimes are written as ISO 8601
+by the encoder itself, so serializers hand them over untouched.
+
+``compile_serializer`` builds the ``row -> dict`` function for a fixed set of
+attributes once: one ``attrgetter`` call per row fetches
+every value, including dotted paths such as ``user.username``. The incident,
+media, status history and user endpoints share the serializers defined here;
+``incident_serializer`` and ``user_serializer`` compile one per projection
+requested with ``fields=`` and keep it.
+
+Views that return data call ``respond``, which answers in MessagePack when
+the client prefers ``application/msgpack`` and the msgpack package is
+installed, and in JSON otherwise.
+"""
+from datetime import date, datetime, time
+from functools import lru_cache
+from operator import attrgetter
+
+from flask import current_app, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - the stdlib encoder still works
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+
+def encode_default(value):
+    """Encode what JSON and MessagePack lack natively, the same way in both."""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return DefaultJSONProvider.default(value)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider on top of orjson, falling back to the stdlib encoder."""
+
+    default = staticmethod(encode_default)
+
+    def _options(self):
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+    def _orjson_dumps(self, obj):
+        try:
+            return orjson.dumps(obj, default=encode_default, option=self._options())
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits, which the stdlib encoder accepts
+            return None
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            data = self._orjson_dumps(obj)
+            if data is not None:
+                return data.decode()
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        pretty = self.compact is False or (self.compact is None and self._app.debug)
+        if orjson is None or pretty:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        data = self._orjson_dumps(obj)
+        if data is None:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(data, mimetype=self.mimetype)
+
+
+def compile_serializer(*fields):
+    """Build a function turning an object into a dict of fixed fields.
+
+    Each field is an attribute name, or ``(key, path)`` where ``path`` may be
+    dotted. Missing related objects are not handled; every path must resolve.
+    """
+    keys = tuple(field if isinstance(field, str) else field[0] for field in fields)
+    paths = [field if isinstance(field, str) else field[1] for field in fields]
+    getter = attrgetter(*paths)
+
+    if len(paths) == 1:
+        def serialize(obj):
+            return {keys[0]: getter(obj)}
+    else:
+        def serialize(obj):
+            return dict(zip(keys, getter(obj)))
+    serialize.fields = keys
+    return serialize
+
+
+INCIDENT_FIELDS = ('id', 'title', 'description', 'type', 'latitude', 'longitude', 'status', 'created_at', 'reporter')
+
+# Fields that are not a column of the incident row
+INCIDENT_PATHS = {'reporter': 'user.username'}
+
+
+@lru_cache(maxsize=64)
+def incident_serializer(fields=INCIDENT_FIELDS):
+    """Serializer for a ``fields=`` projection of ``INCIDENT_FIELDS``, compiled once per projection."""
+    return compile_serializer(*((name, INCIDENT_PATHS.get(name, name)) for name in fields))
+
+
+serialize_incident_row = incident_serializer()
+
+serialize_media = compile_serializer('id', 'media_type', 'file_url', 'status', 'uploaded_at')
+
+serialize_status_change = compile_serializer('old_status', 'new_status', 'changed_by', 'changed_at', 'note')
+
+USER_FIELDS = ('id', 'username', 'email', 'phone', 'is_admin', 'created_at')
+
+
+@lru_cache(maxsize=64)
+def user_serializer(fields=USER_FIELDS):
+    """Serializer for a ``fields=`` projection of ``USER_FIELDS``, compiled once per projection."""
+    return compile_serializer(*fields)
+
+
+def wants_msgpack():
+    if msgpack is None:
+        return False
+    best = request.accept_mimetypes.best_match([JSON_MIMETYPE, MSGPACK_MIMETYPE], default=JSON_MIMETYPE)
+    return best == MSGPACK_MIMETYPE
+
+
+def response_format():
+    """Short name of the negotiated representation, for cache keys and ETags."""
+    return 'msgpack' if wants_msgpack() else 'json'
+
+
+def respond(data, status=200):
+    """Encode ``data`` as MessagePack or JSON, whichever the client prefers."""
+    if wants_msgpack():
+        body = msgpack.packb(data, default=encode_default)
+        response = current_app.response_class(body, status=status, mimetype=MSGPACK_MIMETYPE)
+    else:
+        response = jsonify(data)
+        response.status_code = status
+    response.vary.add('Accept')
+    return response
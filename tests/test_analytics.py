@@ -0,0 +1,162 @@
+from datetime import datetime
+import pytest
+from werkzeug.security import generate_password_hash
+from app import create_app
+from analytics import rebuild_rollups, zoom_to_precision
+from geo import decode_geohash, encode_geohash
+from models import db, User, Incident, IncidentDailyStat, IncidentGeoCell
+
+@pytest.fixture
+def app():
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'JWT_SECRET_KEY': 'test-secret',
+        'EMAIL_TRANSPORT': 'fake',
+        'MEDIA_UPLOAD_WORKERS': 0,
+    })
+
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            User(username='admin', email='admin@example.com',
+                 password_hash=generate_password_hash('adminpassword'), is_admin=True),
+            User(username='reporter', email='reporter@example.com',
+                 password_hash=generate_password_hash('password123')),
+        ])
+        db.session.commit()
+        yield app
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def _headers(client, email, password):
+    token = client.post('/auth/login', json={'email': email, 'password': password}).json['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+@pytest.fixture
+def admin(client):
+    return _headers(client, 'admin@example.com', 'adminpassword')
+
+def _incident(day, status='pending', type='Accident', lat=-1.2864, lng=36.8172):
+    return Incident(user_id=2, title='t', description='d', type=type, status=status,
+                    latitude=lat, longitude=lng, created_at=datetime.fromisoformat(day))
+
+def _snapshot():
+    daily = {(r.day.isoformat(), r.status, r.type): r.count for r in IncidentDailyStat.query if r.count}
+    cells = {(r.precision, r.cell, r.status): r.count for r in IncidentGeoCell.query if r.count}
+    return daily, cells
+
+def _seed():
+    db.session.add_all([
+        _incident('2026-10-05T08:00:00'),
+        _incident('2026-10-05T09:00:00', status='resolved'),
+        _incident('2026-10-06T10:00:00', type='Theft'),
+        _incident('2026-09-28T10:00:00', type='Theft', lat=-4.0435, lng=39.6682),
+    ])
+    db.session.commit()
+
+def test_rollups_follow_inserts_updates_and_deletes(app):
+    _seed()
+    incremental = _snapshot()
+    rebuild_rollups()
+    db.session.commit()
+    assert _snapshot() == incremental
+
+    incident = Incident.query.filter_by(type='Theft', latitude=-4.0435).one()
+    incident.status = 'in_progress'
+    incident.latitude, incident.longitude = -1.2864, 36.8172
+    db.session.commit()
+    db.session.delete(Incident.query.filter_by(status='resolved').one())
+    db.session.commit()
+
+    incremental = _snapshot()
+    rebuild_rollups()
+    db.session.commit()
+    assert _snapshot() == incremental
+    assert incremental[0][('2026-09-28', 'in_progress', 'Theft')] == 1
+    assert ('2026-10-05', 'resolved', 'Accident') not in incremental[0]
+
+def test_rollups_roll_back_with_the_incident(app):
+    _seed()
+    before = _snapshot()
+    db.session.add(_incident('2026-10-07T10:00:00'))
+    db.session.flush()
+    db.session.rollback()
+    assert _snapshot() == before
+
+def test_status_change_route_moves_counts(client, admin):
+    _seed()
+    incident = Incident.query.filter_by(status='pending', type='Accident').one()
+    client.put(f'/incidents/{incident.id}/status', json={'status': 'resolved'}, headers=admin)
+
+    counts = client.get('/analytics/counts?by=status', headers=admin).json
+    assert counts['counts'] == {'pending': 2, 'resolved': 2}
+    assert counts['total'] == 4
+
+def test_counts_by_type_with_date_range(client, admin):
+    _seed()
+    response = client.get('/analytics/counts?by=type&from=2026-10-01&to=2026-10-31', headers=admin)
+    assert response.json['counts'] == {'Accident': 2, 'Theft': 1}
+
+    response = client.get('/analytics/counts?by=type&status=pending', headers=admin)
+    assert response.json['counts'] == {'Accident': 1, 'Theft': 2}
+
+def test_series_buckets(client, admin):
+    _seed()
+    daily = client.get('/analytics/series?interval=day', headers=admin).json['series']
+    assert daily == [
+        {'bucket': '2026-09-28', 'count': 1},
+        {'bucket': '2026-10-05', 'count': 2},
+        {'bucket': '2026-10-06', 'count': 1},
+    ]
+    weekly = client.get('/analytics/series?interval=week', headers=admin).json['series']
+    assert weekly == [{'bucket': '2026-09-28', 'count': 1}, {'bucket': '2026-10-05', 'count': 3}]
+    monthly = client.get('/analytics/series?interval=month&type=Theft', headers=admin).json['series']
+    assert monthly == [{'bucket': '2026-09-01', 'count': 1}, {'bucket': '2026-10-01', 'count': 1}]
+
+def test_heatmap(client, admin):
+    _seed()
+    world = client.get('/analytics/heatmap?precision=3', headers=admin).json
+    assert world['precision'] == 3
+    assert {c['cell']: c['count'] for c in world['cells']} == {
+        encode_geohash(-1.2864, 36.8172, 3): 3,
+        encode_geohash(-4.0435, 39.6682, 3): 1,
+    }
+
+    nairobi = client.get('/analytics/heatmap?zoom=12&bbox=36.6,-1.5,37.0,-1.1', headers=admin).json
+    assert nairobi['precision'] == zoom_to_precision(12)
+    assert [c['count'] for c in nairobi['cells']] == [3]
+    min_lng, min_lat, max_lng, max_lat = nairobi['cells'][0]['bounds']
+    assert min_lat <= -1.2864 <= max_lat and min_lng <= 36.8172 <= max_lng
+
+    resolved = client.get('/analytics/heatmap?precision=2&status=resolved', headers=admin).json
+    assert [c['count'] for c in resolved['cells']] == [1]
+
+def test_analytics_requires_admin_and_valid_args(client, admin):
+    reporter = _headers(client, 'reporter@example.com', 'password123')
+    assert client.get('/analytics/counts', headers=reporter).status_code == 403
+    assert client.get('/analytics/counts?by=colour', headers=admin).status_code == 400
+    assert client.get('/analytics/series?interval=year', headers=admin).status_code == 400
+    assert client.get('/analytics/series?from=yesterday', headers=admin).status_code == 400
+    assert client.get('/analytics/heatmap?precision=9', headers=admin).status_code == 400
+
+def test_decode_geohash_contains_point():
+    min_lat, min_lng, max_lat, max_lng = decode_geohash(encode_geohash(-1.2864, 36.8172, 5))
+    assert min_lat <= -1.2864 <= max_lat
+    assert min_lng <= 36.8172 <= max_lng
+
+def test_bulk_import_updates_rollups(app):
+    from incident_import import import_incidents
+
+    rows = [{'title': 't', 'description': 'd', 'type': 'Other', 'latitude': 0.3476, 'longitude': 32.5825}] * 3
+    results = list(import_incidents(rows, User.query.get(2)))
+    assert [r['status'] for r in results] == ['created'] * 3
+
+    incremental = _snapshot()
+    rebuild_rollups()
+    db.session.commit()
+    assert _snapshot() == incremental
+    assert sum(incremental[0].values()) == 3
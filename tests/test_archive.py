@@ -0,0 +1,191 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+from app import create_app
+from analytics import rebuild_rollups
+from archive import archive_incidents, purge_notifications
+from bulk_delete import delete_users
+from models import (db, User, Incident, Media, StatusHistory, Notification, ArchivedIncident, ArchivedMedia,
+                    ArchivedNotification, ArchivedStatusHistory, IncidentDailyStat, IncidentGeoCell)
+
+OLD = datetime.utcnow() - timedelta(days=400)
+
+@pytest.fixture
+def app():
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'JWT_SECRET_KEY': 'test-secret',
+        'EMAIL_TRANSPORT': 'fake',
+        'MEDIA_UPLOAD_WORKERS': 0,
+    })
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='reporter', email='reporter@example.com',
+                            password_hash=generate_password_hash('password123')))
+        db.session.commit()
+        yield app
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def _incident(day, status='resolved', updated_at=OLD, title='Flooded road'):
+    incident = Incident(user_id=1, title=title, description='d', type='Accident', status=status,
+                        latitude=-1.28, longitude=36.82, created_at=datetime(2025, 1, day))
+    db.session.add(incident)
+    db.session.flush()
+    db.session.add_all([
+        Media(incident_id=incident.id, file_url='/a.jpg', media_type='image'),
+        StatusHistory(incident_id=incident.id, old_status='pending', new_status=status),
+        Notification(user_id=1, incident_id=incident.id, channel='email', status='sent', sent_at=updated_at),
+    ])
+    db.session.commit()
+    # Set after the flush so onupdate doesn't replace it
+    db.session.execute(Incident.__table__.update().where(Incident.id == incident.id).values(updated_at=updated_at))
+    db.session.commit()
+    return incident.id
+
+def _snapshot():
+    daily = {(r.day, r.status, r.type): r.count for r in IncidentDailyStat.query if r.count}
+    cells = {(r.precision, r.cell, r.status): r.count for r in IncidentGeoCell.query if r.count}
+    return daily, cells
+
+def _seed():
+    return {
+        'old_resolved': [_incident(day) for day in (1, 3, 5)],
+        'old_rejected': _incident(7, status='rejected'),
+        'old_pending': _incident(2, status='pending'),
+        'recent_resolved': _incident(4, updated_at=datetime.utcnow()),
+    }
+
+def test_archive_moves_closed_incidents_with_their_rows(app):
+    ids = _seed()
+    before = _snapshot()
+    assert archive_incidents() == 4
+
+    archived = sorted(ids['old_resolved'] + [ids['old_rejected']])
+    assert sorted(i.id for i in ArchivedIncident.query) == archived
+    assert sorted(i.id for i in Incident.query) == sorted([ids['old_pending'], ids['recent_resolved']])
+    for model, archive_model in ((Media, ArchivedMedia), (StatusHistory, ArchivedStatusHistory),
+                                 (Notification, ArchivedNotification)):
+        assert model.query.count() == 2
+        assert sorted(row.incident_id for row in archive_model.query) == archived
+
+    incident = db.session.get(ArchivedIncident, ids['old_rejected'])
+    assert (incident.title, incident.status, incident.updated_at) == ('Flooded road', 'rejected', OLD)
+    assert incident.archived_at is not None
+
+    # Archival is not a delete: the dashboard totals don't move, and a rebuild agrees
+    assert _snapshot() == before
+    rebuild_rollups()
+    assert _snapshot() == before
+
+def test_deleting_a_user_drops_their_archived_incidents_from_rollups(app):
+    _seed()
+    archive_incidents()
+
+    assert delete_users([1]) == (1, 2)
+    assert ArchivedIncident.query.count() == 0
+    assert _snapshot() == ({}, {})
+
+def test_archive_is_chunked_and_resumable(app):
+    _seed()
+    assert archive_incidents(chunk_size=3, max_chunks=1) == 3
+    assert ArchivedIncident.query.count() == 3
+    assert archive_incidents(chunk_size=3) == 1
+    assert archive_incidents(chunk_size=3) == 0
+    assert archive_incidents(older_than_days=0) == 1
+
+def test_archived_ids_are_not_reused(app):
+    first = _incident(1)
+    assert archive_incidents() == 1
+
+    # The newest row was archived; a new incident must not take its id
+    second = _incident(2)
+    assert second > first
+    assert archive_incidents() == 1
+    assert sorted(i.id for i in ArchivedIncident.query) == [first, second]
+    assert len({m.id for m in ArchivedMedia.query}) == 2
+    assert len({n.id for n in ArchivedNotification.query}) == 2
+
+def test_include_archived_listing(client, app):
+    ids = _seed()
+    archive_incidents()
+
+    response = client.get('/incidents/?per_page=10')
+    assert response.json['total'] == 2
+
+    response = client.get('/incidents/?include_archived=true&per_page=4')
+    assert response.json['total'] == 6
+    assert response.json['pages'] == 2
+    days = [item['created_at'][:10] for item in response.json['incidents']]
+    assert days == ['2025-01-07', '2025-01-05', '2025-01-04', '2025-01-03']
+    assert [item['archived'] for item in response.json['incidents']] == [True, True, False, True]
+    assert response.json['incidents'][0]['reporter'] == 'reporter'
+
+    response = client.get('/incidents/?include_archived=true&per_page=4&page=2')
+    assert [item['created_at'][:10] for item in response.json['incidents']] == ['2025-01-02', '2025-01-01']
+
+    seen, cursor = [], ''
+    while cursor is not None:
+        page = client.get(f'/incidents/?include_archived=true&per_page=4&cursor={cursor}').json
+        seen += [item['id'] for item in page['incidents']]
+        cursor = page['next_cursor']
+    assert len(seen) == 6 and len(set(seen)) == 6
+
+    response = client.get('/incidents/?include_archived=true&status=rejected')
+    assert [item['id'] for item in response.json['incidents']] == [ids['old_rejected']]
+
+    response = client.get('/incidents/?include_archived=true&bbox=30,-5,31,-4')
+    assert response.json['incidents'] == []
+
+    response = client.get('/incidents/?include_archived=true&per_page=2&fields=title')
+    assert [set(item) for item in response.json['incidents']] == [{'id', 'title', 'archived'}] * 2
+
+    assert client.get('/incidents/?include_archived=true&q=flooded').status_code == 400
+
+def test_include_archived_loads_only_the_page(client, app):
+    for day in range(1, 29):
+        _incident(day, status='pending' if day % 2 == 0 else 'resolved')
+    archive_incidents()
+    loaded = []
+
+    def record(target, context):
+        loaded.append(target)
+
+    for model in (Incident, ArchivedIncident):
+        event.listen(model, 'load', record)
+    try:
+        db.session.expunge_all()
+        response = client.get('/incidents/?include_archived=true&per_page=3&page=5')
+    finally:
+        for model in (Incident, ArchivedIncident):
+            event.remove(model, 'load', record)
+
+    assert response.json['total'] == 28
+    assert [item['created_at'][:10] for item in response.json['incidents']] == ['2025-01-16', '2025-01-15', '2025-01-14']
+    assert [item['archived'] for item in response.json['incidents']] == [False, True, False]
+    # Pages are merged in SQL; only the rows shown are loaded
+    assert len(loaded) == 3
+
+def test_purge_notifications(app):
+    _seed()
+    archive_incidents()
+    db.session.add(Notification(user_id=1, channel='email', status='sent'))
+    db.session.commit()
+
+    assert purge_notifications(older_than_days=180, chunk_size=2) == 5
+    assert Notification.query.count() == 2
+    assert ArchivedNotification.query.count() == 0
+
+def test_cli_commands(app):
+    _seed()
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['archive-incidents', '--chunk-size', '2', '--max-chunks', '1'])
+    assert result.output == 'Archived 2 incidents\n'
+    result = runner.invoke(args=['purge-notifications', '--older-than-days', '30'])
+    assert result.output == 'Purged 5 notifications\n'
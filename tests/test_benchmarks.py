@@ -0,0 +1,51 @@
+from benchmarks.bench_api import TestClientDriver, compare, percentile, run_scenarios
+from benchmarks.bench_serialization import measure
+from benchmarks.datasets import ensure_dataset
+
+
+def test_percentile_nearest_rank():
+    values = [i / 1000 for i in range(1, 101)]
+    assert percentile(values, 50) == 0.05
+    assert percentile(values, 99) == 0.099
+    assert percentile([0.5], 95) == 0.5
+
+def test_compare_flags_regressions_beyond_threshold():
+    baseline = {'feed': {'p50_ms': 10, 'p95_ms': 20, 'p99_ms': 30, 'throughput_rps': 100,
+                         'statements_per_request': 2, 'errors': 0}}
+    within = {'feed': {'p50_ms': 11, 'p95_ms': 21, 'p99_ms': 35, 'throughput_rps': 90,
+                       'statements_per_request': 2, 'errors': 0}}
+    assert compare(within, baseline, threshold=0.2) == []
+
+    worse = {'feed': {'p50_ms': 13, 'p95_ms': 20, 'p99_ms': 30, 'throughput_rps': 70,
+                      'statements_per_request': 3, 'errors': 0}}
+    regressions = compare(worse, baseline, threshold=0.2)
+    assert len(regressions) == 3
+    assert any(line.startswith('feed.statements_per_request') for line in regressions)
+
+def test_testclient_driver_runs_every_scenario(tmp_path):
+    url = ensure_dataset(5, 50, directory=str(tmp_path))
+    driver = TestClientDriver(url)
+    with driver:
+        results = run_scenarios(driver, users=5, incidents=50, requests_per_scenario=3)
+
+    assert set(results) == {'incidents_feed', 'incidents_all', 'create_incident', 'login', 'me'}
+    for name, result in results.items():
+        assert result['requests'] == 3
+        assert result['errors'] == 0
+        if name != 'me':
+            assert result['statements_per_request'] >= 1
+    # The token's user comes from the identity cache
+    assert results['me']['statements_per_request'] < 1
+    # The listing is a constant number of queries regardless of page contents
+    assert results['incidents_feed']['statements_per_request'] <= 2
+
+def test_serialization_benchmark_payloads_match():
+    results = measure(incidents=20, repeat=2)
+
+    assert 'stdlib' in results
+    if 'orjson' in results:
+        # Same document, only encoded faster
+        assert results['orjson']['bytes'] == results['stdlib']['bytes']
+    for result in results.values():
+        assert result['p50_ms'] > 0
+        assert 0 < result['gzip_bytes'] < result['bytes']
@@ -0,0 +1,145 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+from app import create_app
+from analytics import rebuild_rollups
+from models import (db, User, Incident, Media, StatusHistory, Notification, OutboundEmail,
+                    IncidentDailyStat, IncidentGeoCell)
+
+@pytest.fixture
+def app():
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'JWT_SECRET_KEY': 'test-secret',
+        'EMAIL_TRANSPORT': 'fake',
+        'MEDIA_UPLOAD_WORKERS': 0,
+        'BULK_DELETE_CHUNK_SIZE': 10,
+    })
+
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            User(username='admin', email='admin@example.com',
+                 password_hash=generate_password_hash('adminpassword'), is_admin=True),
+            User(username='spammer', email='spammer@example.com',
+                 password_hash=generate_password_hash('password123')),
+            User(username='reporter', email='reporter@example.com', password_hash='x'),
+        ])
+        db.session.commit()
+        yield app
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def _headers(client, email, password):
+    token = client.post('/auth/login', json={'email': email, 'password': password}).json['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+@pytest.fixture
+def admin(client):
+    return _headers(client, 'admin@example.com', 'adminpassword')
+
+def _seed(user_id, count):
+    incidents = [
+        Incident(user_id=user_id, title=f'Spam {i}', description='buy now', type='Other',
+                 status='resolved' if i % 2 else 'pending', latitude=-1.28 + i / 1000, longitude=36.82,
+                 created_at=datetime(2026, 10, 1 + i % 5))
+        for i in range(count)
+    ]
+    db.session.add_all(incidents)
+    db.session.flush()
+    for incident in incidents:
+        db.session.add_all([
+            Media(incident_id=incident.id, file_url='/a.jpg', media_type='image'),
+            StatusHistory(incident_id=incident.id, old_status='pending', new_status='resolved'),
+            Notification(user_id=user_id, incident_id=incident.id, channel='email', status='sent'),
+            OutboundEmail(user_id=user_id, incident_id=incident.id, kind='incident_confirmation', message='{}'),
+        ])
+    db.session.commit()
+    return [incident.id for incident in incidents]
+
+def _snapshot():
+    daily = {(r.day, r.status, r.type): r.count for r in IncidentDailyStat.query if r.count}
+    cells = {(r.precision, r.cell, r.status): r.count for r in IncidentGeoCell.query if r.count}
+    return daily, cells
+
+def _assert_rollups_consistent():
+    maintained = _snapshot()
+    rebuild_rollups()
+    assert maintained == _snapshot()
+    db.session.rollback()
+
+def _child_counts():
+    return [model.query.count() for model in (Incident, Media, StatusHistory, Notification, OutboundEmail)]
+
+def test_deleting_an_incident_cascades(client, admin):
+    incident_id, = _seed(2, 1)
+    assert client.delete(f'/incidents/{incident_id}', headers=admin).status_code == 200
+    assert _child_counts() == [0, 0, 0, 0, 0]
+    _assert_rollups_consistent()
+
+def test_bulk_delete_incidents(client, admin):
+    spam = _seed(2, 45)
+    kept = _seed(3, 3)
+    client.get('/incidents/')
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        response = client.post('/incidents/bulk-delete', json={'ids': spam + [999999]}, headers=admin)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    assert response.status_code == 200
+    assert response.json == {'deleted': 45}
+
+    # One DELETE per chunk of ten, whatever the number of child rows
+    assert len([s for s in statements if s.startswith('DELETE FROM incidents')]) == 5
+    assert _child_counts() == [3, 3, 3, 3, 3]
+    assert {i.id for i in Incident.query} == set(kept)
+    _assert_rollups_consistent()
+
+    listing = client.get('/incidents/?per_page=50').json
+    assert listing['total'] == 3
+    assert client.get('/incidents/?q=spam').json['total'] == 3
+
+def test_bulk_delete_users(client, admin):
+    _seed(2, 25)
+    _seed(3, 2)
+    spammer = _headers(client, 'spammer@example.com', 'password123')
+    assert client.get('/auth/me', headers=spammer).status_code == 200
+
+    response = client.post('/auth/users/bulk-delete', json={'ids': [2]}, headers=admin)
+    assert response.status_code == 200
+    assert response.json == {'deleted_users': 1, 'deleted_incidents': 25}
+
+    assert [u.username for u in User.query.order_by(User.id)] == ['admin', 'reporter']
+    assert _child_counts() == [2, 2, 2, 2, 2]
+    _assert_rollups_consistent()
+    assert client.get('/auth/me', headers=spammer).status_code == 401
+
+def test_delete_user_removes_their_incidents(client, admin):
+    _seed(3, 4)
+    assert client.delete('/auth/users/3', headers=admin).status_code == 200
+    assert _child_counts() == [0, 0, 0, 0, 0]
+    _assert_rollups_consistent()
+
+def test_bulk_delete_validation(client, admin):
+    spammer = _headers(client, 'spammer@example.com', 'password123')
+    assert client.post('/incidents/bulk-delete', json={'ids': [1]}, headers=spammer).status_code == 403
+    assert client.post('/auth/users/bulk-delete', json={'ids': [2]}, headers=spammer).status_code == 403
+
+    for body in ({}, {'ids': []}, {'ids': ['1']}, {'ids': [True]}, [1, 2]):
+        assert client.post('/incidents/bulk-delete', json=body, headers=admin).status_code == 400
+
+    response = client.post('/auth/users/bulk-delete', json={'ids': [1, 2]}, headers=admin)
+    assert response.status_code == 400
+    assert response.json['message'] == 'Cannot delete yourself'
+    assert User.query.count() == 3
@@ -0,0 +1,140 @@
+import json
+import pytest
+from werkzeug.security import generate_password_hash
+from app import create_app
+from models import db, User, Incident, OutboundEmail
+
+@pytest.fixture
+def app():
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'JWT_SECRET_KEY': 'test-secret',
+        'EMAIL_TRANSPORT': 'fake',
+        'MEDIA_UPLOAD_WORKERS': 0,
+        'BULK_IMPORT_CHUNK_SIZE': 2,
+        'BULK_IMPORT_MAX_ROWS': 10,
+    })
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='agency', email='agency@example.com',
+                            password_hash=generate_password_hash('password123')))
+        db.session.commit()
+        yield app
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def headers(client):
+    response = client.post('/auth/login', json={'email': 'agency@example.com', 'password': 'password123'})
+    return {'Authorization': f"Bearer {response.json['access_token']}"}
+
+def _row(**overrides):
+    row = {'title': 'Crash', 'description': 'Two cars', 'type': 'Accident', 'latitude': -1.28, 'longitude': 36.82}
+    row.update(overrides)
+    return row
+
+def test_bulk_import_json_array(client, headers):
+    rows = [_row(title=f'Crash {i}') for i in range(5)]
+    response = client.post('/incidents/bulk', json=rows, headers=headers)
+
+    assert response.status_code == 201
+    assert response.json['summary'] == {'created': 5, 'invalid': 0, 'failed': 0}
+    ids = [r['id'] for r in response.json['results']]
+    assert [Incident.query.get(i).title for i in ids] == [f'Crash {i}' for i in range(5)]
+    assert Incident.query.filter(Incident.geohash.is_(None)).count() == 0
+
+    # Confirmation emails go through the outbox, one per incident
+    emails = OutboundEmail.query.order_by(OutboundEmail.id).all()
+    assert [e.incident_id for e in emails] == ids
+    assert all(e.kind == 'incident_confirmation' and e.status == 'pending' for e in emails)
+
+def test_bulk_import_reports_each_invalid_row(client, headers):
+    rows = [
+        _row(),
+        _row(latitude=91),
+        _row(type='Alien landing'),
+        _row(title=''),
+        'not an object',
+        _row(longitude='east'),
+    ]
+    response = client.post('/incidents/bulk', json={'incidents': rows}, headers=headers)
+
+    assert response.status_code == 207
+    results = response.json['results']
+    assert [r['index'] for r in results] == list(range(6))
+    assert [r['status'] for r in results] == ['created'] + ['invalid'] * 5
+    assert results[1]['errors'] == ['latitude must be between -90 and 90']
+    assert results[2]['errors'][0].startswith('type must be one of')
+    assert results[3]['errors'] == ['title is required']
+    assert results[4]['errors'] == ['row must be a JSON object']
+    assert results[5]['errors'] == ['longitude must be a number']
+    assert Incident.query.count() == 1
+
+def test_bulk_import_rejects_wrongly_typed_values(client, headers):
+    rows = [
+        _row(type=['Theft']),
+        _row(title={'a': 1}),
+        _row(description=42),
+        _row(latitude=True),
+        _row(longitude=[36.8]),
+        _row(latitude='-1.28'),
+    ]
+    response = client.post('/incidents/bulk', json=rows, headers=headers)
+
+    assert response.status_code == 400
+    results = response.json['results']
+    assert [r['status'] for r in results] == ['invalid'] * 6
+    assert results[0]['errors'] == ['type must be a string']
+    assert results[1]['errors'] == ['title must be a string']
+    assert results[2]['errors'] == ['description must be a string']
+    assert results[3]['errors'] == ['latitude must be a number']
+    assert results[4]['errors'] == ['longitude must be a number']
+    assert results[5]['errors'] == ['latitude must be a number']
+    assert Incident.query.count() == 0
+
+def test_bulk_import_ndjson(client, headers):
+    body = '\n'.join([json.dumps(_row()), '{broken', '', json.dumps(_row(type='Theft'))]) + '\n'
+    response = client.post('/incidents/bulk', data=body, content_type='application/x-ndjson', headers=headers)
+
+    assert response.status_code == 207
+    assert [r['status'] for r in response.json['results']] == ['created', 'invalid', 'created']
+    assert response.json['results'][1]['errors'][0].startswith('invalid JSON')
+
+def test_bulk_import_limits(client, headers):
+    assert client.post('/incidents/bulk', json=[_row()] * 11, headers=headers).status_code == 413
+    assert client.post('/incidents/bulk', json={'rows': 1}, headers=headers).status_code == 400
+    assert client.post('/incidents/bulk', json=[_row(type='x')], headers=headers).status_code == 400
+    assert client.post('/incidents/bulk', json=[_row()]).status_code == 401
+
+def test_bulk_import_invalidates_listing_cache(client, headers):
+    assert client.get('/incidents/').json['total'] == 0
+    client.post('/incidents/bulk', json=[_row()], headers=headers)
+    assert client.get('/incidents/').json['total'] == 1
+
+def test_import_command(app, tmp_path):
+    source = tmp_path / 'incidents.ndjson'
+    source.write_text('\n'.join(json.dumps(_row(title=f'Row {i}')) for i in range(3)) + '\n' + json.dumps(_row(latitude=200)) + '\n')
+    report = tmp_path / 'report.ndjson'
+
+    result = app.test_cli_runner().invoke(args=['import-incidents', str(source), '--user-email', 'agency@example.com',
+                                                '--chunk-size', '2', '--report', str(report)])
+
+    assert result.exit_code == 0, result.output
+    assert 'Created: 3, invalid: 1, failed: 0' in result.output
+    lines = [json.loads(line) for line in report.read_text().splitlines()]
+    assert [line['status'] for line in lines] == ['created', 'created', 'created', 'invalid']
+    assert OutboundEmail.query.count() == 3
+
+def test_import_command_accepts_json_array(app, tmp_path):
+    source = tmp_path / 'incidents.json'
+    source.write_text(json.dumps([_row(), _row()]))
+
+    result = app.test_cli_runner().invoke(args=['import-incidents', str(source), '--user-email', 'agency@example.com'])
+
+    assert result.exit_code == 0, result.output
+    assert Incident.query.count() == 2
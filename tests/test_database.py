@@ -0,0 +1,55 @@
+import pytest
+from sqlalchemy import text
+from app import create_app
+from models import db, User, Incident
+from database import engine_options, normalize_url
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'primary.db'}",
+        'DATABASE_REPLICA_URL': f"sqlite:///{tmp_path / 'replica.db'}",
+        'JWT_SECRET_KEY': 'test-secret',
+        'RESPONSE_CACHE_ENABLED': False,
+    })
+
+    with app.app_context():
+        db.create_all()
+        db.metadata.create_all(app.extensions['read_replica'])
+        yield app
+        db.drop_all()
+
+def _seed(engine, title):
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), {'id': 1, 'username': 'u', 'email': 'u@example.com', 'password_hash': 'x'})
+        conn.execute(Incident.__table__.insert(), {
+            'id': 1, 'user_id': 1, 'title': title, 'description': 'd', 'type': 'Accident',
+            'status': 'pending', 'latitude': 1.0, 'longitude': 1.0,
+        })
+
+def test_sqlite_connections_are_tuned(app):
+    with db.engine.connect() as conn:
+        assert conn.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+        assert conn.execute(text('PRAGMA busy_timeout')).scalar() == 5000
+        assert conn.execute(text('PRAGMA synchronous')).scalar() == 1  # NORMAL
+
+def test_get_routes_read_from_replica(app):
+    _seed(db.engine, 'from primary')
+    _seed(app.extensions['read_replica'], 'from replica')
+    client = app.test_client()
+
+    response = client.get('/incidents/')
+    assert response.status_code == 200
+    assert response.json['incidents'][0]['title'] == 'from replica'
+
+    # Outside read-only views everything uses the primary
+    db.session.expunge_all()
+    assert db.session.get(Incident, 1).title == 'from primary'
+
+def test_engine_options():
+    assert engine_options('sqlite:///ajali.db') == {}
+    options = engine_options('postgresql://db/ajali')
+    assert options['pool_pre_ping'] is True
+    assert options['pool_size'] > 0 and options['pool_recycle'] > 0
+    assert normalize_url('postgres://u:p@host/db') == 'postgresql://u:p@host/db'
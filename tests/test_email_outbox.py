@@ -0,0 +1,140 @@
+import json
+import pytest
+from datetime import datetime, timedelta
+from app import create_app
+from sqlalchemy import update
+from models import db, User, Notification, OutboundEmail
+from email_outbox import EmailWorker, FakeMailjetTransport, enqueue_email
+
+@pytest.fixture
+def app():
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'JWT_SECRET_KEY': 'test-secret',
+        'EMAIL_TRANSPORT': 'fake',
+    })
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def user(app):
+    user = User(username='testuser', email='test@example.com', password_hash='x')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+def _message(email):
+    return {'To': [{'Email': email}], 'Subject': 'Hi', 'TextPart': 'Hi'}
+
+def test_register_queues_welcome_email(client):
+    response = client.post('/auth/register', json={
+        'username': 'newuser',
+        'email': 'new@example.com',
+        'password': 'password123'
+    })
+    assert response.status_code == 201
+
+    email = OutboundEmail.query.one()
+    assert email.kind == 'welcome'
+    assert email.status == 'pending'
+    assert json.loads(email.message)['To'][0]['Email'] == 'new@example.com'
+
+def test_worker_sends_in_batches_and_records_notifications(user):
+    for i in range(5):
+        enqueue_email(user.id, _message(f'user{i}@example.com'), 'welcome')
+    db.session.commit()
+
+    transport = FakeMailjetTransport()
+    worker = EmailWorker(transport, batch_size=2, concurrency=2)
+    assert worker.run_once() == 4
+    assert worker.run_once() == 1
+    assert worker.run_once() == 0
+    worker.shutdown()
+
+    assert sorted(len(batch) for batch in transport.batches) == [1, 2, 2]
+    assert {e.status for e in OutboundEmail.query.all()} == {'sent'}
+    notifications = Notification.query.all()
+    assert len(notifications) == 5
+    assert {(n.channel, n.status) for n in notifications} == {('email', 'sent')}
+
+def test_worker_retries_with_backoff_then_dead_letters(user):
+    enqueue_email(user.id, _message('bad@example.com'), 'welcome')
+    db.session.commit()
+
+    transport = FakeMailjetTransport(fail=lambda message: True)
+    worker = EmailWorker(transport, max_attempts=2, base_backoff=60)
+
+    assert worker.run_once() == 1
+    email = OutboundEmail.query.one()
+    assert email.status == 'pending'
+    assert email.attempts == 1
+    assert email.next_attempt_at > datetime.utcnow() + timedelta(seconds=50)
+
+    # Not due yet
+    assert worker.run_once() == 0
+
+    email.next_attempt_at = datetime.utcnow()
+    db.session.commit()
+    assert worker.run_once() == 1
+    worker.shutdown()
+
+    email = OutboundEmail.query.one()
+    assert email.status == 'dead'
+    assert email.last_error == 'fake failure'
+    assert [n.status for n in Notification.query.all()] == ['failed', 'failed']
+
+def test_worker_reclaims_expired_leases(user):
+    enqueue_email(user.id, _message('a@example.com'), 'welcome')
+    db.session.commit()
+
+    worker = EmailWorker(FakeMailjetTransport(), lease_seconds=60)
+    assert len(worker.claim(10)) == 1
+    assert worker.claim(10) == []
+
+    email = OutboundEmail.query.one()
+    email.claimed_at = datetime.utcnow() - timedelta(seconds=120)
+    db.session.commit()
+    assert len(worker.claim(10)) == 1
+    worker.shutdown()
+
+def test_worker_skips_rows_reclaimed_after_its_lease_expired(user, monkeypatch):
+    for email in ('a@example.com', 'b@example.com'):
+        enqueue_email(user.id, _message(email), 'welcome')
+    db.session.commit()
+
+    worker = EmailWorker(FakeMailjetTransport(), lease_seconds=60)
+    other = EmailWorker(FakeMailjetTransport(), lease_seconds=60)
+    claim = worker.claim
+
+    def slow_claim(limit):
+        rows = claim(limit)
+        # Keep our copies as a separate worker process would
+        for row in rows:
+            db.session.expunge(row)
+        # Our lease on the first row runs out mid-batch and another worker takes it
+        db.session.execute(
+            update(OutboundEmail).where(OutboundEmail.id == rows[0].id)
+            .values(claimed_at=datetime.utcnow() - timedelta(seconds=120))
+        )
+        db.session.commit()
+        assert len(other.claim(10)) == 1
+        return rows
+
+    monkeypatch.setattr(worker, 'claim', slow_claim)
+    assert worker.run_once() == 2
+    worker.shutdown()
+    other.shutdown()
+
+    first, second = OutboundEmail.query.order_by(OutboundEmail.id).all()
+    assert (first.status, first.attempts) == ('sending', 0)
+    assert first.claim_token is not None
+    assert (second.status, second.attempts, second.claim_token) == ('sent', 1, None)
+    assert Notification.query.count() == 1
@@ -0,0 +1,126 @@
+import csv
+import gzip
+import io
+import json
+import pytest
+from werkzeug.security import generate_password_hash
+from app import create_app
+from models import db, User, Incident, Media, StatusHistory
+
+@pytest.fixture
+def app():
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'JWT_SECRET_KEY': 'test-secret',
+        'EMAIL_TRANSPORT': 'fake',
+        'MEDIA_UPLOAD_WORKERS': 0,
+    })
+
+    with app.app_context():
+        db.create_all()
+        admin = User(username='admin', email='admin@example.com',
+                     password_hash=generate_password_hash('adminpassword'), is_admin=True)
+        reporter = User(username='reporter', email='reporter@example.com',
+                        password_hash=generate_password_hash('password123'))
+        db.session.add_all([admin, reporter])
+        db.session.commit()
+
+        nairobi = Incident(user_id=reporter.id, title='Crash on Uhuru Highway', description='d', type='Accident',
+                           status='in_progress', latitude=-1.2864, longitude=36.8172)
+        mombasa = Incident(user_id=admin.id, title='Stolen phone', description='d', type='Theft',
+                           latitude=-4.0435, longitude=39.6682)
+        db.session.add_all([nairobi, mombasa])
+        db.session.commit()
+        db.session.add_all([
+            Media(incident_id=nairobi.id, file_url='https://example.com/a.jpg', media_type='image'),
+            Media(incident_id=nairobi.id, file_url=None, media_type='image', status='pending'),
+            StatusHistory(incident_id=nairobi.id, old_status='pending', new_status='in_progress', changed_by='admin'),
+        ])
+        db.session.commit()
+        yield app
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def _token(client, email, password):
+    return client.post('/auth/login', json={'email': email, 'password': password}).json['access_token']
+
+@pytest.fixture
+def admin_headers(client):
+    return {'Authorization': f"Bearer {_token(client, 'admin@example.com', 'adminpassword')}"}
+
+def test_export_requires_admin(client):
+    headers = {'Authorization': f"Bearer {_token(client, 'reporter@example.com', 'password123')}"}
+    assert client.get('/incidents/export', headers=headers).status_code == 403
+    assert client.get('/incidents/export').status_code == 401
+
+def test_export_ndjson_includes_reporter_media_and_history(client, admin_headers):
+    response = client.get('/incidents/export', headers=admin_headers)
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.is_streamed
+    assert 'attachment' in response.headers['Content-Disposition']
+
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [r['title'] for r in records] == ['Stolen phone', 'Crash on Uhuru Highway']
+    crash = records[1]
+    assert crash['reporter'] == {'id': 2, 'username': 'reporter', 'email': 'reporter@example.com'}
+    assert crash['media'] == ['https://example.com/a.jpg']
+    assert [(h['old_status'], h['new_status']) for h in crash['status_history']] == [('pending', 'in_progress')]
+    assert records[0]['media'] == [] and records[0]['status_history'] == []
+
+def test_export_filters_match_listings(client, admin_headers):
+    def titles(query):
+        body = client.get(f'/incidents/export?{query}', headers=admin_headers).get_data(as_text=True)
+        return [json.loads(line)['title'] for line in body.splitlines()]
+
+    assert titles('status=in_progress') == ['Crash on Uhuru Highway']
+    assert titles('type=Theft') == ['Stolen phone']
+    assert titles('reporter=reporter') == ['Crash on Uhuru Highway']
+    assert titles('bbox=39.5,-4.2,39.8,-3.9') == ['Stolen phone']
+    assert titles('near=-1.28,36.82&radius_km=5') == ['Crash on Uhuru Highway']
+
+def test_export_rejects_bad_arguments(client, admin_headers):
+    assert client.get('/incidents/export?format=xml', headers=admin_headers).status_code == 400
+    assert client.get('/incidents/export?bbox=1,2', headers=admin_headers).status_code == 400
+
+def test_export_csv(client, admin_headers):
+    response = client.get('/incidents/export?format=csv', headers=admin_headers)
+
+    assert response.mimetype == 'text/csv'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert len(rows) == 2
+    assert rows[1]['reporter_username'] == 'reporter'
+    assert rows[1]['media_urls'] == 'https://example.com/a.jpg'
+    assert json.loads(rows[1]['status_history'])[0]['new_status'] == 'in_progress'
+
+def test_export_geojson(client, admin_headers):
+    response = client.get('/incidents/export?format=geojson', headers=admin_headers)
+
+    collection = json.loads(response.get_data(as_text=True))
+    assert collection['type'] == 'FeatureCollection'
+    feature = collection['features'][1]
+    assert feature['geometry'] == {'type': 'Point', 'coordinates': [36.8172, -1.2864]}
+    assert feature['properties']['reporter']['username'] == 'reporter'
+    assert 'latitude' not in feature['properties']
+
+def test_export_is_gzipped_on_request(client, admin_headers):
+    response = client.get('/incidents/export', headers={**admin_headers, 'Accept-Encoding': 'gzip'})
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    lines = gzip.decompress(response.get_data()).decode().splitlines()
+    assert len(lines) == 2
+
+def test_export_command(app, tmp_path):
+    output = tmp_path / 'incidents.csv.gz'
+    result = app.test_cli_runner().invoke(args=['export-incidents', '--format', 'csv', '--type', 'Accident',
+                                                '--output', str(output)])
+
+    assert result.exit_code == 0, result.output
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(output.read_bytes()).decode())))
+    assert [row['title'] for row in rows] == ['Crash on Uhuru Highway']
@@ -0,0 +1,30 @@
+import pytest
+from geo import bbox_for_radius, cover_bbox, encode_geohash, haversine_km, prefix_range
+
+
+def test_encode_geohash():
+    assert encode_geohash(57.64911, 10.40744, 11) == 'u4pruydqqvj'
+    assert encode_geohash(-1.2864, 36.8172, 5) == 'kzf0t'
+
+def test_haversine_km():
+    # Nairobi to Mombasa
+    assert haversine_km(-1.2864, 36.8172, -4.0435, 39.6682) == pytest.approx(440, abs=5)
+    assert haversine_km(10, 10, 10, 10) == 0
+
+def test_cover_bbox_contains_points():
+    bbox = (36.6, -1.5, 37.0, -1.1)
+    prefixes = cover_bbox(*bbox)
+    assert 0 < len(prefixes) <= 24
+
+    for lat, lng in [(-1.5, 36.6), (-1.1, 37.0), (-1.2864, 36.8172)]:
+        geohash = encode_geohash(lat, lng)
+        assert any(prefix_range(p)[0] <= geohash < prefix_range(p)[1] for p in prefixes)
+
+def test_bbox_for_radius_wraps_antimeridian():
+    min_lng, min_lat, max_lng, max_lat = bbox_for_radius(0, 179.9, 50)
+    assert min_lng > max_lng
+    assert min_lat < 0 < max_lat
+
+    prefixes = cover_bbox(min_lng, min_lat, max_lng, max_lat)
+    assert any(encode_geohash(0, -179.9).startswith(p) for p in prefixes)
+    assert any(encode_geohash(0, 179.9).startswith(p) for p in prefixes)
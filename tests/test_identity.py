@@ -0,0 +1,99 @@
+import pytest
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+from app import create_app
+from models import db, User
+
+@pytest.fixture
+def app():
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'JWT_SECRET_KEY': 'test-secret',
+        'EMAIL_TRANSPORT': 'fake',
+        'MEDIA_UPLOAD_WORKERS': 0,
+    })
+
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            User(username='admin', email='admin@example.com',
+                 password_hash=generate_password_hash('adminpassword'), is_admin=True),
+            User(username='reporter', email='reporter@example.com',
+                 password_hash=generate_password_hash('password123')),
+        ])
+        db.session.commit()
+        yield app
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def _headers(client, email, password):
+    token = client.post('/auth/login', json={'email': email, 'password': password}).json['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+@pytest.fixture
+def admin(client):
+    return _headers(client, 'admin@example.com', 'adminpassword')
+
+@pytest.fixture
+def reporter(client):
+    return _headers(client, 'reporter@example.com', 'password123')
+
+def _user_queries(fn):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM users' in statement:
+            statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        fn()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return statements
+
+def test_identity_is_cached_across_requests(client, admin):
+    assert len(_user_queries(lambda: client.get('/auth/me', headers=admin))) == 1
+    assert _user_queries(lambda: client.get('/auth/me', headers=admin)) == []
+    assert _user_queries(lambda: client.get('/analytics/counts', headers=admin)) == []
+
+def test_admin_required(client, admin, reporter):
+    assert client.get('/analytics/counts', headers=admin).status_code == 200
+    response = client.get('/analytics/counts', headers=reporter)
+    assert response.status_code == 403
+    assert response.json == {'message': 'Unauthorized'}
+    assert client.get('/analytics/counts').status_code == 401
+
+def test_demoting_a_user_takes_effect_immediately(client, app, admin):
+    assert client.get('/auth/users', headers=admin).status_code == 200
+
+    with app.app_context():
+        db.session.get(User, 1).is_admin = False
+        db.session.commit()
+
+    assert client.get('/auth/users', headers=admin).status_code == 403
+
+def test_rolled_back_changes_keep_the_cached_identity(client, app, admin):
+    client.get('/auth/me', headers=admin)
+
+    with app.app_context():
+        db.session.get(User, 1).username = 'renamed'
+        db.session.flush()
+        db.session.rollback()
+
+    assert _user_queries(lambda: client.get('/auth/me', headers=admin)) == []
+    assert client.get('/auth/me', headers=admin).json['user']['username'] == 'admin'
+
+def test_deleted_user_tokens_stop_working(client, admin, reporter):
+    assert client.get('/auth/me', headers=reporter).status_code == 200
+    assert client.delete('/auth/users/2', headers=admin).status_code == 200
+    assert client.get('/auth/me', headers=reporter).status_code == 401
+
+def test_identity_ttl(client, app, admin):
+    app.config['JWT_USER_CACHE_TTL'] = 0
+    client.get('/auth/me', headers=admin)
+    assert len(_user_queries(lambda: client.get('/auth/me', headers=admin))) == 1
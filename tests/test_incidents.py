@@ -1,18 +1,26 @@
 import pytest
 import os
 from io import BytesIO
+from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash
+from sqlalchemy import event
 from app import create_app
 from models import db, User, Incident, Media, StatusHistory
 
 @pytest.fixture
 def app():
-    app = create_app()
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-    app.config['JWT_SECRET_KEY'] = 'test-secret'
-    app.config['UPLOAD_FOLDER'] = '/tmp/uploads'
-    app.config['ALLOWED_EXTENSIONS'] = {'png', 'jpg', 'jpeg', 'mp4'}
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'JWT_SECRET_KEY': 'test-secret',
+        'UPLOAD_FOLDER': '/tmp/uploads',
+        'ALLOWED_EXTENSIONS': {'png', 'jpg', 'jpeg', 'mp4'},
+        'EMAIL_TRANSPORT': 'fake',
+        'MEDIA_STORAGE': 'local',
+        'MEDIA_UPLOAD_WORKERS': 0,
+        'MEDIA_SPOOL_FOLDER': '/tmp/uploads/spool',
+        'MEDIA_LOCAL_FOLDER': '/tmp/uploads/media',
+    })
 
     with app.app_context():
         db.create_all()
@@ -166,4 +174,394 @@ def test_update_incident_status(client, auth_token):
         headers={'Authorization': f'Bearer {admin_token}'}
     )
     assert response.status_code == 200
-    assert b'Status updated successfully' in response.data
\ No newline at end of file
+    assert b'Status updated successfully' in response.data
+
+def _add_located_incidents():
+    # Nairobi CBD, Westlands (~3.5km away), Mombasa (~440km away)
+    incidents = [
+        Incident(user_id=1, title='CBD', description='d', type='type1', latitude=-1.2864, longitude=36.8172),
+        Incident(user_id=1, title='Westlands', description='d', type='type1', latitude=-1.2676, longitude=36.8108),
+        Incident(user_id=1, title='Mombasa', description='d', type='type1', latitude=-4.0435, longitude=39.6682),
+    ]
+    db.session.add_all(incidents)
+    db.session.commit()
+    return incidents
+
+def test_incident_geohash_kept_in_sync(client):
+    incident = _add_located_incidents()[0]
+    assert incident.geohash.startswith('kzf0')
+
+    incident.latitude = -4.0435
+    incident.longitude = 39.6682
+    db.session.commit()
+    assert incident.geohash.startswith('kzk')
+
+def test_get_incidents_bbox(client):
+    _add_located_incidents()
+
+    response = client.get('/incidents/?bbox=36.6,-1.5,37.0,-1.1')
+    assert response.status_code == 200
+    titles = {i['title'] for i in response.json['incidents']}
+    assert titles == {'CBD', 'Westlands'}
+
+    response = client.get('/incidents/?bbox=36.6,-1.5')
+    assert response.status_code == 400
+
+def test_get_incidents_near_orders_by_distance(client):
+    _add_located_incidents()
+
+    response = client.get('/incidents/?near=-1.2600,36.8100&radius_km=10')
+    assert response.status_code == 200
+    incidents = response.json['incidents']
+    assert [i['title'] for i in incidents] == ['Westlands', 'CBD']
+    assert incidents[0]['distance_km'] < incidents[1]['distance_km'] <= 10
+
+    response = client.get('/incidents/?near=-1.2600,36.8100&radius_km=1000')
+    assert response.status_code == 400
+
+def test_get_incidents_near_loads_only_what_the_page_needs(client):
+    # A line of incidents heading north from the centre, one every ~0.55km
+    db.session.add_all([
+        Incident(user_id=1, title=f'Incident {i}', description='d', type='type1',
+                 latitude=-1.2864 + i * 0.005, longitude=36.8172)
+        for i in range(200)
+    ])
+    db.session.commit()
+    db.session.expunge_all()
+
+    loaded = []
+
+    def record(target, context):
+        loaded.append(target.id)
+
+    event.listen(Incident, 'load', record)
+    try:
+        response = client.get('/incidents/?near=-1.2864,36.8172&radius_km=200&per_page=5&page=2')
+    finally:
+        event.remove(Incident, 'load', record)
+    assert response.status_code == 200
+    assert [i['title'] for i in response.json['incidents']] == [f'Incident {i}' for i in range(5, 10)]
+    assert response.json['total'] is None
+    # A few doubling circles, not all 200 matches
+    assert len(set(loaded)) < 40
+
+    response = client.get('/incidents/?near=-1.2864,36.8172&radius_km=20&per_page=5&include_total=true')
+    assert response.json['total'] == 36
+    assert response.json['pages'] == 8
+
+def test_get_incidents_cursor_pagination(client):
+    created_at = datetime(2025, 1, 1)
+    # Shared timestamps exercise the id tie-break
+    db.session.add_all([
+        Incident(user_id=1, title=f'Incident {i}', description='d', type='type1',
+                 latitude=1.0, longitude=1.0, created_at=created_at + timedelta(minutes=i // 2))
+        for i in range(5)
+    ])
+    db.session.commit()
+
+    response = client.get('/incidents/?cursor=&per_page=2')
+    assert response.status_code == 200
+    assert 'total' not in response.json
+    seen = [i['id'] for i in response.json['incidents']]
+
+    while response.json['next_cursor']:
+        response = client.get(f"/incidents/?cursor={response.json['next_cursor']}&per_page=2&include_total=true")
+        assert response.status_code == 200
+        assert response.json['total'] == 5
+        seen.extend(i['id'] for i in response.json['incidents'])
+
+    assert seen == [5, 4, 3, 2, 1]
+
+    response = client.get('/incidents/?cursor=not-a-cursor')
+    assert response.status_code == 400
+
+def test_get_incidents_without_total(client):
+    db.session.add(Incident(user_id=1, title='t', description='d', type='type1', latitude=1.0, longitude=1.0))
+    db.session.commit()
+
+    response = client.get('/incidents/?include_total=false')
+    assert response.status_code == 200
+    assert response.json['total'] is None
+    assert len(response.json['incidents']) == 1
+
+def _capture_statements(client, url):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    assert response.status_code == 200
+    return response, statements
+
+def test_listing_statement_count_is_constant(client):
+    reporters = [
+        User(username=f'reporter{i}', email=f'reporter{i}@example.com', password_hash='x')
+        for i in range(10)
+    ]
+    db.session.add_all(reporters)
+    db.session.commit()
+    incidents = [
+        Incident(user_id=reporters[i % 10].id, title=f'Incident {i}', description='d',
+                 type='type1', latitude=1.0, longitude=1.0)
+        for i in range(60)
+    ]
+    db.session.add_all(incidents)
+    db.session.commit()
+    db.session.add_all([Media(incident_id=incidents[-1].id, file_url='/a.jpg', media_type='image')])
+    db.session.commit()
+    db.session.expunge_all()
+
+    include = 'include=media_count,status_changed_at'
+    small, small_statements = _capture_statements(client, f'/incidents/?per_page=5&{include}')
+    db.session.expunge_all()
+    large, large_statements = _capture_statements(client, f'/incidents/?per_page=50&{include}')
+
+    assert len(small.json['incidents']) == 5
+    assert len(large.json['incidents']) == 50
+    assert len(small_statements) == len(large_statements)
+    assert {i['reporter'] for i in large.json['incidents']} == {f'reporter{i}' for i in range(10)}
+    assert sum(i['media_count'] for i in large.json['incidents']) == 1
+
+    db.session.expunge_all()
+    _, statements = _capture_statements(client, '/incidents/?cursor=&per_page=50')
+    assert len(statements) == 1
+
+def test_listing_rejects_unknown_include(client):
+    response = client.get('/incidents/?include=comments')
+    assert response.status_code == 400
+
+def _listing_sql(client, url):
+    response, statements = _capture_statements(client, url)
+    # The total's count() subquery names every column; the database discards the unused ones
+    return response, ' '.join(s for s in statements if not s.startswith('SELECT count('))
+
+def test_listing_compact_view_skips_description(client):
+    _add_located_incidents()
+    db.session.expunge_all()
+
+    response, sql = _listing_sql(client, '/incidents/?view=compact')
+    assert response.status_code == 200
+    assert set(response.json['incidents'][0]) == {'id', 'title', 'type', 'latitude', 'longitude', 'status',
+                                                  'created_at'}
+    assert 'incidents.description' not in sql
+    assert 'users.username' not in sql
+
+    response, sql = _listing_sql(client, '/incidents/?view=full')
+    assert 'description' in response.json['incidents'][0]
+    assert 'incidents.description' in sql
+
+def test_listing_fields_projection(client, auth_token):
+    _add_located_incidents()
+    db.session.expunge_all()
+
+    response, sql = _listing_sql(client, '/incidents/?fields=title,reporter&cursor=&per_page=2')
+    assert response.status_code == 200
+    assert response.json['incidents'][0] == {'id': 3, 'title': 'Mombasa', 'reporter': 'testuser'}
+    assert 'incidents.description' not in sql and 'incidents.latitude' not in sql
+
+    # Paging, distance and search still work on the narrowed rows
+    response = client.get(f"/incidents/?fields=title&cursor={response.json['next_cursor']}")
+    assert [i['title'] for i in response.json['incidents']] == ['CBD']
+    response = client.get('/incidents/?fields=title&near=-1.2600,36.8100&radius_km=10')
+    assert [i['title'] for i in response.json['incidents']] == ['Westlands', 'CBD']
+    response = client.get('/incidents/all?fields=title&q=westlands',
+                          headers={'Authorization': f'Bearer {auth_token}'})
+    assert [set(i) for i in response.json['incidents']] == [{'id', 'title', 'highlight'}]
+    assert set(response.json['incidents'][0]['highlight']) == {'title'}
+    # No highlight when neither text field was asked for
+    response = client.get('/incidents/?view=compact&q=westlands')
+    assert response.json['incidents'][0]['highlight'] == {'title': '<mark>Westlands</mark>'}
+    response = client.get('/incidents/?fields=type&q=westlands')
+    assert [set(i) for i in response.json['incidents']] == [{'id', 'type'}]
+
+    assert client.get('/incidents/?fields=title,secret').status_code == 400
+    assert client.get('/incidents/?view=tiny').status_code == 400
+
+def test_get_incidents_is_cached_and_invalidated(client, auth_token):
+    incident = Incident(user_id=1, title='Original Title', description='d', type='type1',
+                        latitude=1.0, longitude=1.0)
+    db.session.add(incident)
+    db.session.commit()
+
+    first = client.get('/incidents/?per_page=10&page=1')
+    assert first.headers['X-Cache'] == 'MISS'
+    second = client.get('/incidents/')
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.data == first.data
+
+    response = client.get('/incidents/', headers={'If-None-Match': first.headers['ETag']})
+    assert response.status_code == 304
+
+    client.put(
+        f'/incidents/{incident.id}',
+        json={'title': 'Updated Title'},
+        headers={'Authorization': f'Bearer {auth_token}'}
+    )
+    response = client.get('/incidents/', headers={'If-None-Match': first.headers['ETag']})
+    assert response.status_code == 200
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.json['incidents'][0]['title'] == 'Updated Title'
+
+def test_create_incident_with_media_uploads_in_background(client, auth_token):
+    data = {
+        'title': 'With photos',
+        'description': 'Test description',
+        'type': 'accident',
+        'latitude': '12.34',
+        'longitude': '56.78',
+        'files': [(BytesIO(b'fake image'), 'photo.jpg'), (BytesIO(b'fake video'), 'clip.mp4')]
+    }
+    response = client.post(
+        '/incidents',
+        data=data,
+        content_type='multipart/form-data',
+        headers={'Authorization': f'Bearer {auth_token}'}
+    )
+    assert response.status_code == 202
+    incident_id = response.json['id']
+    assert len(response.json['media']) == 2
+
+    response = client.get(f'/incidents/{incident_id}/media', headers={'Authorization': f'Bearer {auth_token}'})
+    assert response.status_code == 200
+    media = sorted(response.json, key=lambda m: m['media_type'])
+    assert [m['status'] for m in media] == ['uploaded', 'uploaded']
+    assert [m['media_type'] for m in media] == ['image', 'video']
+    assert all(m['file_url'].startswith('/media/') for m in media)
+
+def test_create_incident_spools_before_writing(client, auth_token, monkeypatch):
+    from extensions import media_pipeline
+
+    writes = []
+    spooled_after = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith(('INSERT', 'UPDATE', 'DELETE')):
+            writes.append(statement)
+
+    spool = media_pipeline.spool
+
+    def tracking_spool(file):
+        spooled_after.append(len(writes))
+        return spool(file)
+
+    monkeypatch.setattr(media_pipeline, 'spool', tracking_spool)
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        response = client.post(
+            '/incidents',
+            data={'title': 't', 'description': 'd', 'type': 'accident', 'latitude': '1', 'longitude': '1',
+                  'files': [(BytesIO(b'x'), 'a.png'), (BytesIO(b'y'), 'b.png')]},
+            content_type='multipart/form-data',
+            headers={'Authorization': f'Bearer {auth_token}'}
+        )
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+    assert response.status_code == 202
+    # Every file was on disk before the transaction took the write lock
+    assert spooled_after == [0, 0]
+    assert writes
+
+def test_media_upload_failure_is_recorded(app, client, auth_token):
+    class BrokenStorage:
+        def store(self, path, filename):
+            raise RuntimeError('storage unavailable')
+
+    app.extensions['media_pipeline']['storage'] = BrokenStorage()
+    response = client.post(
+        '/incidents',
+        data={'title': 't', 'description': 'd', 'type': 'accident', 'latitude': '1', 'longitude': '1',
+              'files': [(BytesIO(b'x'), 'photo.png')]},
+        content_type='multipart/form-data',
+        headers={'Authorization': f'Bearer {auth_token}'}
+    )
+    assert response.status_code == 202
+
+    media = Media.query.one()
+    assert media.status == 'failed'
+    assert media.error == 'storage unavailable'
+    assert media.file_url is None
+
+def _detail(client, auth_token, incident_id, **headers):
+    # Resolve the token's identity first so only the route's queries are counted
+    client.get('/auth/me', headers={'Authorization': f'Bearer {auth_token}'})
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    db.session.expunge_all()
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        response = client.get(f'/incidents/{incident_id}',
+                              headers={'Authorization': f'Bearer {auth_token}', **headers})
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return response, statements
+
+def test_get_incident_detail(client, auth_token):
+    incident = Incident(user_id=1, title='Crash', description='d', type='Accident', latitude=1.0, longitude=2.0)
+    db.session.add(incident)
+    db.session.commit()
+    db.session.add_all([
+        Media(incident_id=incident.id, file_url='/a.jpg', media_type='image'),
+        Media(incident_id=incident.id, media_type='image', status='pending'),
+        StatusHistory(incident_id=incident.id, old_status='in_progress', new_status='resolved',
+                      changed_at=datetime(2026, 2, 2)),
+        StatusHistory(incident_id=incident.id, old_status='pending', new_status='in_progress',
+                      changed_at=datetime(2026, 2, 1)),
+    ])
+    db.session.commit()
+
+    response, statements = _detail(client, auth_token, incident.id)
+    assert response.status_code == 200
+    data = response.json
+    assert data['title'] == 'Crash'
+    assert data['reporter'] == 'testuser'
+    assert [m['status'] for m in data['media']] == ['uploaded', 'pending']
+    assert [h['new_status'] for h in data['status_history']] == ['in_progress', 'resolved']
+    # Fingerprint, incident with reporter, media, history
+    assert len(statements) == 4
+    assert response.headers['ETag'].startswith('"')
+    assert response.headers['Last-Modified']
+
+    assert _detail(client, auth_token, 999)[0].status_code == 404
+
+def test_get_incident_detail_conditional(client, auth_token):
+    incident = Incident(user_id=1, title='Crash', description='d', type='Accident', latitude=1.0, longitude=2.0)
+    db.session.add(incident)
+    db.session.commit()
+    media = Media(incident_id=incident.id, media_type='image', status='pending')
+    db.session.add(media)
+    db.session.commit()
+    incident_id, media_id = incident.id, media.id
+
+    first, _ = _detail(client, auth_token, incident_id)
+    etag = first.headers['ETag']
+
+    response, statements = _detail(client, auth_token, incident_id, **{'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert len(statements) == 1
+
+    response, _ = _detail(client, auth_token, incident_id, **{'If-Modified-Since': first.headers['Last-Modified']})
+    assert response.status_code == 304
+
+    # A failed upload changes no timestamp but still changes the representation
+    db.session.get(Media, media_id).status = 'failed'
+    db.session.commit()
+    response, _ = _detail(client, auth_token, incident_id, **{'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    etag = response.headers['ETag']
+
+    db.session.add(StatusHistory(incident_id=incident_id, old_status='pending', new_status='resolved'))
+    db.session.commit()
+    response, _ = _detail(client, auth_token, incident_id, **{'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.json['status_history'][0]['new_status'] == 'resolved'
@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+import pytest
+from app import create_app
+from models import db, User, Incident, Media
+from extensions import media_pipeline
+
+class SlowStorage:
+    """Blocks until every upload has started, proving they run concurrently."""
+
+    def __init__(self, parties):
+        self.barrier = threading.Barrier(parties, timeout=5)
+
+    def store(self, path, filename):
+        self.barrier.wait()
+        return f'https://storage.example.com/{filename}', 'image'
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+        'MEDIA_STORAGE': SlowStorage(parties=3),
+        'MEDIA_UPLOAD_WORKERS': 3,
+        'MEDIA_SPOOL_FOLDER': str(tmp_path / 'spool'),
+    })
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+def test_uploads_run_concurrently_and_update_media(app, tmp_path):
+    user = User(username='testuser', email='test@example.com', password_hash='x')
+    db.session.add(user)
+    db.session.commit()
+    incident = Incident(user_id=user.id, title='t', description='d', type='accident', latitude=1.0, longitude=1.0)
+    db.session.add(incident)
+    db.session.commit()
+
+    media_ids = []
+    for i in range(3):
+        path = tmp_path / f'file{i}.jpg'
+        path.write_bytes(b'data')
+        media = Media(incident_id=incident.id, media_type='image', status='pending')
+        db.session.add(media)
+        db.session.commit()
+        media_ids.append((media.id, str(path), f'file{i}.jpg'))
+
+    for media_id, path, filename in media_ids:
+        media_pipeline.submit(media_id, path, filename)
+    media_pipeline.wait()
+
+    db.session.expire_all()
+    media = Media.query.order_by(Media.id).all()
+    assert [m.status for m in media] == ['uploaded'] * 3
+    assert [m.file_url for m in media] == [f'https://storage.example.com/file{i}.jpg' for i in range(3)]
+    # Spooled files are removed once uploaded
+    assert not any((tmp_path / f'file{i}.jpg').exists() for i in range(3))
+
+class RecordingStorage:
+    def __init__(self):
+        self.stored = []
+
+    def store(self, path, filename):
+        self.stored.append(filename)
+        return f'https://storage.example.com/{filename}', 'image'
+
+def test_recover_interrupted_uploads(tmp_path):
+    storage = RecordingStorage()
+    spool = tmp_path / 'spool'
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'MEDIA_STORAGE': storage,
+        'MEDIA_UPLOAD_WORKERS': 0,
+        'MEDIA_SPOOL_FOLDER': str(spool),
+    })
+
+    with app.app_context():
+        db.create_all()
+        user = User(username='testuser', email='test@example.com', password_hash='x')
+        incident = Incident(user=user, title='t', description='d', type='accident', latitude=1.0, longitude=1.0)
+        old = datetime.utcnow() - timedelta(hours=2)
+        # Spooled and claimed / claim never happened / still uploading
+        media = [Media(incident=incident, status='pending', uploaded_at=old),
+                 Media(incident=incident, status='pending', uploaded_at=old),
+                 Media(incident=incident, status='pending')]
+        db.session.add_all(media)
+        db.session.commit()
+
+        spool.mkdir()
+        (spool / 'abc_photo.jpg').write_bytes(b'x')
+        claimed = media_pipeline.claim(str(spool / 'abc_photo.jpg'), media[0].id)
+        in_flight = spool / f'media-{media[2].id}_clip.mp4'
+        in_flight.write_bytes(b'x')
+        orphan = spool / 'def_lost.jpg'
+        orphan.write_bytes(b'x')
+        hours_ago = time.time() - 7200
+        os.utime(orphan, (hours_ago, hours_ago))
+
+        assert media_pipeline.recover(older_than_minutes=30) == (1, 1, 1)
+
+        db.session.expire_all()
+        assert [m.status for m in Media.query.order_by(Media.id)] == ['uploaded', 'failed', 'pending']
+        assert storage.stored == ['photo.jpg']
+        assert not os.path.exists(claimed) and not orphan.exists()
+        assert in_flight.exists()
+        db.drop_all()
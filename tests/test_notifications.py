@@ -0,0 +1,96 @@
+import json
+import pytest
+from werkzeug.security import generate_password_hash
+from app import create_app
+from models import db, User, Incident, Notification, OutboundEmail
+from email_outbox import EmailWorker, MailjetTransport
+from benchmarks.fake_mailjet import FakeMailjetServer
+
+@pytest.fixture
+def app():
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'JWT_SECRET_KEY': 'test-secret',
+        'EMAIL_TRANSPORT': 'fake',
+    })
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def incident(app):
+    users = [
+        User(username='reporter', email='reporter@example.com', password_hash='x'),
+        User(username='admin', email='admin@example.com', password_hash=generate_password_hash('adminpassword'),
+             is_admin=True, notify_status_changes=True),
+        User(username='quiet', email='quiet@example.com', password_hash='x', is_admin=True),
+        User(username='subscriber', email='sub@example.com', password_hash='x', is_admin=True,
+             notify_status_changes=True),
+    ]
+    db.session.add_all(users)
+    db.session.commit()
+    incident = Incident(user_id=users[0].id, title='Flooded road', description='d', type='Accident',
+                        latitude=1.0, longitude=1.0)
+    db.session.add(incident)
+    db.session.commit()
+    return incident
+
+def _admin_token(client):
+    response = client.post('/auth/login', json={'email': 'admin@example.com', 'password': 'adminpassword'})
+    return response.json['access_token']
+
+def test_status_change_fans_out_to_reporter_and_subscribed_admins(client, incident):
+    response = client.put(
+        f'/incidents/{incident.id}/status',
+        json={'status': 'resolved'},
+        headers={'Authorization': f'Bearer {_admin_token(client)}'}
+    )
+    assert response.status_code == 200
+
+    emails = OutboundEmail.query.filter_by(kind='status_change').order_by(OutboundEmail.user_id).all()
+    messages = [json.loads(e.message) for e in emails]
+    assert [m['To'][0]['Email'] for m in messages] == ['reporter@example.com', 'admin@example.com', 'sub@example.com']
+    assert [m['Variables']['name'] for m in messages] == ['reporter', 'admin', 'subscriber']
+    # One rendering shared by every recipient
+    assert len({m['HTMLPart'] for m in messages}) == 1
+    assert messages[0]['Variables'] == {'title': 'Flooded road', 'old_status': 'pending', 'new_status': 'resolved',
+                                        'name': 'reporter'}
+
+def test_status_change_keeps_titles_out_of_the_template(app, incident):
+    from notifications import queue_status_change_notifications
+
+    incident.title = "{{var:name}} {% if 1 %}x{% endif %}"
+    db.session.commit()
+    queue_status_change_notifications(incident, 'pending', 'resolved')
+
+    message = json.loads(OutboundEmail.query.filter_by(kind='status_change').first().message)
+    for part in ('Subject', 'TextPart', 'HTMLPart'):
+        assert '{%' not in message[part] and '{{var:title}}' in message[part]
+    assert message['Variables']['title'] == incident.title
+
+def test_mailjet_transport_batches_over_one_pooled_connection(app, incident):
+    from notifications import queue_status_change_notifications
+
+    for _ in range(40):
+        queue_status_change_notifications(incident, 'pending', 'in_progress')
+    db.session.commit()
+
+    with FakeMailjetServer() as server:
+        worker = EmailWorker(MailjetTransport('key', 'secret', api_url=server.url, pool_size=1),
+                             batch_size=50, concurrency=1)
+        while worker.run_once():
+            pass
+        worker.shutdown()
+
+    assert server.messages == 120
+    assert server.requests == 3
+    assert server.connections == 1
+    assert OutboundEmail.query.filter_by(status='sent').count() == 120
+    assert Notification.query.filter_by(channel='email', status='sent').count() == 120
@@ -0,0 +1,88 @@
+import threading
+import pytest
+from werkzeug.security import generate_password_hash
+from app import create_app
+from benchmarks.bench_passwords import measure
+from extensions import password_hasher
+from models import db, User
+
+@pytest.fixture
+def app():
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'JWT_SECRET_KEY': 'test-secret',
+        'EMAIL_TRANSPORT': 'fake',
+        'MEDIA_UPLOAD_WORKERS': 0,
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+    })
+
+    with app.app_context():
+        db.create_all()
+        # Hashed with an older method than the app is configured for
+        db.session.add(User(username='legacy', email='legacy@example.com',
+                            password_hash=generate_password_hash('password123', method='pbkdf2:sha256:2000')))
+        db.session.commit()
+        yield app
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def _login(client, password='password123'):
+    return client.post('/auth/login', json={'email': 'legacy@example.com', 'password': password})
+
+def test_login_rehashes_with_the_configured_method(client, app):
+    assert _login(client).status_code == 200
+    with app.app_context():
+        pwhash = db.session.get(User, 1).password_hash
+    assert pwhash.startswith('pbkdf2:sha256:1000$')
+
+    # Still valid, and not rehashed again
+    assert _login(client).status_code == 200
+    with app.app_context():
+        assert db.session.get(User, 1).password_hash == pwhash
+
+def test_failed_login_keeps_the_old_hash(client, app):
+    assert _login(client, 'wrong').status_code == 401
+    with app.app_context():
+        assert db.session.get(User, 1).password_hash.startswith('pbkdf2:sha256:2000$')
+
+def test_register_uses_the_configured_method(client, app):
+    response = client.post('/auth/register', json={'username': 'new', 'email': 'new@example.com', 'password': 'pw'})
+    assert response.status_code == 201
+    with app.app_context():
+        assert User.query.filter_by(email='new@example.com').one().password_hash.startswith('pbkdf2:sha256:1000$')
+
+def test_needs_rehash_understands_default_parameters(app):
+    with app.app_context():
+        app.config['PASSWORD_HASH_METHOD'] = 'scrypt'
+        assert not password_hasher.needs_rehash('scrypt:32768:8:1$salt$hash')
+        assert password_hasher.needs_rehash('scrypt:16384:8:1$salt$hash')
+        assert password_hasher.needs_rehash('pbkdf2:sha256:600000$salt$hash')
+
+def test_login_sheds_load_when_the_hasher_is_saturated(client, app):
+    state = app.extensions['password_hasher']
+    release = threading.Event()
+    with app.app_context():
+        # Occupy every pending slot with hashes that can't finish yet
+        futures = []
+        for _ in range(app.config['PASSWORD_HASH_MAX_PENDING']):
+            state['slots'].acquire()
+            futures.append(state['executor'].submit(release.wait))
+            futures[-1].add_done_callback(lambda f: state['slots'].release())
+
+    response = _login(client)
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+    release.set()
+    for future in futures:
+        future.result()
+    assert _login(client).status_code == 200
+
+def test_password_benchmark_reports_latency():
+    result = measure('pbkdf2:sha256:1000', attempts=5, concurrency=2)
+    assert 0 < result['p50_ms'] <= result['p95_ms'] <= result['p99_ms']
+    assert result['attempts_per_second'] > 0
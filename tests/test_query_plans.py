@@ -0,0 +1,150 @@
+"""Run EXPLAIN QUERY PLAN over the SQL each route issues and reject full table scans."""
+import re
+import pytest
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+from app import create_app
+from models import db, User, Incident, Media, StatusHistory
+from email_outbox import EmailWorker, FakeMailjetTransport
+from archive import archive_incidents, purge_notifications
+
+# "SCAN incidents" is a full table scan; "SCAN incidents USING INDEX ..." walks
+# an index in order (bounded by LIMIT) and is allowed.
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+@pytest.fixture
+def app():
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'JWT_SECRET_KEY': 'test-secret',
+        'EMAIL_TRANSPORT': 'fake',
+        'RESPONSE_CACHE_ENABLED': False,
+        'TILE_CACHE_ENABLED': False,
+        'MEDIA_UPLOAD_WORKERS': 0,
+    })
+
+    with app.app_context():
+        db.create_all()
+        admin = User(username='admin', email='admin@example.com',
+                     password_hash=generate_password_hash('adminpassword'), is_admin=True)
+        db.session.add(admin)
+        db.session.commit()
+        incident = Incident(user_id=admin.id, title='t', description='d', type='Accident',
+                            latitude=-1.28, longitude=36.82)
+        db.session.add(incident)
+        db.session.commit()
+        db.session.add_all([
+            Media(incident_id=incident.id, file_url='/a.jpg', media_type='image'),
+            StatusHistory(incident_id=incident.id, old_status='pending', new_status='in_progress'),
+        ])
+        db.session.commit()
+        yield app
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def token(client):
+    response = client.post('/auth/login', json={'email': 'admin@example.com', 'password': 'adminpassword'})
+    return response.json['access_token']
+
+def _capture(fn):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+            statements.append((statement, parameters))
+
+    # Requests share the fixture's session; start from an empty identity map
+    db.session.expunge_all()
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        fn()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return statements
+
+def _full_scans(statements):
+    scans = []
+    connection = db.session.connection()
+    for statement, parameters in statements:
+        plan = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+        for row in plan:
+            match = FULL_SCAN.match(row[3])
+            if match:
+                scans.append(f'{match.group(1)}: {statement}')
+    return scans
+
+ROUTES = [
+    ('get', '/incidents/'),
+    ('get', '/incidents/?status=pending'),
+    ('get', '/incidents/?reporter=admin'),
+    ('get', '/incidents/?cursor=&per_page=5'),
+    ('get', '/incidents/?include=media_count,status_changed_at'),
+    ('get', '/incidents/?view=compact&cursor='),
+    ('get', '/incidents/all?fields=title,reporter&status=pending'),
+    ('get', '/incidents/?bbox=36.6,-1.5,37.0,-1.1'),
+    ('get', '/incidents/?near=-1.28,36.82&radius_km=5'),
+    ('get', '/incidents/?near=-1.28,36.82&radius_km=5&include_total=1&status=pending'),
+    ('get', '/incidents/?q=t'),
+    ('get', '/incidents/?q=t&cursor='),
+    ('get', '/incidents/all?q=d&status=pending'),
+    ('get', '/incidents/all?status=pending'),
+    ('get', '/incidents/all?type=Accident'),
+    ('get', '/incidents/all?include_archived=true&status=resolved'),
+    ('get', '/incidents/?include_archived=1&cursor=&bbox=36.6,-1.5,37.0,-1.1'),
+    ('get', '/incidents/?include_archived=1&reporter=admin'),
+    ('get', '/incidents/?include_archived=1&view=compact'),
+    ('get', '/incidents/1'),
+    ('get', '/incidents/1/media'),
+    ('get', '/incidents/tiles/14/9867/8250'),
+    ('get', '/incidents/tiles/10/616/515?type=Accident'),
+    ('get', '/incidents/tiles/3/4/4?status=pending'),
+    ('get', '/incidents/export'),
+    ('get', '/incidents/export?status=pending&format=csv'),
+    ('get', '/incidents/export?type=Accident&format=geojson'),
+    ('get', '/auth/me'),
+    ('get', '/auth/users'),
+    ('get', '/auth/users?q=adm&include=incident_count&include_total=1'),
+    ('get', '/auth/users?fields=username&cursor=MjAyNi0wMS0wMVQwMDowMDowMHwx'),
+    ('get', '/analytics/series?from=2026-01-01&to=2026-12-31'),
+    ('get', '/analytics/heatmap?zoom=10&bbox=36.6,-1.5,37.0,-1.1'),
+    ('put', '/incidents/1/status'),
+    ('put', '/incidents/1'),
+    ('delete', '/incidents/1'),
+]
+
+@pytest.mark.parametrize('method,url', ROUTES)
+def test_route_queries_use_indexes(client, token, method, url):
+    kwargs = {'headers': {'Authorization': f'Bearer {token}'}}
+    if method == 'put':
+        kwargs['json'] = {'status': 'resolved', 'title': 'Updated'}
+
+    # Consuming the body runs the queries of streamed responses too
+    statements = _capture(lambda: getattr(client, method)(url, **kwargs).get_data())
+    assert statements
+    assert _full_scans(statements) == []
+
+def test_auth_queries_use_indexes(client):
+    def register_and_login():
+        client.post('/auth/register', json={'username': 'new', 'email': 'new@example.com', 'password': 'pw'})
+        client.post('/auth/login', json={'email': 'new@example.com', 'password': 'pw'})
+
+    assert _full_scans(_capture(register_and_login)) == []
+
+def test_email_worker_queries_use_indexes(client, token):
+    client.put('/incidents/1/status', json={'status': 'resolved'}, headers={'Authorization': f'Bearer {token}'})
+    worker = EmailWorker(FakeMailjetTransport())
+    statements = _capture(worker.run_once)
+    worker.shutdown()
+    assert _full_scans(statements) == []
+
+def test_archive_jobs_use_indexes(client):
+    db.session.execute(Incident.__table__.update().values(status='resolved'))
+    db.session.commit()
+    statements = _capture(lambda: (archive_incidents(older_than_days=-1), purge_notifications(older_than_days=-1)))
+    assert Incident.query.count() == 0
+    assert _full_scans(statements) == []
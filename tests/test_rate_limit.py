@@ -0,0 +1,131 @@
+import sqlite3
+import pytest
+from werkzeug.security import generate_password_hash
+import rate_limit
+from app import create_app
+from extensions import password_hasher
+from models import db, User
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = {'now': 1000.0}
+    monkeypatch.setattr(rate_limit, 'now', lambda: clock['now'])
+    return clock
+
+def _create_app(**config):
+    return create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'JWT_SECRET_KEY': 'test-secret',
+        'EMAIL_TRANSPORT': 'fake',
+        'MEDIA_UPLOAD_WORKERS': 0,
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+        'RATE_LIMITS': {'login': {'ip': '4/minute', 'email': '2/minute'}},
+        **config,
+    })
+
+@pytest.fixture
+def app(clock):
+    app = _create_app()
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='reporter', email='reporter@example.com',
+                            password_hash=generate_password_hash('password123', 'pbkdf2:sha256:1000')))
+        db.session.commit()
+        yield app
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def _login(client, email='reporter@example.com', password='wrong', ip='10.0.0.1'):
+    return client.post('/auth/login', json={'email': email, 'password': password},
+                       environ_overrides={'REMOTE_ADDR': ip})
+
+def test_email_limit_applies_across_addresses(client):
+    assert _login(client, ip='10.0.0.1').status_code == 401
+    assert _login(client, ip='10.0.0.2').status_code == 401
+    response = _login(client, email='Reporter@Example.com', ip='10.0.0.3')
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '30'
+    # Other accounts are unaffected
+    assert _login(client, email='someone@example.com', ip='10.0.0.3').status_code == 401
+
+def test_ip_limit(client):
+    for i in range(4):
+        assert _login(client, email=f'user{i}@example.com').status_code == 401
+    assert _login(client, email='user9@example.com').status_code == 429
+    assert _login(client, email='user9@example.com', ip='10.0.0.2').status_code == 401
+
+def test_buckets_refill(client, clock):
+    _login(client)
+    _login(client)
+    assert _login(client).status_code == 429
+
+    clock['now'] += 29
+    assert _login(client).status_code == 429
+    clock['now'] += 60
+    assert _login(client, password='password123').status_code == 200
+
+def test_throttled_attempts_skip_the_password_hash(client, monkeypatch):
+    calls = []
+    verify = password_hasher.verify
+    monkeypatch.setattr(password_hasher, 'verify', lambda *args: calls.append(args) or verify(*args))
+
+    for _ in range(5):
+        _login(client)
+    assert len(calls) == 2
+
+def test_trusted_proxy_address(client, app):
+    app.config['RATE_LIMIT_TRUSTED_PROXIES'] = 1
+    for i in range(4):
+        client.post('/auth/login', json={'email': f'user{i}@example.com', 'password': 'x'},
+                    headers={'X-Forwarded-For': f'1.2.3.{i}, 10.9.9.9'})
+    # Spoofed left-most entries do not reset the bucket of the real client
+    response = client.post('/auth/login', json={'email': 'user9@example.com', 'password': 'x'},
+                           headers={'X-Forwarded-For': '5.5.5.5, 10.9.9.9'})
+    assert response.status_code == 429
+
+def test_disabled(client, app):
+    app.config['RATE_LIMIT_ENABLED'] = False
+    for _ in range(5):
+        assert _login(client).status_code == 401
+
+def test_sqlite_store_is_shared_between_workers(clock, tmp_path):
+    path = str(tmp_path / 'rate_limits.db')
+    workers = [_create_app(RATE_LIMIT_STORAGE='sqlite', RATE_LIMIT_SQLITE_PATH=path) for _ in range(2)]
+    for worker in workers:
+        with worker.app_context():
+            db.create_all()
+
+    assert _login(workers[0].test_client()).status_code == 401
+    assert _login(workers[1].test_client()).status_code == 401
+    assert _login(workers[0].test_client()).status_code == 429
+
+def test_sqlite_store_purges_stale_buckets(clock, tmp_path):
+    path = str(tmp_path / 'rate_limits.db')
+    worker = _create_app(RATE_LIMIT_STORAGE='sqlite', RATE_LIMIT_SQLITE_PATH=path)
+    with worker.app_context():
+        db.create_all()
+    client = worker.test_client()
+
+    def keys():
+        with sqlite3.connect(path) as connection:
+            return {key for key, in connection.execute('SELECT key FROM buckets')}
+
+    assert _login(client).status_code == 401
+    clock['now'] += 61
+    # Within the purge interval the refilled buckets are kept
+    assert _login(client, email='other@example.com', ip='10.0.0.2').status_code == 401
+    assert len(keys()) == 4
+
+    clock['now'] += 300
+    assert _login(client, email='other@example.com', ip='10.0.0.2').status_code == 401
+    assert keys() == {'login:ip:10.0.0.2', 'login:email:other@example.com'}
+
+def test_parse_limit():
+    assert rate_limit.parse_limit('5/minute') == (5, 5 / 60)
+    assert rate_limit.parse_limit('100/hours') == (100, 100 / 3600)
+    with pytest.raises(ValueError):
+        rate_limit.parse_limit('5 per minute')
@@ -0,0 +1,65 @@
+import time
+from app import create_app
+from extensions import response_cache
+from models import db, User, Incident
+from response_cache import MemoryBackend, SQLiteGenerations
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(max_entries=2)
+    backend.set('a', 1, ttl=60)
+    backend.set('b', 2, ttl=60)
+    assert backend.get('a') == 1
+    backend.set('c', 3, ttl=60)
+
+    assert backend.get('b') is None
+    assert backend.get('a') == 1
+    assert backend.get('c') == 3
+
+def test_memory_backend_expires_entries():
+    backend = MemoryBackend()
+    backend.set('a', 1, ttl=0.01)
+    time.sleep(0.02)
+    assert backend.get('a') is None
+
+def test_memory_backend_generations():
+    backend = MemoryBackend()
+    assert backend.generation('incidents') == 0
+    backend.bump('incidents')
+    assert backend.generation('incidents') == 1
+    assert backend.generation('users') == 0
+
+def test_shared_generations_reach_every_backend(tmp_path):
+    path = str(tmp_path / 'generations.db')
+    worker = MemoryBackend(generations=SQLiteGenerations(path))
+    other = MemoryBackend(generations=SQLiteGenerations(path))
+
+    assert worker.generation('incidents') == 0
+    other.bump('incidents')
+    assert worker.generation('incidents') == 1
+
+def test_invalidation_from_another_app_instance(tmp_path):
+    config = {
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'app.db'}",
+        'RESPONSE_CACHE_GENERATIONS_PATH': str(tmp_path / 'generations.db'),
+    }
+    # A web worker and, say, a CLI job: separate processes in production
+    web, job = create_app(config), create_app(config)
+    with web.app_context():
+        db.create_all()
+        db.session.add(User(username='reporter', email='reporter@example.com', password_hash='x'))
+        db.session.commit()
+    client = web.test_client()
+
+    assert client.get('/incidents/').json['total'] == 0
+    assert client.get('/incidents/').headers['X-Cache'] == 'HIT'
+
+    with job.app_context():
+        db.session.add(Incident(user_id=1, title='t', description='d', type='Accident', latitude=1.0, longitude=1.0))
+        db.session.commit()
+        response_cache.invalidate('incidents')
+
+    response = client.get('/incidents/')
+    assert response.headers['X-Cache'] == 'MISS'
+    assert response.json['total'] == 1
@@ -0,0 +1,114 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+from app import create_app
+from models import db, User, Incident
+
+@pytest.fixture
+def app():
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'JWT_SECRET_KEY': 'test-secret',
+        'EMAIL_TRANSPORT': 'fake',
+        'RESPONSE_CACHE_ENABLED': False,
+        'MEDIA_UPLOAD_WORKERS': 0,
+    })
+
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            User(username='alice', email='alice@example.com', password_hash=generate_password_hash('password123')),
+            User(username='bob', email='bob@example.com', password_hash=generate_password_hash('password123')),
+        ])
+        db.session.commit()
+        db.session.add_all([
+            _incident(1, 'Stolen motorbike', 'A motorbike was stolen outside the market.', type='Theft'),
+            _incident(1, 'Road accident', 'Two matatus collided; nobody stole anything.', status='resolved'),
+            _incident(2, 'Broken streetlight', 'Vandals smashed the streetlight near the stadium.', type='Vandalism'),
+            _incident(2, 'Phone theft', 'Phone snatched at the bus stage by a thief on a motorbike.', type='Theft'),
+        ])
+        db.session.commit()
+        yield app
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def _incident(user_id, title, description, type='Accident', status='pending'):
+    return Incident(user_id=user_id, title=title, description=description, type=type,
+                    status=status, latitude=-1.2864, longitude=36.8172)
+
+def _search(client, query):
+    response = client.get(f'/incidents/?{query}')
+    assert response.status_code == 200
+    return response.json
+
+def _titles(page):
+    return [item['title'] for item in page['incidents']]
+
+def test_search_ranks_title_matches_first(client):
+    page = _search(client, 'q=motorbike')
+    assert page['total'] == 2
+    assert _titles(page) == ['Stolen motorbike', 'Phone theft']
+
+def test_search_matches_prefixes_and_stems(client):
+    assert set(_titles(_search(client, 'q=streetl'))) == {'Broken streetlight'}
+    # Porter stemming folds plurals
+    assert set(_titles(_search(client, 'q=thefts'))) == {'Phone theft'}
+
+def test_every_word_must_match(client):
+    assert _titles(_search(client, 'q=motorbike+phone')) == ['Phone theft']
+    assert _search(client, 'q=motorbike+giraffe')['total'] == 0
+
+def test_search_combines_with_filters(client):
+    assert _titles(_search(client, 'q=motorbike&reporter=alice')) == ['Stolen motorbike']
+    assert _titles(_search(client, 'q=motorbike&type=Theft&status=pending&per_page=1&page=2')) == ['Phone theft']
+
+def test_search_returns_highlights(client):
+    item = _search(client, 'q=motorbike&reporter=alice')['incidents'][0]
+    assert item['highlight']['title'] == 'Stolen <mark>motorbike</mark>'
+    assert '<mark>motorbike</mark>' in item['highlight']['description']
+
+def test_highlights_escape_the_incident_text(client, app):
+    db.session.add(Incident(user_id=1, title='fire <img src=x onerror=alert(1)>', description='<b>fire</b> & smoke',
+                            type='Fire', latitude=1.0, longitude=1.0))
+    db.session.commit()
+
+    item = _search(client, 'q=fire')['incidents'][0]
+    assert item['highlight']['title'] == '<mark>fire</mark> &lt;img src=x onerror=alert(1)&gt;'
+    assert item['highlight']['description'] == '&lt;b&gt;<mark>fire</mark>&lt;/b&gt; &amp; smoke'
+
+def test_search_with_cursor_pagination(client):
+    first = _search(client, 'q=motorbike&cursor=&per_page=1')
+    second = _search(client, f"q=motorbike&cursor={first['next_cursor']}&per_page=1")
+    assert len(first['incidents']) == len(second['incidents']) == 1
+    assert {first['incidents'][0]['title'], second['incidents'][0]['title']} == {'Stolen motorbike', 'Phone theft'}
+    assert second['next_cursor'] is None
+
+def test_operators_in_q_are_plain_words(client):
+    assert _search(client, 'q=motorbike+OR+"NEAR(')['total'] == 0
+    assert _titles(_search(client, 'q=motorbike*')) == ['Stolen motorbike', 'Phone theft']
+
+def test_q_without_words_is_rejected(client):
+    response = client.get('/incidents/?q=%21%21')
+    assert response.status_code == 400
+
+def test_index_follows_updates_deletes_and_bulk_inserts(client, app):
+    with app.app_context():
+        incident = db.session.get(Incident, 3)
+        incident.title = 'Graffiti on the wall'
+        db.session.commit()
+        db.session.delete(db.session.get(Incident, 4))
+        db.session.commit()
+        db.session.execute(insert(Incident), [{
+            'user_id': 1, 'title': 'Motorbike crash', 'description': 'Rider hurt', 'type': 'Accident',
+            'status': 'pending', 'latitude': -1.3, 'longitude': 36.8, 'created_at': datetime.utcnow(),
+        }])
+        db.session.commit()
+
+    assert _search(client, 'q=streetlight&reporter=bob')['total'] == 1  # still in the description
+    assert _titles(_search(client, 'q=graffiti')) == ['Graffiti on the wall']
+    assert set(_titles(_search(client, 'q=motorbike'))) == {'Stolen motorbike', 'Motorbike crash'}
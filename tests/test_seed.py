@@ -0,0 +1,76 @@
+import pytest
+from werkzeug.security import check_password_hash
+from app import create_app
+from models import db, User, Incident, Media, StatusHistory, Notification
+
+@pytest.fixture
+def app():
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'JWT_SECRET_KEY': 'test-secret',
+    })
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def test_seed_command_bulk_loads_in_chunks(app):
+    result = app.test_cli_runner().invoke(args=['seed', '--users', '20', '--incidents', '300',
+                                                '--chunk-size', '64', '--seed', '1'])
+    assert result.exit_code == 0, result.output
+    assert 'Seeded: 20 users, 300 incidents' in result.output
+
+    assert User.query.count() == 20
+    assert Incident.query.count() == 300
+    assert Notification.query.count() == 300
+    assert User.query.filter_by(is_admin=True).count() == 1
+    assert Incident.query.filter(Incident.geohash.is_(None)).count() == 0
+    assert Media.query.count() > 0
+
+    # Every user shares one hash of the seed password
+    hashes = {user.password_hash for user in User.query.all()}
+    assert len(hashes) == 1
+    assert check_password_hash(hashes.pop(), 'password')
+
+def test_seeded_status_history_matches_incident_status(app):
+    app.test_cli_runner().invoke(args=['seed', '--users', '5', '--incidents', '200', '--seed', '2'])
+
+    for incident in Incident.query.all():
+        history = StatusHistory.query.filter_by(incident_id=incident.id).order_by(StatusHistory.changed_at, StatusHistory.id).all()
+        if not history:
+            assert incident.status == 'pending'
+            continue
+        assert history[0].old_status == 'pending'
+        for previous, current in zip(history, history[1:]):
+            assert previous.new_status == current.old_status
+        assert history[-1].new_status == incident.status
+        assert history[0].changed_at >= incident.created_at
+
+def test_seeded_incidents_cluster_around_cities(app):
+    app.test_cli_runner().invoke(args=['seed', '--users', '5', '--incidents', '200', '--seed', '3'])
+
+    # Everything lands in East Africa rather than uniformly across the globe
+    for incident in Incident.query.all():
+        assert -8 < incident.latitude < 2
+        assert 31 < incident.longitude < 41
+
+def test_seed_appends_after_existing_rows(app):
+    runner = app.test_cli_runner()
+    runner.invoke(args=['seed', '--users', '3', '--incidents', '10'])
+    result = runner.invoke(args=['seed', '--users', '2', '--incidents', '10'])
+
+    assert result.exit_code == 0, result.output
+    assert User.query.count() == 5
+    assert Incident.query.count() == 20
+    assert User.query.filter_by(is_admin=True).count() == 1
+
+def test_seed_invalidates_cached_listings(app):
+    client = app.test_client()
+    assert client.get('/incidents/').json['total'] == 0
+
+    app.test_cli_runner().invoke(args=['seed', '--users', '2', '--incidents', '5', '--seed', '5'])
+
+    assert client.get('/incidents/').json['total'] == 5
@@ -0,0 +1,78 @@
+import json
+from datetime import datetime
+import pytest
+from werkzeug.security import generate_password_hash
+from flask_jwt_extended import create_access_token
+from app import create_app
+from models import db, User, Incident
+from serialization import compile_serializer, serialize_incident_row
+
+@pytest.fixture
+def app():
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'JWT_SECRET_KEY': 'test-secret',
+        'EMAIL_TRANSPORT': 'fake',
+        'MEDIA_UPLOAD_WORKERS': 0,
+    })
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='reporter', email='reporter@example.com',
+                            password_hash=generate_password_hash('password123')))
+        db.session.add(Incident(user_id=1, title='Flooded road', description='d', type='Accident',
+                                latitude=-1.28, longitude=36.82, created_at=datetime(2025, 1, 2, 8, 30, 0, 250)))
+        db.session.commit()
+        yield app
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def headers(app):
+    return {'Authorization': f'Bearer {create_access_token(identity="1")}'}
+
+def test_provider_matches_stdlib_encoding(app):
+    data = {'b': 1.5, 'a': [None, True, 'ü'], 'at': datetime(2025, 1, 2, 8, 30, 0, 250), 3: 'x'}
+    expected = {'b': 1.5, 'a': [None, True, 'ü'], 'at': '2025-01-02T08:30:00.000250', '3': 'x'}
+
+    assert app.json.loads(app.json.dumps(data)) == expected
+    assert list(app.json.loads(app.json.dumps(data))) == sorted(expected)
+    # Values orjson rejects fall back to the stdlib encoder
+    assert json.loads(app.json.dumps({'n': 2 ** 70})) == {'n': 2 ** 70}
+
+def test_compiled_serializer_follows_dotted_paths(app):
+    incident = db.session.get(Incident, 1)
+    row = serialize_incident_row(incident)
+
+    assert row['reporter'] == 'reporter'
+    assert row['created_at'] == datetime(2025, 1, 2, 8, 30, 0, 250)
+    assert list(row) == list(serialize_incident_row.fields)
+    assert compile_serializer('title')(incident) == {'title': 'Flooded road'}
+
+def test_listing_json_shape_is_unchanged(client, headers):
+    response = client.get('/incidents/?per_page=1', headers=headers)
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/json'
+    assert 'Accept' in response.vary
+    incident = response.get_json()['incidents'][0]
+    assert incident['created_at'] == '2025-01-02T08:30:00.000250'
+    assert incident['reporter'] == 'reporter'
+    assert incident['latitude'] == -1.28
+
+def test_msgpack_negotiation(client, headers):
+    msgpack = pytest.importorskip('msgpack')
+    response = client.get('/incidents/?per_page=1', headers={**headers, 'Accept': 'application/msgpack'})
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/msgpack'
+    assert msgpack.unpackb(response.data)['incidents'][0]['title'] == 'Flooded road'
+
+    # Cached separately from the JSON representation
+    response = client.get('/incidents/?per_page=1', headers=headers)
+    assert response.mimetype == 'application/json'
+    assert response.get_json()['incidents'][0]['title'] == 'Flooded road'
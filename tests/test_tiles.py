@@ -0,0 +1,161 @@
+import os
+import pytest
+from werkzeug.security import generate_password_hash
+import tile_cache
+from app import create_app
+from geo import tile_bounds, tile_for_point
+from models import db, User, Incident
+from tiles import decode_tile, encode_tile, EXTENT
+
+NAIROBI = (-1.2864, 36.8172)
+MOMBASA = (-4.0435, 39.6682)
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'JWT_SECRET_KEY': 'test-secret',
+        'EMAIL_TRANSPORT': 'fake',
+        'MEDIA_UPLOAD_WORKERS': 0,
+        'TILE_CACHE_FOLDER': str(tmp_path / 'tiles'),
+        'TILE_CACHE_GENERATIONS_PATH': str(tmp_path / 'tile_cache.db'),
+    })
+
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='reporter', email='reporter@example.com',
+                            password_hash=generate_password_hash('password123')))
+        db.session.commit()
+        db.session.add_all([
+            _incident(*NAIROBI),
+            _incident(NAIROBI[0] + 0.001, NAIROBI[1] + 0.001, status='resolved', type='Theft'),
+            _incident(*MOMBASA),
+        ])
+        db.session.commit()
+        yield app
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def _incident(lat, lng, status='pending', type='Accident'):
+    return Incident(user_id=1, title='t', description='d', type=type, status=status,
+                    latitude=lat, longitude=lng)
+
+def _url(z, point=NAIROBI, query=''):
+    x, y = tile_for_point(*point, z)
+    return f'/incidents/tiles/{z}/{x}/{y}{query}'
+
+def _tile(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/vnd.ajali.tile'
+    return decode_tile(response.data), response
+
+def _total(tile):
+    return sum(feature['count'] for feature in tile['features'])
+
+def test_tile_bounds_contain_their_points():
+    for z in (0, 5, 12, 18):
+        x, y = tile_for_point(*NAIROBI, z)
+        min_lng, min_lat, max_lng, max_lat = tile_bounds(z, x, y)
+        assert min_lat <= NAIROBI[0] <= max_lat and min_lng <= NAIROBI[1] <= max_lng
+
+def test_encode_decode_round_trip():
+    data = encode_tile(14, 9867, 8250, points=[(7, -1.28, 36.82, 'pending', 'Theft'), (9, -1.281, 36.821, 'resolved', None)])
+    tile = decode_tile(data)
+    assert (tile['z'], tile['x'], tile['y'], tile['extent'], tile['clustered']) == (14, 9867, 8250, EXTENT, False)
+    assert [(f['id'], f['count'], f['status'], f['type']) for f in tile['features']] == [
+        (7, 1, 'pending', 'Theft'), (9, 1, 'resolved', None),
+    ]
+    assert all(0 <= f['x'] < EXTENT and 0 <= f['y'] < EXTENT for f in tile['features'])
+
+def test_high_zoom_tile_lists_individual_points(client):
+    tile, _ = _tile(client, _url(15))
+    assert not tile['clustered']
+    assert sorted(f['id'] for f in tile['features']) == [1, 2]
+    assert {f['status'] for f in tile['features']} == {'pending', 'resolved'}
+
+def test_low_zoom_tile_is_clustered(client):
+    tile, _ = _tile(client, _url(4))
+    assert tile['clustered']
+    assert _total(tile) == 3
+    assert all(f['id'] is None for f in tile['features'])
+
+    # The rollup and grouped paths agree on counts
+    assert _total(_tile(client, _url(4, query='?status=pending'))[0]) == 2
+    assert _total(_tile(client, _url(4, query='?type=Theft'))[0]) == 1
+    assert _total(_tile(client, _url(4, query='?reporter=reporter'))[0]) == 3
+
+def test_filters_apply_to_points(client):
+    tile, _ = _tile(client, _url(15, query='?type=Theft'))
+    assert [f['id'] for f in tile['features']] == [2]
+
+def test_invalid_tile_is_404(client):
+    assert client.get('/incidents/tiles/3/8/0').status_code == 404
+    assert client.get('/incidents/tiles/21/0/0').status_code == 404
+
+def test_tiles_are_cached_and_conditional(client):
+    _, first = _tile(client, _url(15))
+    assert first.headers['X-Cache'] == 'MISS'
+    _, second = _tile(client, _url(15))
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.data == first.data
+
+    not_modified = client.get(_url(15), headers={'If-None-Match': first.headers['ETag']})
+    assert not_modified.status_code == 304
+
+def test_writes_invalidate_only_affected_tiles(client, app):
+    _tile(client, _url(15))
+    _tile(client, _url(15, MOMBASA))
+
+    with app.app_context():
+        db.session.add(_incident(NAIROBI[0] + 0.0005, NAIROBI[1]))
+        db.session.commit()
+
+    tile, response = _tile(client, _url(15))
+    assert response.headers['X-Cache'] == 'MISS'
+    assert len(tile['features']) == 3
+    assert _tile(client, _url(15, MOMBASA))[1].headers['X-Cache'] == 'HIT'
+
+def test_moving_an_incident_invalidates_old_and_new_tiles(client, app):
+    _tile(client, _url(15))
+    _tile(client, _url(15, MOMBASA))
+
+    with app.app_context():
+        incident = db.session.get(Incident, 1)
+        incident.latitude, incident.longitude = MOMBASA
+        db.session.commit()
+
+    assert sorted(f['id'] for f in _tile(client, _url(15))[0]['features']) == [2]
+    assert sorted(f['id'] for f in _tile(client, _url(15, MOMBASA))[0]['features']) == [1, 3]
+
+def test_bulk_changes_start_a_new_generation(client, app, monkeypatch):
+    _tile(client, _url(15))
+    _tile(client, _url(15, MOMBASA))
+    root = app.config['TILE_CACHE_FOLDER']
+    removed = []
+    monkeypatch.setattr(tile_cache.shutil, 'rmtree', lambda path, **kwargs: removed.append(path))
+    app.config['TILE_CACHE_MAX_INVALIDATIONS'] = 20
+
+    with app.app_context():
+        db.session.add(_incident(NAIROBI[0] + 0.0005, NAIROBI[1]))
+        db.session.commit()
+
+    # One bump and one removal of the old generation, not one per tile
+    assert removed == [os.path.join(root, '0')]
+    assert _tile(client, _url(15))[1].headers['X-Cache'] == 'MISS'
+    assert _tile(client, _url(15, MOMBASA))[1].headers['X-Cache'] == 'MISS'
+    assert _tile(client, _url(15, MOMBASA))[1].headers['X-Cache'] == 'HIT'
+
+def test_rolled_back_changes_keep_the_cache(client, app):
+    _tile(client, _url(15))
+
+    with app.app_context():
+        db.session.add(_incident(*NAIROBI))
+        db.session.flush()
+        db.session.rollback()
+
+    assert _tile(client, _url(15))[1].headers['X-Cache'] == 'HIT'
@@ -0,0 +1,84 @@
+import pytest
+from datetime import datetime, timedelta
+from werkzeug.security import generate_password_hash
+from app import create_app
+from models import db, User, Incident
+
+@pytest.fixture
+def app():
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'JWT_SECRET_KEY': 'test-secret',
+        'EMAIL_TRANSPORT': 'fake',
+        'MEDIA_UPLOAD_WORKERS': 0,
+    })
+
+    with app.app_context():
+        db.create_all()
+        start = datetime(2026, 1, 1)
+        users = [User(username='admin', email='admin@example.com', is_admin=True,
+                      password_hash=generate_password_hash('adminpassword'), created_at=start)]
+        users += [
+            User(username=f'User{i}', email=f'person{i}@Example.com', phone=f'07000000{i:02d}',
+                 password_hash='x', created_at=start + timedelta(days=i))
+            for i in range(1, 8)
+        ]
+        db.session.add_all(users)
+        db.session.flush()
+        db.session.add_all([
+            Incident(user_id=users[1].id, title=f't{i}', description='d', type='Accident',
+                     latitude=-1.28, longitude=36.82)
+            for i in range(3)
+        ])
+        db.session.commit()
+        yield app
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def admin(client):
+    token = client.post('/auth/login', json={'email': 'admin@example.com', 'password': 'adminpassword'}).json['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+def test_users_are_paginated_newest_first(client, admin):
+    page = client.get('/auth/users?per_page=3&include_total=1', headers=admin).json
+    assert [user['username'] for user in page['users']] == ['User7', 'User6', 'User5']
+    assert page['total'] == 8
+    assert page['users'][0] == {
+        'id': 8, 'username': 'User7', 'email': 'person7@Example.com', 'phone': '0700000007',
+        'is_admin': False, 'created_at': '2026-01-08T00:00:00',
+    }
+
+    seen = []
+    cursor = ''
+    while cursor is not None:
+        page = client.get(f'/auth/users?per_page=3&cursor={cursor}', headers=admin).json
+        seen += [user['id'] for user in page['users']]
+        cursor = page['next_cursor']
+    assert seen == [8, 7, 6, 5, 4, 3, 2, 1]
+
+def test_users_prefix_search_is_case_insensitive(client, admin):
+    response = client.get('/auth/users?q=user', headers=admin)
+    assert len(response.json['users']) == 7
+
+    response = client.get('/auth/users?q=PERSON3', headers=admin)
+    assert [user['username'] for user in response.json['users']] == ['User3']
+
+    response = client.get('/auth/users?q=example', headers=admin)
+    assert response.json['users'] == []
+
+def test_users_fields_and_incident_counts(client, admin):
+    response = client.get('/auth/users?fields=username&include=incident_count&q=user1', headers=admin)
+    assert response.json['users'] == [{'id': 2, 'username': 'User1', 'incident_count': 3}]
+
+    response = client.get('/auth/users?fields=username&include=incident_count&q=user2', headers=admin)
+    assert response.json['users'][0]['incident_count'] == 0
+
+def test_users_bad_arguments(client, admin):
+    assert client.get('/auth/users?fields=password_hash', headers=admin).status_code == 400
+    assert client.get('/auth/users?include=notifications', headers=admin).status_code == 400
+    assert client.get('/auth/users?cursor=bogus', headers=admin).status_code == 400
@@ -0,0 +1,120 @@
+# tile_cache.py
+"""On-disk cache for rendered map tiles.
+
+Tiles live at ``<TILE_CACHE_FOLDER>/<generation>/<z>/<x>/<y>/<filters>.bin``:
+one directory per tile holding a file per filter combination, so
+invalidating a tile drops every filtered variant with a single directory
+removal. Writes go through a temporary file and ``os.replace`` so readers
+never see a partial tile.
+
+Writes invalidate the tiles containing the incidents they touched once the
+transaction commits. Past ``TILE_CACHE_MAX_INVALIDATIONS`` tiles (bulk
+imports, archiving) the generation is bumped instead, which drops every tile
+at once; it is shared between processes through a SQLite file
+(``TILE_CACHE_GENERATIONS_PATH``) like the response cache's. A read that
+started before a targeted invalidation can still store the old tile
+afterwards; ``TILE_CACHE_TTL`` bounds how long that survives.
+"""
+import hashlib
+import os
+import shutil
+import time
+import uuid
+
+from flask import current_app
+
+from response_cache import SQLiteGenerations
+
+
+class TileCache:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('TILE_CACHE_ENABLED', True)
+        app.config.setdefault('TILE_CACHE_FOLDER', os.path.join(app.instance_path, 'tiles'))
+        app.config.setdefault('TILE_CACHE_TTL', 300)
+        app.config.setdefault('TILE_CACHE_MAX_INVALIDATIONS', 1000)
+        app.config.setdefault('TILE_CACHE_GENERATIONS_PATH', os.path.join(app.instance_path, 'tile_cache.db'))
+        app.extensions['tile_cache'] = SQLiteGenerations(app.config['TILE_CACHE_GENERATIONS_PATH'])
+
+    @property
+    def enabled(self):
+        return current_app.config['TILE_CACHE_ENABLED']
+
+    @property
+    def root(self):
+        return current_app.config['TILE_CACHE_FOLDER']
+
+    @property
+    def generation(self):
+        return current_app.extensions['tile_cache'].get('tiles')
+
+    @staticmethod
+    def filter_key(filters):
+        items = '&'.join(f'{key}={value}' for key, value in sorted(filters.items()) if value)
+        return hashlib.sha1(items.encode()).hexdigest()[:16] if items else 'all'
+
+    def _tile_dir(self, generation, z, x, y):
+        return os.path.join(self.root, str(generation), str(z), str(x), str(y))
+
+    def get(self, z, x, y, filters, generation=None):
+        generation = self.generation if generation is None else generation
+        path = os.path.join(self._tile_dir(generation, z, x, y), self.filter_key(filters) + '.bin')
+        try:
+            if time.time() - os.path.getmtime(path) > current_app.config['TILE_CACHE_TTL']:
+                return None
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def set(self, z, x, y, filters, data, generation=None):
+        generation = self.generation if generation is None else generation
+        directory = self._tile_dir(generation, z, x, y)
+        path = os.path.join(directory, self.filter_key(filters) + '.bin')
+        tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            # A concurrent invalidation removed the directory; the next read rebuilds
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def get_or_build(self, z, x, y, filters, build):
+        """Return ``(data, 'HIT' | 'MISS')``, calling ``build()`` on a miss."""
+        if not self.enabled:
+            return build(), 'MISS'
+        # Read once, so a tile built across a bump lands in the dead generation
+        generation = self.generation
+        data = self.get(z, x, y, filters, generation)
+        if data is not None:
+            return data, 'HIT'
+        data = build()
+        self.set(z, x, y, filters, data, generation)
+        return data, 'MISS'
+
+    def invalidate(self, tiles):
+        """Drop every cached variant of each ``(z, x, y)`` in ``tiles``."""
+        if len(tiles) > current_app.config['TILE_CACHE_MAX_INVALIDATIONS']:
+            return self.clear()
+        generation = self.generation
+        for z, x, y in tiles:
+            shutil.rmtree(self._tile_dir(generation, z, x, y), ignore_errors=True)
+
+    def clear(self):
+        """Start a new generation and remove the directories of earlier ones."""
+        generations = current_app.extensions['tile_cache']
+        generations.bump('tiles')
+        current = str(generations.get('tiles'))
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return
+        for name in names:
+            if name != current:
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
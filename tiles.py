@@ -0,0 +1,206 @@
+# tiles.py
+"""Map tiles of incident points in a compact binary format.
+
+Below ``CLUSTER_MAX_ZOOM`` points are clustered server-side into geohash
+cells 1/8 to 1/16 of the tile wide. Without a type or reporter filter the
+counts come straight from the ``incident_geo_cells`` rollup and clusters sit
+at the cell centre; otherwise they are grouped from ``incidents`` and sit at
+the centroid of their points. From ``CLUSTER_MAX_ZOOM`` up every incident
+is its own feature unless the tile holds more than ``MAX_TILE_POINTS``.
+
+Tile layout, little-endian::
+
+    header   4s magic b'AJT1', u8 z, u8 flags (bit 0: clustered),
+             u16 extent, u32 x, u32 y, u32 feature count
+    strings  u8 count, then per string u8 length + UTF-8 bytes
+    feature  u16 x, u16 y (tile pixels, origin top-left), u32 count,
+             u32 incident id (0 for clusters), u8 status, u8 type
+             (indexes into the strings, 255 when not applicable)
+
+Rendered tiles are cached on disk (``tile_cache``) and dropped after any
+commit that inserted, moved, restyled or deleted an incident inside them.
+"""
+import struct
+
+from flask import has_app_context
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from analytics import MAX_CELL_PRECISION, geo_cells
+from extensions import tile_cache
+from geo import cover_bbox, decode_geohash, tile_bounds, tile_for_point, tile_position
+from incident_queries import apply_filters, within_bbox
+from models import db, Incident
+
+MAGIC = b'AJT1'
+EXTENT = 4096
+MAX_TILE_ZOOM = 20
+CLUSTER_MAX_ZOOM = 14
+MAX_TILE_POINTS = 5000
+CLUSTERED = 0x01
+NO_INDEX = 255
+TILE_FILTERS = ('status', 'type', 'reporter')
+TILE_MIMETYPE = 'application/vnd.ajali.tile'
+
+HEADER = struct.Struct('<4sBBHIII')
+FEATURE = struct.Struct('<HHIIBB')
+
+
+def valid_tile(z, x, y):
+    return 0 <= z <= MAX_TILE_ZOOM and 0 <= x < (1 << z) and 0 <= y < (1 << z)
+
+
+def cluster_precision(z):
+    """Geohash precision whose cells span 1/8 to 1/16 of a tile at zoom ``z``."""
+    return max(1, (z + 4) * 2 // 5)
+
+
+def tile_filters(args):
+    return {name: args[name] for name in TILE_FILTERS if args.get(name)}
+
+
+def _pixel(latitude, longitude, z, x, y):
+    fx, fy = tile_position(latitude, longitude, z)
+    px = int((fx - x) * EXTENT)
+    py = int((fy - y) * EXTENT)
+    return min(max(px, 0), EXTENT - 1), min(max(py, 0), EXTENT - 1)
+
+
+def _inside(bounds, latitude, longitude):
+    min_lng, min_lat, max_lng, max_lat = bounds
+    return min_lat <= latitude < max_lat and min_lng <= longitude < max_lng
+
+
+def _filtered(query, filters):
+    if filters.get('reporter'):
+        query = query.join(Incident.user)
+    return apply_filters(query, filters)
+
+
+def _rollup_clusters(bounds, precision, filters):
+    prefixes = cover_bbox(*bounds)
+    clusters = []
+    for cell, count in geo_cells(precision, prefixes, filters.get('status')).items():
+        min_lat, min_lng, max_lat, max_lng = decode_geohash(cell)
+        latitude, longitude = (min_lat + max_lat) / 2, (min_lng + max_lng) / 2
+        # A cell straddling the tile edge belongs to the tile holding its centre
+        if _inside(bounds, latitude, longitude):
+            clusters.append((latitude, longitude, count))
+    return clusters
+
+
+def _grouped_clusters(bounds, precision, filters):
+    cell = func.substr(Incident.geohash, 1, precision)
+    query = db.session.query(func.avg(Incident.latitude), func.avg(Incident.longitude), func.count())
+    query = _filtered(query.filter(within_bbox(bounds)), filters).group_by(cell)
+    return [(float(latitude), float(longitude), count) for latitude, longitude, count in query]
+
+
+def _points(bounds, filters):
+    """Up to ``MAX_TILE_POINTS`` incidents in the tile, or None when there are more."""
+    query = db.session.query(
+        Incident.id, Incident.latitude, Incident.longitude, Incident.status, Incident.type
+    )
+    query = _filtered(query.filter(within_bbox(bounds)), filters)
+    rows = query.order_by(Incident.id).limit(MAX_TILE_POINTS + 1).all()
+    return None if len(rows) > MAX_TILE_POINTS else rows
+
+
+def build_tile(z, x, y, filters):
+    bounds = tile_bounds(z, x, y)
+    rows = _points(bounds, filters) if z >= CLUSTER_MAX_ZOOM else None
+    if rows is not None:
+        return encode_tile(z, x, y, points=rows)
+
+    precision = cluster_precision(z)
+    if precision <= MAX_CELL_PRECISION and not (filters.keys() - {'status'}):
+        clusters = _rollup_clusters(bounds, precision, filters)
+    else:
+        clusters = _grouped_clusters(bounds, precision, filters)
+    return encode_tile(z, x, y, clusters=clusters)
+
+
+def encode_tile(z, x, y, points=None, clusters=None):
+    """Pack ``points`` ``(id, lat, lng, status, type)`` or ``clusters`` ``(lat, lng, count)``."""
+    strings = []
+    index = {}
+
+    def intern(value):
+        if value is None:
+            return NO_INDEX
+        if value not in index:
+            if len(strings) == NO_INDEX:
+                return NO_INDEX
+            index[value] = len(strings)
+            strings.append(value)
+        return index[value]
+
+    features = []
+    if points is not None:
+        for incident_id, latitude, longitude, status, incident_type in points:
+            px, py = _pixel(latitude, longitude, z, x, y)
+            features.append(FEATURE.pack(px, py, 1, incident_id, intern(status), intern(incident_type)))
+    else:
+        for latitude, longitude, count in clusters:
+            px, py = _pixel(latitude, longitude, z, x, y)
+            features.append(FEATURE.pack(px, py, count, 0, NO_INDEX, NO_INDEX))
+
+    flags = CLUSTERED if points is None else 0
+    parts = [HEADER.pack(MAGIC, z, flags, EXTENT, x, y, len(features)), bytes([len(strings)])]
+    for value in strings:
+        encoded = value.encode()[:255]
+        parts.append(bytes([len(encoded)]) + encoded)
+    parts.extend(features)
+    return b''.join(parts)
+
+
+def decode_tile(data):
+    """Unpack a tile into a dict; the reference for client implementations."""
+    magic, z, flags, extent, x, y, count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('not an incident tile')
+    offset = HEADER.size
+    strings = []
+    for _ in range(data[offset]):
+        length = data[offset + 1]
+        strings.append(data[offset + 2:offset + 2 + length].decode())
+        offset += 1 + length
+    offset += 1
+
+    features = []
+    for px, py, n, incident_id, status, incident_type in FEATURE.iter_unpack(data[offset:offset + count * FEATURE.size]):
+        features.append({
+            'x': px,
+            'y': py,
+            'count': n,
+            'id': incident_id or None,
+            'status': strings[status] if status != NO_INDEX else None,
+            'type': strings[incident_type] if incident_type != NO_INDEX else None,
+        })
+    return {'z': z, 'x': x, 'y': y, 'extent': extent, 'clustered': bool(flags & CLUSTERED), 'features': features}
+
+
+def tiles_for_points(points):
+    """Every ``(z, x, y)`` up to ``MAX_TILE_ZOOM`` that contains one of ``points``."""
+    tiles = set()
+    for latitude, longitude in points:
+        for z in range(MAX_TILE_ZOOM + 1):
+            tiles.add((z, *tile_for_point(latitude, longitude, z)))
+    return tiles
+
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_changed_tiles(session):
+    changes = session.info.pop('incident_changes', None)
+    if not changes or not has_app_context():
+        return
+    points = set()
+    for _, _, _, latitude, longitude in changes:
+        if latitude is not None and longitude is not None:
+            points.add((float(latitude), float(longitude)))
+    tile_cache.invalidate(tiles_for_points(points))
+
+
+@event.listens_for(Session, 'after_rollback')
+def forget_rolled_back_changes(session):
+    session.info.pop('incident_changes', None)
@@ -0,0 +1,90 @@
+# user_queries.py
+"""Paginated, searchable user listing for the admin panel.
+
+Pages are keyset-paginated on ``(created_at, id)`` so every page costs the
+same, ``q`` is a case-insensitive username/email prefix matched against the
+``lower()`` expression indexes, ``fields`` loads only the requested columns
+and ``include=incident_count`` adds counts for the page in one grouped query.
+"""
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import load_only, raiseload
+
+from incident_queries import decode_cursor, encode_cursor, parse_bool, parse_list
+from models import db, Incident, User
+from serialization import USER_FIELDS, user_serializer
+
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 200
+
+FIELDS = {name: getattr(User, name) for name in USER_FIELDS}
+
+INCLUDES = ('incident_count',)
+
+
+def prefix_filter(column, prefix):
+    """Half-open range on ``lower(column)`` so the expression index is used, unlike LIKE."""
+    low = prefix.lower()
+    high = low[:-1] + chr(ord(low[-1]) + 1)
+    expression = func.lower(column)
+    return and_(expression >= low, expression < high)
+
+
+def incident_counts(user_ids):
+    if not user_ids:
+        return {}
+    rows = (
+        db.session.query(Incident.user_id, func.count(Incident.id))
+        .filter(Incident.user_id.in_(user_ids))
+        .group_by(Incident.user_id)
+        .all()
+    )
+    return dict(rows)
+
+
+def paginate_users(args):
+    """Return one page of users from request args.
+
+    Raises ValueError with a client-facing message on bad input.
+    """
+    fields = parse_list(args, 'fields', FIELDS, USER_FIELDS)
+    if 'id' not in fields:
+        fields.insert(0, 'id')
+    include = parse_list(args, 'include', INCLUDES, ())
+    per_page = min(max(args.get('per_page', DEFAULT_PER_PAGE, type=int), 1), MAX_PER_PAGE)
+    include_total = parse_bool(args.get('include_total'), False)
+
+    # created_at and id are the keyset, so they are always loaded
+    columns = {FIELDS[name] for name in fields} | {User.id, User.created_at}
+    query = User.query.options(load_only(*columns, raiseload=True), raiseload('*'))
+
+    q = args.get('q', '').strip()
+    if q:
+        query = query.filter(or_(prefix_filter(User.username, q), prefix_filter(User.email, q)))
+
+    total = query.order_by(None).count() if include_total else None
+
+    if args.get('cursor'):
+        created_at, user_id = decode_cursor(args['cursor'])
+        query = query.filter(or_(
+            User.created_at < created_at,
+            and_(User.created_at == created_at, User.id < user_id),
+        ))
+
+    # One extra row tells us whether another page exists without a COUNT
+    rows = query.order_by(User.created_at.desc(), User.id.desc()).limit(per_page + 1).all()
+    users = rows[:per_page]
+
+    serialize = user_serializer(tuple(fields))
+    items = [serialize(user) for user in users]
+    if 'incident_count' in include:
+        counts = incident_counts([user.id for user in users])
+        for item in items:
+            item['incident_count'] = counts.get(item['id'], 0)
+
+    page = {
+        'users': items,
+        'next_cursor': encode_cursor(users[-1]) if len(rows) > per_page else None,
+    }
+    if include_total:
+        page['total'] = total
+    return page